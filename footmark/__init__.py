@@ -1,25 +1,49 @@
 #
 import logging
-import logging.config
 import os
-
-from footmark.pyami.config import Config, FootmarkLoggingConfig, DefaultLoggingConfig
+import threading
 
 __version__ = '1.0.7'
 Version = __version__  # for backware compatibility
 
+ENDPOINTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'endpoints.json')
+
+log = logging.getLogger('footmark')
+
+_logging_initialized = False
+_logging_lock = threading.Lock()
+
+
 def init_logging():
-    try:
-        Config().init_config()
+    """
+    Set up the footmark configuration and logging. Importing footmark does
+    not configure anything: this is called when the first connection is
+    created, and does nothing afterwards.
+    """
+    global _logging_initialized
+    if _logging_initialized:
+        return
+    with _logging_lock:
+        if _logging_initialized:
+            return
+        _logging_initialized = True
+        import logging.config
+        from footmark.logsupport import make_async
+        from footmark.pyami.config import Config, FootmarkLoggingConfig, DefaultLoggingConfig
+        loggers = (logging.getLogger(), logging.getLogger('footmark'))
+        existing = set(handler for logger in loggers for handler in logger.handlers)
         try:
-            logging.config.fileConfig(os.path.expanduser(FootmarkLoggingConfig))
+            Config().init_config()
+            try:
+                logging.config.fileConfig(os.path.expanduser(FootmarkLoggingConfig))
+            except:
+                logging.config.dictConfig(DefaultLoggingConfig)
         except:
-            logging.config.dictConfig(DefaultLoggingConfig)
-    except:
-        pass
-
-init_logging()
-log = logging.getLogger('footmark')
+            pass
+        # Logging config files written by older releases still name the
+        # blocking file handlers
+        for logger in loggers:
+            make_async(logger, exclude=existing)
 
 
 def connect_ecs(acs_access_key_id=None, acs_secret_access_key=None, **kwargs):
@@ -0,0 +1,228 @@
+"""
+Asynchronous counterparts of the ECS, VPC and SLB connections, so that code
+running in one thread or one asyncio event loop does not block on requests.
+
+The Aliyun SDK only sends blocking requests, so each call in flight holds a
+thread of a pool shared by every asynchronous connection. Throughput is
+capped at the size of that pool: an event loop cannot have more requests in
+flight than the pool has threads, and the calls beyond it queue until a
+thread is free. Inside a running asyncio event loop the methods return
+awaitable asyncio futures, elsewhere they return
+:class:`concurrent.futures.Future` objects.
+"""
+import threading
+import weakref
+
+from concurrent.futures import ThreadPoolExecutor
+
+from footmark.clientpool import ClientPool
+from footmark.ecs.connection import ECSConnection
+from footmark.slb.connection import SLBConnection
+from footmark.vpc.connection import VPCConnection
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+
+def running_loop():
+    """
+    Return the asyncio event loop running in the current thread, if any.
+    """
+    if asyncio is None or not hasattr(asyncio, 'get_running_loop'):
+        return None
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class AsyncRequestCore(object):
+    """
+    Runs the requests of asynchronous connections on a pool of
+    ``concurrency`` threads, one per request in flight, and keeps the
+    AcsClient objects they borrow in one pool so that connections to the
+    same account and region reuse them.
+
+    Calls submitted beyond ``concurrency`` wait for a free slot before they
+    reach the pool: a thread submitting them blocks, and inside a running
+    event loop they wait on an asyncio semaphore of that loop without
+    blocking it. Size it to the number of requests worth running at once,
+    which the API rate limits usually keep in the tens: every thread costs
+    its stack memory whether it is busy or not. To change the size of the
+    shared core, pass a ``core`` of your own to the connections.
+
+    :ivar submitted: Number of calls submitted.
+    :ivar completed: Number of calls finished, successfully or not.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, concurrency=64, pool_size=None):
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(concurrency)
+        self.client_pool = ClientPool(pool_size or concurrency)
+        self.submitted = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._loop_slots = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def shared(cls):
+        """
+        Return the process-wide core, creating it on first use.
+        """
+        if cls._shared is None:
+            with cls._shared_lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
+
+    @property
+    def in_flight(self):
+        return self.submitted - self.completed
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Schedule ``func(*args, **kwargs)``, once fewer than ``concurrency``
+        calls are in flight.
+
+        :keyword loop: The asyncio event loop to bind the result to. Defaults
+            to the loop running in the calling thread.
+
+        :return: An asyncio future when bound to an event loop, otherwise a
+            :class:`concurrent.futures.Future`
+        """
+        loop = kwargs.pop('loop', None) or running_loop()
+        with self._lock:
+            self.submitted += 1
+        if loop is not None and loop is running_loop():
+            return self._submit_in_loop(loop, func, args, kwargs)
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(self._call, func, args, kwargs, self._slots)
+        except Exception:
+            self._slots.release()
+            raise
+        if loop is not None:
+            return asyncio.wrap_future(future, loop=loop)
+        return future
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def _call(self, func, args, kwargs, slots=None):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            if slots is not None:
+                slots.release()
+            with self._lock:
+                self.completed += 1
+
+    def _submit_in_loop(self, loop, func, args, kwargs):
+        # Runs in the loop, so the call waits for a slot without blocking it
+        with self._lock:
+            slots = self._loop_slots.get(loop)
+            if slots is None:
+                slots = self._loop_slots[loop] = asyncio.Semaphore(self.concurrency)
+        result = loop.create_future()
+
+        def finish(future):
+            slots.release()
+            if result.cancelled():
+                return
+            if future.cancelled():
+                result.cancel()
+            elif future.exception() is not None:
+                result.set_exception(future.exception())
+            else:
+                result.set_result(future.result())
+
+        def start(acquired):
+            if acquired.cancelled() or result.cancelled():
+                if not acquired.cancelled():
+                    slots.release()
+                result.cancel()
+                with self._lock:
+                    self.completed += 1
+                return
+            try:
+                future = asyncio.wrap_future(self.executor.submit(self._call, func, args, kwargs), loop=loop)
+            except Exception as ex:
+                slots.release()
+                result.set_exception(ex)
+                with self._lock:
+                    self.completed += 1
+                return
+            future.add_done_callback(finish)
+
+        loop.create_task(slots.acquire()).add_done_callback(start)
+        return result
+
+
+class AsyncConnection(object):
+    """
+    Wraps a blocking connection of ``connection_class``. Its public methods
+    whose names start with one of ``async_prefixes`` are available under
+    the same names and arguments, returning futures of their results; any
+    other method can be called through :meth:`run`.
+    """
+    connection_class = None
+    async_prefixes = ('describe_', 'create_', 'delete_', 'get_')
+
+    def __init__(self, acs_access_key_id=None, acs_secret_access_key=None, region=None, core=None,
+                 loop=None, **kwargs):
+        """
+        :keyword core: The :class:`AsyncRequestCore` running the requests.
+            Defaults to the process-wide one.
+        :keyword loop: The asyncio event loop the futures are bound to.
+            Defaults to the loop running when a method is called.
+
+        Any other keyword argument is passed to the blocking connection.
+        """
+        self.core = core or AsyncRequestCore.shared()
+        self.loop = loop
+        kwargs.setdefault('client_pool', self.core.client_pool)
+        self.connection = self.connection_class(acs_access_key_id, acs_secret_access_key, region=region, **kwargs)
+
+    def run(self, method, *args, **kwargs):
+        """
+        Call any method of the blocking connection asynchronously.
+
+        :type method: str
+        :param method: The name of the method, such as ``start_instances``.
+        """
+        kwargs['loop'] = self.loop
+        return self.core.submit(getattr(self.connection, method), *args, **kwargs)
+
+    def __getattr__(self, name):
+        # Only called for names missing from the instance and its class
+        if not name.startswith(self.async_prefixes) or 'connection' not in self.__dict__:
+            raise AttributeError(name)
+        method = getattr(self.connection, name)
+        if not callable(method):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            kwargs['loop'] = self.loop
+            return self.core.submit(method, *args, **kwargs)
+
+        call.__name__ = name
+        call.__doc__ = method.__doc__
+        self.__dict__[name] = call
+        return call
+
+
+class AsyncECSConnection(AsyncConnection):
+    connection_class = ECSConnection
+
+
+class AsyncVPCConnection(AsyncConnection):
+    connection_class = VPCConnection
+
+
+class AsyncSLBConnection(AsyncConnection):
+    connection_class = SLBConnection
@@ -0,0 +1,128 @@
+"""
+Runs many independent API calls concurrently on a bounded thread pool.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RateLimiter(object):
+    """
+    A token bucket allowing ``rate`` calls per second on average, with
+    bursts of up to ``burst`` calls.
+
+    :ivar waited: Total seconds callers spent blocked in :meth:`acquire`.
+    """
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst or max(rate, 1))
+        self.waited = 0.0
+        self._tokens = self.burst
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, key, rate, burst=None):
+        """
+        Return the process-wide limiter registered under ``key``, creating
+        it with the given rate the first time.
+        """
+        limiter = cls._shared.get(key)
+        if limiter is None:
+            with cls._shared_lock:
+                limiter = cls._shared.setdefault(key, cls(rate, burst))
+        return limiter
+
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available.
+
+        :rtype: float
+        :return: The number of seconds spent waiting
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += delay
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class BulkResult(OrderedDict):
+    """
+    Maps each item of a bulk operation, in submission order, to the value
+    returned by its call or to the exception the call raised.
+    """
+
+    @property
+    def succeeded(self):
+        return [item for item, result in self.items() if not isinstance(result, Exception)]
+
+    @property
+    def errors(self):
+        return OrderedDict((item, result) for item, result in self.items() if isinstance(result, Exception))
+
+    def raise_first_error(self):
+        """
+        Re-raise the exception of the first failed item, if any.
+        """
+        for error in self.errors.values():
+            raise error
+
+
+class BulkExecutor(object):
+    """
+    Fans calls out over a thread pool of at most ``concurrency`` workers,
+    optionally throttled by a :class:`RateLimiter`.
+    """
+
+    def __init__(self, concurrency=10, limiter=None):
+        self.concurrency = concurrency
+        self.limiter = limiter
+
+    def map(self, func, items):
+        """
+        Call ``func`` once per item concurrently and wait for all of them.
+
+        :type func: callable
+        :param func: Called with a single item.
+
+        :type items: list
+        :param items: Hashable items, such as instance IDs.
+
+        :rtype: :class:`BulkResult`
+        :return: The result or exception of each item
+        """
+        items = list(items)
+        results = BulkResult((item, None) for item in items)
+        if not items:
+            return results
+        if len(items) == 1 or self.concurrency <= 1:
+            for item in items:
+                results[item] = self._call(func, item)
+            return results
+        executor = ThreadPoolExecutor(min(self.concurrency, len(items)))
+        try:
+            futures = [(item, executor.submit(self._call, func, item)) for item in items]
+            for item, future in futures:
+                results[item] = future.result()
+        finally:
+            executor.shutdown(wait=True)
+        return results
+
+    def _call(self, func, item):
+        if self.limiter:
+            self.limiter.acquire()
+        try:
+            return func(item)
+        except Exception as ex:
+            return ex
@@ -0,0 +1,195 @@
+"""
+Small in-process caches shared by connections.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import six
+
+
+class LRUCache(object):
+    """
+    A thread-safe mapping holding at most ``maxsize`` entries, dropping the
+    least recently used entry when full.
+
+    Entries are kept in order of use, so that lookups, insertions and
+    evictions all take constant time.
+
+    :ivar hits: Number of lookups that found their key.
+    :ivar misses: Number of lookups that did not.
+    """
+
+    def __init__(self, maxsize=1024, on_evict=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value cached under ``key``, marking it as recently used.
+        """
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Cache ``value`` under ``key``, evicting the least recently used
+        entry if the cache is full.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            while len(self._data) > self.maxsize:
+                oldest, evicted = self._data.popitem(last=False)
+                if self.on_evict:
+                    self.on_evict(oldest, evicted)
+
+    def pop(self, key, default=None):
+        """
+        Remove ``key`` and return its value.
+        """
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+
+class ResponseCache(object):
+    """
+    A read-through cache of the raw bodies of Describe* responses.
+
+    Entries are keyed by account, region, product, action and params, and
+    expire after the TTL of their action. A request of any other action is
+    taken as a change: it drops the cached responses whose params name one
+    of the resource IDs it names, such as the DescribeLoadBalancerAttribute
+    of a load balancer after SetLoadBalancerStatus, along with the cached
+    listings that name no resource ID at all. Listings filtered by another
+    ID, such as the instances of a VPC, are only refreshed by their TTL.
+
+    :ivar ttl: Seconds a response stays cached unless ``ttls`` says otherwise.
+    :ivar ttls: A dict of per-action TTLs, such as ``{'DescribeRegions': 3600}``.
+        A TTL of 0 disables caching of that action.
+    """
+
+    # ID params that scope a request rather than name the resource it reads
+    scope_ids = ('RegionId', 'ZoneId', 'OwnerId')
+
+    def __init__(self, ttl=5, ttls=None, maxsize=1024):
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.invalidations = 0
+        self._entries = LRUCache(maxsize, on_evict=self._unindex)
+        # (scope, resource ID) -> keys of the responses naming it, and back
+        self._index = {}
+        self._indexed = {}
+        self._lock = threading.RLock()
+
+    @property
+    def hits(self):
+        return self._entries.hits
+
+    @property
+    def misses(self):
+        return self._entries.misses
+
+    def cacheable(self, action):
+        return action.startswith('Describe') and self.ttls.get(action, self.ttl) > 0
+
+    def key(self, scope, action, params):
+        """
+        Build the cache key of a request. ``scope`` identifies the account,
+        region and product the request is sent to.
+        """
+        return scope + (action, json.dumps(params or {}, sort_keys=True, default=str))
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, body = entry
+        if expires < time.time():
+            self._entries.pop(key)
+            self._unindex(key)
+            return None
+        return body
+
+    def set(self, key, action, params, body):
+        ttl = self.ttls.get(action, self.ttl)
+        scope = key[:-2]
+        index_keys = [(scope, resource_id) for resource_id in self.resource_ids(params) or [None]]
+        with self._lock:
+            self._entries.set(key, (time.time() + ttl, body))
+            self._indexed[key] = index_keys
+            for index_key in index_keys:
+                self._index.setdefault(index_key, set()).add(key)
+
+    def invalidate(self, scope, params):
+        """
+        Drop the cached responses of ``scope`` affected by a change to the
+        resources named in ``params``.
+        """
+        with self._lock:
+            for resource_id in self.resource_ids(params) + [None]:
+                for key in list(self._index.get((scope, resource_id), ())):
+                    self._entries.pop(key)
+                    self._unindex(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._indexed.clear()
+
+    @classmethod
+    def resource_ids(cls, params):
+        """
+        Return the resource IDs named by request params, that is the values
+        of the params whose name ends with Id or Ids. JSON lists of IDs are
+        expanded.
+        """
+        ids = []
+        for name, value in (params or {}).items():
+            if not (name.endswith('Id') or name.endswith('Ids')) or not value:
+                continue
+            if name.endswith(cls.scope_ids):
+                continue
+            if isinstance(value, six.string_types) and value.startswith('['):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    pass
+            if isinstance(value, (list, tuple)):
+                ids.extend(str(item) for item in value)
+            else:
+                ids.append(str(value))
+        return ids
+
+    def _unindex(self, key, entry=None):
+        with self._lock:
+            for index_key in self._indexed.pop(key, ()):
+                keys = self._index.get(index_key)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._index[index_key]
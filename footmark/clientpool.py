@@ -0,0 +1,104 @@
+"""
+Keeps reusable AcsClient objects so connections do not pay client
+construction and connection setup on every request.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from aliyunsdkcore import client
+
+
+class ClientPool(object):
+    """
+    A thread-safe pool of idle :class:`aliyunsdkcore.client.AcsClient`
+    objects keyed by credentials and region.
+
+    :ivar max_size: The maximum number of idle clients kept per key.
+    :ivar idle_timeout: Seconds after which an unused idle client is
+        discarded instead of being reused. ``None`` or ``0`` disables
+        idle eviction.
+    :ivar hits: Number of requests served by a reused client.
+    :ivar misses: Number of requests that had to build a new client.
+    :ivar evictions: Number of idle clients dropped because they were
+        unused for too long or the pool for their key was full.
+    """
+
+    def __init__(self, max_size=10, idle_timeout=300, factory=None):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.factory = factory
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, access_key, secret_key, region_id):
+        """
+        Borrow a client for the given credentials and region, building a
+        new one when no usable idle client is available.
+        """
+        key = (access_key, secret_key, region_id)
+        now = time.time()
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                conn, last_used = idle.pop()
+                if self._expired(last_used, now):
+                    self.evictions += 1
+                    continue
+                self.hits += 1
+                return conn
+            self.misses += 1
+        factory = self.factory or client.AcsClient
+        return factory(access_key, secret_key, region_id)
+
+    def release(self, access_key, secret_key, region_id, conn):
+        """
+        Return a borrowed client so that later requests can reuse it.
+        """
+        key = (access_key, secret_key, region_id)
+        now = time.time()
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            # Idle clients are stacked by last use, so stale ones sit at the bottom.
+            while idle and self._expired(idle[0][1], now):
+                idle.pop(0)
+                self.evictions += 1
+            if len(idle) >= self.max_size:
+                self.evictions += 1
+                return
+            idle.append((conn, now))
+
+    @contextmanager
+    def client(self, access_key, secret_key, region_id):
+        conn = self.acquire(access_key, secret_key, region_id)
+        try:
+            yield conn
+        finally:
+            self.release(access_key, secret_key, region_id, conn)
+
+    def clear(self):
+        """
+        Drop every idle client.
+        """
+        with self._lock:
+            self._idle.clear()
+
+    def size(self):
+        """
+        Return the number of idle clients currently held.
+        """
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    def stats(self):
+        """
+        Return the reuse counters as a dict.
+        """
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'idle': self.size()}
+
+    def _expired(self, last_used, now):
+        return bool(self.idle_timeout) and now - last_used > self.idle_timeout
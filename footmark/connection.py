@@ -1,19 +1,26 @@
 # coding:utf-8
-import sys
-
-reload(sys)
-sys.setdefaultencoding("utf-8")
 """
 Handles basic connections to ACS
 """
 
 import footmark
 import importlib
-from footmark.exception import FootmarkServerError
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from footmark.bulk import BulkExecutor, RateLimiter
+from footmark.cache import LRUCache, ResponseCache
+from footmark.clientpool import ClientPool
+from footmark.exception import FootmarkClientError, FootmarkServerError
+from footmark.logsupport import LazyBody, log_response
 from footmark.provider import Provider
+from footmark.retry import RetryPolicies, is_read
+from footmark.waiter import Waiter
 import json
+import re
+import six
 
-from aliyunsdkcore import client
+_upper_case = re.compile('([A-Z])')
+_converted_names = LRUCache(4096)
 
 
 class ACSAuthConnection(object):
@@ -36,6 +43,7 @@ class ACSAuthConnection(object):
         :keyword str region: The region ID.
 
         """
+        footmark.init_logging()
         self.region = region
         if isinstance(provider, Provider):
             # Allow overriding Provider
@@ -63,11 +71,134 @@ class ACSAuthConnection(object):
         return self.region
 
 
+class RequestRegistry(object):
+    """
+    Resolves the SDK request class of each action of a product once and
+    caches it together with its setter methods, so that building a
+    request is a couple of dict lookups instead of an import and a chain
+    of attribute probes.
+    """
+    _registries = {}
+    _registries_lock = threading.Lock()
+
+    def __init__(self, product):
+        self.product = product
+        self._actions = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_product(cls, product):
+        """
+        Return the process-wide registry of the given product, such as
+        ``aliyunsdkecs.request.v20140526``.
+        """
+        registry = cls._registries.get(product)
+        if registry is None:
+            with cls._registries_lock:
+                registry = cls._registries.setdefault(product, cls(product))
+        return registry
+
+    def resolve(self, action):
+        """
+        Return the request class of an action and a dict mapping the
+        names of its ``set_*`` methods to the methods themselves.
+        """
+        entry = self._actions.get(action)
+        if entry is None:
+            with self._lock:
+                entry = self._actions.get(action)
+                if entry is None:
+                    module = importlib.import_module(self.product + '.' + action + 'Request')
+                    request_cls = getattr(module, action + 'Request')
+                    setters = dict((name, getattr(request_cls, name))
+                                   for name in dir(request_cls) if name.startswith('set_'))
+                    entry = (request_cls, setters)
+                    self._actions[action] = entry
+        return entry
+
+    def warm_up(self, actions):
+        """
+        Resolve a list of actions ahead of their first request.
+        """
+        for action in actions:
+            self.resolve(action)
+
+    def build(self, action, params=None):
+        """
+        Create a JSON request for an action, applying each ``set_*`` param
+        through its setter or as a query param when the request class has
+        no such setter.
+        """
+        request_cls, setters = self.resolve(action)
+        request = request_cls()
+        request.set_accept_format('json')
+        if params and isinstance(params, dict):
+            for k, v in params.items():
+                setter = setters.get(k)
+                if setter is not None:
+                    setter(request, v)
+                else:
+                    request.add_query_param(k[4:], v)
+        return request
+
+
 class ACSQueryConnection(ACSAuthConnection):
     ResponseError = FootmarkServerError
+    ClientPoolSize = 10
+    ClientPoolIdleTimeout = 300
+    MaxPageSize = 50
+    BulkConcurrency = 10
+    BulkRateLimit = None
+    LogBodyLimit = 4096
+    LogBodySampleRate = 1.0
+    WaitTimeout = 600
+    WaitDelay = 1
+    WaitMaxDelay = 30
+    RequestRateLimit = None
+    ThrottleRetries = 5
+    ThrottleDelay = 1
+    ThrottleMaxDelay = 20
 
     def __init__(self, acs_access_key_id=None, acs_secret_access_key=None,
-                 region=None, product=None, security_token=None, provider='acs'):
+                 region=None, product=None, security_token=None, provider='acs',
+                 client_pool=None, pool_size=None, pool_idle_timeout=None, warm_actions=None,
+                 bulk_concurrency=None, bulk_rate_limit=None, response_cache=None, cache_ttl=None,
+                 request_rate_limit=None, throttle_retries=None, retry_policies=None):
+        """
+        :keyword client_pool: A :class:`footmark.clientpool.ClientPool` to
+            borrow AcsClient objects from. Pass the same pool to several
+            connections to share clients between them. If none is specified,
+            the connection creates its own pool.
+        :keyword int pool_size: The maximum number of idle clients the
+            connection's own pool keeps per credentials and region.
+        :keyword int pool_idle_timeout: Seconds an idle client may stay
+            unused before it is discarded.
+        :keyword list warm_actions: Actions, such as ``DescribeInstances``,
+            whose request classes are resolved when the connection is
+            created instead of on their first request.
+        :keyword int bulk_concurrency: The maximum number of requests a bulk
+            operation, such as starting many instances, runs at once.
+        :keyword float bulk_rate_limit: The maximum number of bulk requests
+            per second issued to the connection's region. The limit is shared
+            by every connection to the same region and the first connection
+            to set it decides its value.
+        :keyword response_cache: A :class:`footmark.cache.ResponseCache`
+            serving repeated Describe* requests from memory. Pass the same
+            cache to several connections to share it. Caching is off unless
+            a cache or ``cache_ttl`` is given.
+        :keyword int cache_ttl: Create a response cache of the connection's
+            own, keeping responses for this many seconds.
+        :keyword request_rate_limit: The maximum number of requests per
+            second of each action, or a dict of per-action limits such as
+            ``{'DescribeInstances': 10}``. The limit of an action is shared
+            by every connection with the same account, region and product.
+        :keyword int throttle_retries: How many times a request the server
+            throttled is retried, with exponential backoff.
+        :keyword retry_policies: The :class:`footmark.retry.RetryPolicies`
+            deciding which failed requests are retried. Defaults to
+            retrying throttled requests, and idempotent requests that failed
+            on a server or network error.
+        """
         super(ACSQueryConnection, self).__init__(
             acs_access_key_id,
             acs_secret_access_key,
@@ -76,90 +207,289 @@ class ACSQueryConnection(ACSAuthConnection):
             provider=provider)
 
         self.product = product
+        if client_pool is None:
+            if pool_size is None:
+                pool_size = self.ClientPoolSize
+            if pool_idle_timeout is None:
+                pool_idle_timeout = self.ClientPoolIdleTimeout
+            client_pool = ClientPool(pool_size, pool_idle_timeout)
+        self.client_pool = client_pool
+        self.request_registry = RequestRegistry.for_product(product)
+        if warm_actions:
+            self.request_registry.warm_up(warm_actions)
+
+        if bulk_concurrency is None:
+            bulk_concurrency = self.BulkConcurrency
+        if bulk_rate_limit is None:
+            bulk_rate_limit = self.BulkRateLimit
+        limiter = None
+        if bulk_rate_limit:
+            region_id = getattr(self.region, 'id', None) or self.region
+            limiter = RateLimiter.shared(('bulk', region_id), bulk_rate_limit)
+        self.bulk_executor = BulkExecutor(bulk_concurrency, limiter)
+
+        if response_cache is None and cache_ttl:
+            response_cache = ResponseCache(cache_ttl)
+        self.response_cache = response_cache
+
+        if request_rate_limit is None:
+            request_rate_limit = self.RequestRateLimit
+        if isinstance(request_rate_limit, dict):
+            self.request_rate_limits = dict(request_rate_limit)
+            self.request_rate_limit = None
+        else:
+            self.request_rate_limits = {}
+            self.request_rate_limit = request_rate_limit
+        if retry_policies is None:
+            if throttle_retries is None:
+                throttle_retries = self.ThrottleRetries
+            retry_policies = RetryPolicies.default(throttle_retries, self.ThrottleDelay, self.ThrottleMaxDelay)
+        self.retry_policies = retry_policies
+        # Seconds spent waiting for the client-side limiters
+        self.rate_limit_waited = 0.0
+        self._counters_lock = threading.Lock()
 
     def make_request(self, action, params=None):
-        conn = client.AcsClient(self.acs_access_key_id, self.acs_secret_access_key, self.region)
-        if not conn:
-            footmark.log.error('%s %s' % ('Null AcsClient ', conn))
-            raise self.FootmarkClientError('Null AcsClient ', conn)
-        if action:
-            module = importlib.import_module(self.product + '.' + action + 'Request')
-            request = getattr(module, action + 'Request')()
-            request.set_accept_format('json')
-            if params and isinstance(params, dict):
-                for k, v in params.items():
-                    if hasattr(request, k):
-                        getattr(request, k)(v)
-                    else:
-                        request.add_query_param(k[4:], v)
-        return conn.get_response(request)
+        with self.client_pool.client(self.acs_access_key_id, self.acs_secret_access_key, self.region) as conn:
+            if not conn:
+                footmark.log.error('Null AcsClient %s', conn)
+                raise FootmarkClientError('Null AcsClient ', conn)
+            if action:
+                request = self.request_registry.build(action, params)
+            return conn.get_response(request)
+
+    def send(self, action, params):
+        """
+        Send a request through the client-side rate limiter of its action,
+        retrying it as the retry policies decide when it fails.
+
+        :return: The status, headers and body of the last response
+        """
+        limiter = self.request_limiter(action)
+
+        def send_once():
+            if limiter is not None:
+                waited = limiter.acquire()
+                with self._counters_lock:
+                    self.rate_limit_waited += waited
+            return self.make_request(action, params)
+
+        return self.retry_policies.call(action, params, send_once)
+
+    @property
+    def throttled_requests(self):
+        return self.retry_policies['throttling'].retries
+
+    @property
+    def throttle_waited(self):
+        return self.retry_policies['throttling'].waited
+
+    def request_limiter(self, action):
+        """
+        Return the rate limiter of an action, or None if it is not limited.
+        """
+        rate = self.request_rate_limits.get(action, self.request_rate_limit)
+        if not rate:
+            return None
+        return RateLimiter.shared(self.cache_scope() + (action,), rate)
+
+    def wait_until(self, check, description=None, timeout=None, max_delay=None):
+        """
+        Poll ``check`` with exponential backoff until it returns a true value.
+
+        :type check: callable
+        :param check: Called without arguments, returns a true value once the
+            wanted state is reached.
+
+        :type description: str
+        :param description: What is waited for, used in the timeout error.
+
+        :type timeout: int
+        :param timeout: Seconds to wait at most, defaults to ``WaitTimeout``.
+
+        :type max_delay: int
+        :param max_delay: The longest pause between two checks, defaults to
+            ``WaitMaxDelay``.
+
+        :return: The first true value returned by ``check``
+        :raises: :class:`footmark.exception.WaiterTimeoutError`
+        """
+        waiter = Waiter(timeout or self.WaitTimeout, self.WaitDelay, max_delay or self.WaitMaxDelay)
+        return waiter.wait(check, description)
 
     def build_list_params(self, params, items, label):
         params['set_%s' % label] = items
 
     def parse_response(self, markers, response, connection):
-        results = []
-        response = json.loads(response, encoding='UTF-8')
+        if isinstance(response, bytes):
+            # Decoding up front lets the C scanner parse the whole document
+            response = response.decode('utf-8')
+        response = json.loads(response)
+        return [self.parse_item(markers, item, connection) for item in self.response_items(markers, response)]
+
+    def response_items(self, markers, response):
+        """
+        Return the raw item dicts listed under ``markers[0]`` of a decoded
+        response, such as the instances of ``{"Instances": {"Instance": [...]}}``.
+        """
         if markers and markers[0] in response:
-            for value in response[markers[0]].itervalues():
+            for value in six.itervalues(response[markers[0]]):
                 if value is None or len(value) < 1:
-                    return results
-                for item in value:
-                    element = markers[1](connection)
-                    self.parse_dict(element, item)
-                    results.append(element)
-        return results
+                    return []
+                return value
+        return []
+
+    def parse_item(self, markers, item, connection):
+        """
+        Parse one raw item into an instance of ``markers[1]``. If no class is
+        given the raw item is returned unchanged.
+        """
+        if markers[1] is None:
+            return item
+        element = markers[1](connection)
+        self.parse_dict(element, item)
+        return element
 
     def parse_dict(self, element, dict_data):
+        """
+        Set each key of ``dict_data`` as a snake_case attribute of ``element``.
+        The keys of nested dicts are also set on ``element`` directly, and the
+        attribute holding a nested dict gets a copy of it with snake_case keys.
+        """
         if not isinstance(dict_data, dict):
             return
+        convert_name = self.convert_name
+        self._parse_items(element, [(convert_name(k), v) for k, v in dict_data.items()])
 
-        for k, v in dict_data.items():
+    def _parse_items(self, element, items):
+        # Names are converted once, when a dict is first seen; the converted
+        # copy of a nested dict is walked as is.
+        convert_name = self.convert_name
+        for name, v in items:
             if isinstance(v, dict):
-                value = {}
-                for kk, vv in v.items():
-                    value[self.convert_name(kk)] = vv
-                v = value
-                self.parse_dict(element, v)
-            setattr(element, self.convert_name(k), v)
+                v = dict((convert_name(kk), vv) for kk, vv in v.items())
+                self._parse_items(element, v.items())
+            setattr(element, name, v)
 
     def convert_name(self, name):
+        """
+        Convert a CamelCase response key, such as ``InstanceId``, into its
+        snake_case attribute name. Conversions are memoized in a bounded LRU
+        shared by every connection.
+        """
         if name:
-            new_name = ''
-            for ch in name:
-                if ch.isupper():
-                    ch = '_' + ch.lower()
-                new_name += ch
-            if new_name.startswith('_'):
-                new_name = new_name[1:]
+            new_name = _converted_names.get(name)
+            if new_name is None:
+                new_name = _upper_case.sub(r'_\1', name).lower()
+                if new_name.startswith('_'):
+                    new_name = new_name[1:]
+                _converted_names.set(name, new_name)
             return new_name
 
     # generics
 
+    def paginate(self, action, params, markers, page_size=None, prefetch=False):
+        """
+        Lazily iterate over every item of a paged Describe* action, fetching
+        one page after another until ``TotalCount`` items have been seen.
+
+        :type action: str
+        :param action: The paged action, such as ``DescribeInstances``.
+
+        :type params: dict
+        :param params: The request params. A ``set_PageNumber`` param sets
+            the first page to fetch.
+
+        :type markers: list
+        :param markers: The response key listing the items and the class to
+            parse each item into, as for :meth:`get_list`. If the class is
+            None the raw item dicts are yielded.
+
+        :type page_size: int
+        :param page_size: The number of items per page. Defaults to
+            ``MaxPageSize``.
+
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background while the
+            items of the current one are being consumed.
+
+        :rtype: generator
+        :return: The items of all the pages
+        """
+        params = dict(params or {})
+        page_size = page_size or self.MaxPageSize
+        page_number = int(params.get('set_PageNumber') or 1)
+        executor = ThreadPoolExecutor(1) if prefetch else None
+        pending = None
+        try:
+            while True:
+                if pending is not None:
+                    response = pending.result()
+                else:
+                    response = self.get_page(action, params, page_number, page_size)
+                items = self.response_items(markers, response)
+                effective_size = int(response.get('PageSize') or page_size)
+                total = response.get('TotalCount')
+                if total is not None:
+                    more = bool(items) and page_number * effective_size < int(total)
+                else:
+                    more = len(items) >= effective_size
+                pending = None
+                if more and executor:
+                    pending = executor.submit(self.get_page, action, params, page_number + 1, page_size)
+                for item in items:
+                    yield self.parse_item(markers, item, self)
+                if not more:
+                    return
+                page_number += 1
+        finally:
+            if executor:
+                executor.shutdown(wait=False)
+
+    def get_page(self, action, params, page_number, page_size):
+        params = dict(params)
+        params['set_PageNumber'] = page_number
+        params['set_PageSize'] = page_size
+        return self.get_status(action, params)
+
     def get_list(self, action, params, markers):
-        response = self.make_request(action, params)
-        body = response[-1]
-        if not body:
-            footmark.log.error('Null body %s' % body)
-            raise self.ResponseError(response[0], body)
-        elif response[0] in (200, 201):
-            footmark.log.info('status= %s ; body= %s' % (response[0], body))
-            return self.parse_response(markers, body, self)
-        else:
-            footmark.log.error('%s %s' % (response[0], body))
-            raise self.ResponseError(response[0], body)
+        body = self.get_body(action, params)
+        return self.parse_response(markers, body, self)
 
     def get_status(self, action, params):
-        response = self.make_request(action, params)
+        body = self.get_body(action, params)
+        return json.loads(body)
+
+    def get_body(self, action, params):
+        """
+        Send a request and return its raw response body, or serve it from the
+        response cache when the connection has one.
+        """
+        cache = self.response_cache
+        key = None
+        if cache is not None and cache.cacheable(action):
+            key = cache.key(self.cache_scope(), action, params)
+            body = cache.get(key)
+            if body is not None:
+                return body
+        try:
+            response = self.send(action, params)
+        finally:
+            if cache is not None and not is_read(action):
+                cache.invalidate(self.cache_scope(), params)
         body = response[-1]
-        footmark.log.debug(body)
         if not body:
-            footmark.log.error('Null body %s' % body)
+            footmark.log.error('%s returned a null body, status=%s', action, response[0])
             raise self.ResponseError(response[0], body)
         elif response[0] in (200, 201):
-            footmark.log.info('status= %s ; body= %s' % (response[0], body))
-            #return 'success'
-            return json.loads(body)
+            log_response(footmark.log, action, response[0], body, self.LogBodyLimit, self.LogBodySampleRate)
+            if key is not None:
+                cache.set(key, action, params, body)
+            return body
         else:
-            footmark.log.error('%s %s' % (response[0], body))
+            footmark.log.error('%s status=%s body=%s', action, response[0], LazyBody(body, self.LogBodyLimit))
             raise self.ResponseError(response[0], body)
+
+    def cache_scope(self):
+        region_id = getattr(self.region, 'id', None) or self.region
+        return (self.acs_access_key_id, region_id, self.product)
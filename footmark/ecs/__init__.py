@@ -3,6 +3,7 @@ This module provides an interface to the Elastic Compute Service (ECS) service f
 """
 from footmark.ecs.connection import ECSConnection
 from footmark.regioninfo import get_regions
+from footmark import regioninfo
 
 
 def regions(**kw_params):
@@ -47,7 +48,4 @@ def get_region(region_id, **kw_params):
     :return: The RegionInfo object for the given region or None if
              an invalid region name is provided.
     """
-    for region in regions(**kw_params):
-        if region.id == region_id:
-            return region
-    return None
+    return regioninfo.get_region('ecs', region_id, connection_cls=ECSConnection)
@@ -8,14 +8,17 @@ import warnings
 import six
 import time
 import json
+from collections import OrderedDict
 
+import footmark
+from concurrent.futures import ThreadPoolExecutor
+from footmark.bulk import BulkExecutor
 from footmark.connection import ACSQueryConnection
 from footmark.ecs.instance import Instance
 from footmark.ecs.regioninfo import RegionInfo
 from footmark.ecs.securitygroup import SecurityGroup
 from footmark.ecs.volume import Disk
-from footmark.exception import ECSResponseError
-from functools import wraps
+from footmark.exception import ECSResponseError, WaiterTimeoutError
 
 
 class ECSConnection(ACSQueryConnection):
@@ -23,9 +26,11 @@ class ECSConnection(ACSQueryConnection):
     DefaultRegionId = 'cn-hangzhou'
     DefaultRegionName = u'杭州'.encode("UTF-8")
     ResponseError = ECSResponseError
+    # The most security group IDs DescribeSecurityGroups takes per call
+    MaxSecurityGroupIds = 100
 
     def __init__(self, acs_access_key_id=None, acs_secret_access_key=None,
-                 region=None, sdk_version=None, security_token=None, ):
+                 region=None, sdk_version=None, security_token=None, **kwargs):
         """
         Init method to create a new connection to ECS.
         """
@@ -40,7 +45,8 @@ class ECSConnection(ACSQueryConnection):
 
         super(ECSConnection, self).__init__(acs_access_key_id,
                                             acs_secret_access_key,
-                                            self.region, self.ECSSDK, security_token)
+                                            self.region, self.ECSSDK, security_token,
+                                            **kwargs)
 
     def build_filter_params(self, params, filters):
         if not isinstance(filters, dict):
@@ -74,10 +80,19 @@ class ECSConnection(ACSQueryConnection):
 
     # Instance methods
 
-    def get_all_instances(self, instance_ids=None, filters=None, max_results=None):
+    def get_all_instances(self, instance_ids=None, filters=None, max_results=None,
+                          with_volumes=True, with_security_groups=True):
         """
         Retrieve all the instance associated with your account. 
 
+        :type with_volumes: bool
+        :param with_volumes: Attach a ``block_device_mapping`` of the disks
+            of each instance, keyed by disk ID.
+
+        :type with_security_groups: bool
+        :param with_security_groups: Attach the ``security_groups`` of each
+            instance.
+
         :rtype: list
         :return: A list of  :class:`footmark.ecs.instance`
 
@@ -94,21 +109,94 @@ class ECSConnection(ACSQueryConnection):
         if max_results is not None:
             params['MaxResults'] = max_results
         instances = self.get_list('DescribeInstances', params, ['Instances', Instance])
-        for inst in instances:
-            filters = {}
-            filters['instance_id'] = inst.id
-            volumes = self.get_all_volumes(filters=filters)
-            block_device_mapping = {}
-            for vol in volumes:
-                block_device_mapping[vol.id] = vol
-            setattr(inst, 'block_device_mapping', block_device_mapping)
-            filters = {}
-            filters['security_group_id'] = inst.security_group_id
-            security_groups = self.get_all_security_groups(filters=filters)
-            setattr(inst, 'security_groups', security_groups)
+        if instances and with_volumes:
+            self.attach_block_device_mappings(instances)
+        if instances and with_security_groups:
+            self.attach_security_groups(instances)
 
         return instances
 
+    def attach_block_device_mappings(self, instances):
+        """
+        Set the ``block_device_mapping`` of each instance, listing the disks
+        of the instances with one paginated DescribeDisks per zone of the
+        instances and joining them by instance ID. The disks of the whole
+        region are listed when the zone of an instance is unknown.
+
+        :type instances: list
+        :param instances: A list of :class:`footmark.ecs.instance`
+        """
+        zone_ids = list(OrderedDict.fromkeys(getattr(inst, 'zone_id', None) for inst in instances))
+        if None in zone_ids:
+            zone_ids = [None]
+        described = self.bulk_executor.map(
+            lambda zone_id: list(self.iter_volumes(filters={'zone_id': zone_id} if zone_id else None)), zone_ids)
+        described.raise_first_error()
+        volumes = dict((inst.id, {}) for inst in instances)
+        for zone_volumes in described.values():
+            for vol in zone_volumes:
+                if vol.instance_id in volumes:
+                    volumes[vol.instance_id][vol.id] = vol
+        for inst in instances:
+            setattr(inst, 'block_device_mapping', dict(volumes[inst.id]))
+
+    def attach_security_groups(self, instances):
+        """
+        Set the ``security_groups`` of each instance, describing only their
+        groups with paginated DescribeSecurityGroups calls filtered by up to
+        MaxSecurityGroupIds group IDs each.
+
+        :type instances: list
+        :param instances: A list of :class:`footmark.ecs.instance`
+        """
+        group_ids = {}
+        for inst in instances:
+            group_id = inst.security_group_id
+            if isinstance(group_id, list):
+                group_id = group_id[0] if group_id else None
+            group_ids[inst.id] = group_id
+        groups = OrderedDict((group_id, []) for group_id in group_ids.values() if group_id)
+        if groups:
+            ids = list(groups)
+            limit = self.MaxSecurityGroupIds
+            chunks = [tuple(ids[start:start + limit]) for start in range(0, len(ids), limit)]
+
+            def describe(chunk):
+                params = {}
+                self.build_list_params(params, json.dumps(chunk), 'SecurityGroupIds')
+                return list(self.paginate('DescribeSecurityGroups', params, ['SecurityGroups', SecurityGroup]))
+
+            described = self.bulk_executor.map(describe, chunks)
+            described.raise_first_error()
+            for chunk_groups in described.values():
+                for group in chunk_groups:
+                    if group.id in groups:
+                        groups[group.id].append(group)
+        for inst in instances:
+            setattr(inst, 'security_groups', list(groups.get(group_ids[inst.id], [])))
+
+    def iter_instances(self, instance_ids=None, filters=None, page_size=None, prefetch=False):
+        """
+        Iterate over all the instances associated with your account, fetching
+        them page by page. Unlike get_all_instances, the instances are not
+        enriched with their volumes and security groups.
+
+        :type page_size: int
+        :param page_size: The number of instances fetched per request
+
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+
+        :rtype: generator
+        :return: :class:`footmark.ecs.instance`
+        """
+        params = {}
+        if instance_ids:
+            self.build_list_params(params, instance_ids, 'InstanceIds')
+        if filters:
+            self.build_filter_params(params, filters)
+        return self.paginate('DescribeInstances', params, ['Instances', Instance], page_size, prefetch)
+
     def describe_instances(self, instance_ids=None, filters=None, max_results=None):
         """
         Retrieve all the instance associated with your account.
@@ -147,16 +235,7 @@ class ECSConnection(ACSQueryConnection):
         :rtype: list
         :return: A list of the instances started
         """
-        params = {}
-        results = []
-        if instance_ids:
-            if isinstance(instance_ids, six.string_types):
-                instance_ids = [instance_ids]
-            for instance_id in instance_ids:
-                self.build_list_params(params, instance_id, 'InstanceId')
-                if self.get_status('StartInstance', params):
-                    results.append(instance_id)
-        return results
+        return self.instance_action_ids(self.run_instance_action('StartInstance', instance_ids))
 
     def stop_instances(self, instance_ids=None, force=False):
         """
@@ -172,17 +251,9 @@ class ECSConnection(ACSQueryConnection):
         :return: A list of the instances stopped
         """
         params = {}
-        results = []
         if force:
             self.build_list_params(params, 'true', 'ForceStop')
-        if instance_ids:
-            if isinstance(instance_ids, six.string_types):
-                instance_ids = [instance_ids]
-            for instance_id in instance_ids:
-                self.build_list_params(params, instance_id, 'InstanceId')
-                if self.get_status('StopInstance', params):
-                    results.append(instance_id)
-        return results
+        return self.instance_action_ids(self.run_instance_action('StopInstance', instance_ids, params))
 
     def reboot_instances(self, instance_ids=None, force=False):
         """
@@ -196,18 +267,9 @@ class ECSConnection(ACSQueryConnection):
 
         """
         params = {}
-        results = []
         if force:
             self.build_list_params(params, 'true', 'ForceStop')
-        if instance_ids:
-            if isinstance(instance_ids, six.string_types):
-                instance_ids = [instance_ids]
-            for instance_id in instance_ids:
-                self.build_list_params(params, instance_id, 'InstanceId')
-                if self.get_status('RebootInstance', params):
-                    results.append(instance_id)
-
-        return results
+        return self.instance_action_ids(self.run_instance_action('RebootInstance', instance_ids, params))
 
     def terminate_instances(self, instance_ids=None, force=False):
         """
@@ -223,17 +285,43 @@ class ECSConnection(ACSQueryConnection):
         :return: A list of the instance_ids terminated
         """
         params = {}
-        result = []
         if force:
             self.build_list_params(params, 'true', 'Force')
-        if instance_ids:
-            if isinstance(instance_ids, six.string_types):
-                instance_ids = [instance_ids]
-            for instance_id in instance_ids:
-                self.build_list_params(params, instance_id, 'InstanceId')
-                if self.get_status('DeleteInstance', params):
-                    result.append(instance_id)
-        return result
+        return self.instance_action_ids(self.run_instance_action('DeleteInstance', instance_ids, params))
+
+    def run_instance_action(self, action, instance_ids, params=None):
+        """
+        Issue one request of the given action per instance, running them
+        concurrently on the connection's bulk executor.
+
+        :type action: str
+        :param action: The per-instance action, such as StartInstance
+
+        :type instance_ids: list
+        :param instance_ids: A list of strings of the Instance IDs
+
+        :type params: dict
+        :param params: Params shared by every request, besides InstanceId
+
+        :rtype: :class:`footmark.bulk.BulkResult`
+        :return: The response or the raised error of each instance
+        """
+        if not instance_ids:
+            instance_ids = []
+        elif isinstance(instance_ids, six.string_types):
+            instance_ids = [instance_ids]
+
+        def call(instance_id):
+            instance_params = dict(params or {})
+            self.build_list_params(instance_params, instance_id, 'InstanceId')
+            return self.get_status(action, instance_params)
+
+        return self.bulk_executor.map(call, instance_ids)
+
+    def instance_action_ids(self, results):
+        # Keep the former list-of-ids return value, raising like the former serial loop did.
+        results.raise_first_error()
+        return [instance_id for instance_id, response in results.items() if response]
 
     def get_all_volumes(self, volume_ids=None, filters=None):
         """
@@ -267,6 +355,34 @@ class ECSConnection(ACSQueryConnection):
             self.build_filter_params(params, filters)
         return self.get_list('DescribeDisks', params, ['Disks', Disk])
 
+    def iter_volumes(self, volume_ids=None, filters=None, page_size=None, prefetch=False):
+        """
+        Iterate over all the Volumes associated with the current credentials,
+        fetching them page by page.
+
+        :type volume_ids: list
+        :param volume_ids: Optional list of volume ids.
+
+        :type filters: dict
+        :param filters: Optional filters that can be used to limit
+                        the results returned.
+
+        :type page_size: int
+        :param page_size: The number of volumes fetched per request
+
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+
+        :rtype: generator
+        :return: The requested Volume objects
+        """
+        params = {}
+        if volume_ids:
+            self.build_list_params(params, volume_ids, 'DiskIds')
+        if filters:
+            self.build_filter_params(params, filters)
+        return self.paginate('DescribeDisks', params, ['Disks', Disk], page_size, prefetch)
+
     def get_security_status(self, vpc_id=None, group_ids=None):
         """
         Querying Security Group List returns the basic information about all
@@ -305,7 +421,8 @@ class ECSConnection(ACSQueryConnection):
                         description=None, internet_data=None, host_name=None, password=None, io_optimized=None,
                         system_disk=None, disks=None, vswitch_id=None, private_ip=None, count=None,
                         allocate_public_ip=None, bind_eip=None, instance_charge_type=None, period=None, auto_renew=None,
-                        auto_renew_period=None, instance_tags=None, ids=None, wait=None, wait_timeout=None):
+                        auto_renew_period=None, instance_tags=None, ids=None, wait=None, wait_timeout=None,
+                        launch_concurrency=None):
         """
         create an instance in ecs
 
@@ -412,6 +529,11 @@ class ECSConnection(ACSQueryConnection):
         :type wait_timeout: int
         :param wait_timeout: time interval of waiting
 
+        :type launch_concurrency: int
+        :param launch_concurrency: The maximum number of instances created,
+            started or configured at once, defaults to the connection's
+            bulk concurrency
+
         :rtype: dict
         :return: Returns a dictionary of instance information about
             the instances started/stopped. If the instance was not
@@ -422,8 +544,6 @@ class ECSConnection(ACSQueryConnection):
         """
 
         params = {}
-        results = []
-        changed = False
 
         # Datacenter Zone ID
         if zone_id:
@@ -544,68 +664,150 @@ class ECSConnection(ACSQueryConnection):
                                 'tag_value'], 'Tag' + str(tag_no) + 'Value')
                             tag_no += 1
 
-        # Client Token
-        if ids:
-            if len(ids) == count:
-                self.build_list_params(params, ids, 'ClientToken')
+        # Client Token, one per instance
+        client_tokens = ids if ids and len(ids) == count else None
 
-        for i in range(count):
-            # CreateInstance method call, returns newly created instanceId
+        changed, results, instance_ids = self.launch_instances(params, count, client_tokens, allocate_public_ip,
+                                                               bind_eip, launch_concurrency)
+
+        if str(wait).lower() in ['yes', 'true'] and wait_timeout:
             try:
-                response = self.get_status('CreateInstance', params)
-                instance_id = response['InstanceId']
-                results.append({"instance_id": instance_id})
-                changed = True
+                self.check_instance_is_running(instance_ids, timeout=wait_timeout)
+            except WaiterTimeoutError as ex:
+                results.append({"Error Code": ex.error_code, "Error Message": ex.message})
+
+        return changed, results
+
+    def launch_instances(self, params, count, client_tokens=None, allocate_public_ip=None, bind_eip=None,
+                         concurrency=None):
+        """
+        Create instances concurrently and bring each one up as soon as it is
+        ready: start it once it is stopped, then allocate its public IP and
+        bind its EIP once it is running. All the instances waiting for a
+        state are polled together with one DescribeInstances per tick.
+
+        :type params: dict
+        :param params: The CreateInstance params shared by the instances
 
+        :type count: int
+        :param count: The number of instances to create
+
+        :type client_tokens: list
+        :param client_tokens: One ClientToken per instance, so that creating
+            the instances again does not create duplicates
+
+        :type concurrency: int
+        :param concurrency: The maximum number of requests run at once
+
+        :rtype: tuple
+        :return: Whether any instance was created, the results and errors in
+            the format of create_instance, and the IDs of the new instances
+        """
+        results = []
+        changed = False
+        concurrency = concurrency or self.bulk_executor.concurrency
+
+        def error_result(ex):
+            return {"Error Code": getattr(ex, 'error_code', None), "Error Message": getattr(ex, 'message', str(ex))}
+
+        def create(index):
+            instance_params = dict(params)
+            if client_tokens:
+                self.build_list_params(instance_params, client_tokens[index], 'ClientToken')
+            return self.get_status('CreateInstance', instance_params)['InstanceId']
+
+        # CreateInstance method call, returns newly created instanceId
+        created = BulkExecutor(concurrency, self.bulk_executor.limiter).map(create, range(count))
+        instance_ids = []
+        for instance_id in created.values():
+            if isinstance(instance_id, Exception):
+                results.append(error_result(instance_id))
+                continue
+            results.append({"instance_id": instance_id})
+            instance_ids.append(instance_id)
+            changed = True
+        if not instance_ids:
+            return changed, results, instance_ids
+
+        def start(instance_id):
+            start_params = {}
+            self.build_list_params(start_params, instance_id, 'InstanceId')
+            try:
+                self.get_status('StartInstance', start_params)
             except Exception as ex:
-                error_code = ex.error_code
-                error_msg = ex.message
-                results.append({"Error Code": error_code, "Error Message": error_msg})
-            else:
+                return [error_result(ex)]
+            return []
+
+        def configure(instance_id):
+            errors = []
+            # Allocate Public IP Address
+            if allocate_public_ip:
+                ip_params = {}
+                self.build_list_params(ip_params, instance_id, 'InstanceId')
                 try:
-                    time.sleep(30)
-                    # Start newly created Instance
-                    self.start_instances(instance_id)
-                    # get instance in running mode
-                    self.check_instance_is_running(instance_id=instance_id)
-
+                    self.get_status('AllocatePublicIpAddress', ip_params)
                 except Exception as ex:
-                    error_code = ex.error_code
-                    error_msg = ex.message
-                    results.append({"Error Code": error_code, "Error Message": error_msg})
+                    errors.append(error_result(ex))
+            # Allocate EIP Address
+            if bind_eip:
+                eip_params = {}
+                self.build_list_params(eip_params, bind_eip, 'AllocationId')
+                self.build_list_params(eip_params, instance_id, 'InstanceId')
+                try:
+                    self.get_status('AssociateEipAddress', eip_params)
+                except Exception as ex:
+                    errors.append(error_result(ex))
+            return errors
+
+        # The status each instance waits for next, or the stage it is in
+        stages = OrderedDict((instance_id, 'Stopped') for instance_id in instance_ids)
+        tasks = {}
+        executor = ThreadPoolExecutor(min(concurrency, len(instance_ids)))
+
+        def check():
+            for instance_id, task in list(tasks.items()):
+                if not task.done():
+                    continue
+                del tasks[instance_id]
+                errors = task.result()
+                results.extend(errors)
+                if stages[instance_id] == 'starting':
+                    stages[instance_id] = 'failed' if errors else 'Running'
                 else:
-                    # Allocate Public IP Address
-                    try:
-                        if allocate_public_ip:
-                            # allocate allocate public ip
-                            allocate_public_ip_params = {}
-                            self.build_list_params(allocate_public_ip_params, instance_id, 'InstanceId')
-                            public_ip_address_status = self.get_status('AllocatePublicIpAddress',
-                                                                       allocate_public_ip_params)
-                    except Exception as ex:
-                        error_code = ex.error_code
-                        error_msg = ex.message
-                        results.append({"Error Code": error_code, "Error Message": error_msg})
-
-                    # Allocate EIP Address
-                    try:
-                        if bind_eip:
-                            allocate_eip_params = {}
-                            self.build_list_params(
-                                allocate_eip_params, bind_eip, 'AllocationId')
-                            self.build_list_params(
-                                allocate_eip_params, instance_id, 'InstanceId')
-                            eip_address = self.get_status(
-                                'AssociateEipAddress', allocate_eip_params)
-                    except Exception as ex:
-                        error_code = ex.error_code
-                        error_msg = ex.message
-                        results.append({"Error Code": error_code, "Error Message": error_msg})
+                    stages[instance_id] = 'done'
+
+            waiting = [instance_id for instance_id, stage in stages.items() if stage in ('Stopped', 'Running')]
+            for item in self.describe_instance_items(waiting):
+                instance_id = item['InstanceId']
+                if str(item.get('Status')).lower() != stages.get(instance_id, '').lower():
+                    continue
+                if stages[instance_id] == 'Stopped':
+                    # A new instance can only be started once it is stopped
+                    stages[instance_id] = 'starting'
+                    tasks[instance_id] = executor.submit(start, instance_id)
+                else:
+                    stages[instance_id] = 'configuring'
+                    tasks[instance_id] = executor.submit(configure, instance_id)
+            return all(stage in ('done', 'failed') for stage in stages.values())
 
-        if str(wait).lower() in ['yes', 'true'] and wait_timeout:
-            time.sleep(wait_timeout)
+        try:
+            self.wait_until(check, 'instances to be running')
+        except Exception as ex:
+            results.append(error_result(ex))
+        finally:
+            executor.shutdown(wait=True)
+        return changed, results, instance_ids
 
-        return changed, results
+    def describe_instance_items(self, instance_ids):
+        """
+        Yield the raw DescribeInstances item of each given instance, asking
+        for up to 100 instances per request, the most the API accepts.
+        """
+        for i in range(0, len(instance_ids), 100):
+            params = {}
+            self.build_list_params(params, json.dumps(instance_ids[i:i + 100]), 'InstanceIds')
+            for item in self.paginate('DescribeInstances', params, ['Instances', None]):
+                yield item
 
     def modify_instance(self, attributes=None):
         """
@@ -682,6 +884,27 @@ class ECSConnection(ACSQueryConnection):
 
         return False, results
 
+    def iter_instance_status(self, zone_id=None, page_size=None, prefetch=False):
+        """
+        Iterate over the status of all instances, fetching them page by page
+
+        :type zone_id: string
+        :param zone_id: Optional parameter. ID of the zone to which an instance belongs
+
+        :type page_size: integer
+        :param page_size: The number of statuses fetched per request. The maximum value is 50.
+
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+
+        :rtype: generator
+        :return: dicts holding the InstanceId and Status of each instance
+        """
+        params = {}
+        if zone_id:
+            self.build_list_params(params, zone_id, 'ZoneId')
+        return self.paginate('DescribeInstanceStatus', params, ['InstanceStatuses', None], page_size, prefetch)
+
     def join_security_group(self, instance_ids, group_id):
         """
         Assign an existing instance to a pre existing security group
@@ -694,7 +917,6 @@ class ECSConnection(ACSQueryConnection):
 
         :return: Success message, confirming joining security group or error message if any
         """
-        params = {}
         results = []
         changed = False
 
@@ -704,39 +926,24 @@ class ECSConnection(ACSQueryConnection):
             results.append("Error Message: " + "instance_ids must be of type list")
             return changed, results
 
-        instance_count = len(instance_ids)
         success_instance_ids = []
         failed_instance_ids = []
 
-        for counter in range(0, instance_count):
-            id_of_instance = instance_ids[counter]
-
-            # Instance Id, which is to be added to a security group
-            self.build_list_params(params, id_of_instance, 'InstanceId')
-
-            # Security Group ID, an already existing security group, to which instance is added
-            self.build_list_params(params, group_id, 'SecurityGroupId')
-
-            # Method Call, to perform adding action
-            try:
-                obtained_result = self.get_status('JoinSecurityGroup', params)
+        errors = self.update_security_group_membership(instance_ids, group_id, join=True)
+        for id_of_instance, ex in errors.items():
+            if ex is None:
                 results.append("Successfully added instance '" + str(
                     id_of_instance) + "' to security group " + str(group_id))
-
-                # Verifying whether operation got performed successfully
-                self.verify_join_remove_securitygrp(id_of_instance, group_id, 'join')
                 success_instance_ids.append(id_of_instance)
                 changed = True
-
-            except Exception as ex:
-                error_code = ex.error_code
+            else:
                 failed_instance_ids.append(id_of_instance)
                 error_msg = "Join security group failed for instance: '" + str(
                     id_of_instance) + "' to security group " + str(
                     group_id)
                 results.append(error_msg)
-                results.append("Error Code: " + error_code)
-                results.append("Error Message: " + ex.message)
+                results.append("Error Code: " + str(getattr(ex, 'error_code', None)))
+                results.append("Error Message: " + str(getattr(ex, 'message', ex)))
 
         return changed, results, success_instance_ids, failed_instance_ids
 
@@ -752,7 +959,6 @@ class ECSConnection(ACSQueryConnection):
 
         :return: Success message, confirming joining security group or error message if any
         """
-        params = {}
         results = []
 
         if not isinstance(instance_ids, list):
@@ -761,45 +967,71 @@ class ECSConnection(ACSQueryConnection):
             results.append("Error Message: " + "instance_ids must be of type list")
             return changed, results
 
-        instance_count = len(instance_ids)
         changed = False
 
         success_instance_ids = []
         failed_instance_ids = []
 
-        for counter in range(0, instance_count):
-            id_of_instance = instance_ids[counter]
-
-            # Instance Id to be removed from a security group
-            self.build_list_params(params, id_of_instance, 'InstanceId')
-
-            # Security Group ID, an already existing security group, from which instance is removed
-            self.build_list_params(params, group_id, 'SecurityGroupId')
-
-            # Method Call, to perform adding action
-            try:
-                obtained_result = self.get_status('LeaveSecurityGroup', params)
+        errors = self.update_security_group_membership(instance_ids, group_id, join=False)
+        for id_of_instance, ex in errors.items():
+            if ex is None:
                 results.append("Successfully removed instance " + str(
                     id_of_instance) + " from security group " + str(group_id))
-
-                # Verifying whether operation got performed successfully
-                self.verify_join_remove_securitygrp(id_of_instance, group_id, 'remove')
                 success_instance_ids.append(id_of_instance)
                 changed = True
-
-            except Exception as ex:
-                error_code = ex.error_code
+            else:
                 failed_instance_ids.append(id_of_instance)
                 error_msg = "Leave security group failed for instance: '" + str(
                     id_of_instance) + "' from security group " + str(
                     group_id)
 
                 results.append(error_msg)
-                results.append("Error Code" + error_code)
-                results.append("Error Message" + ex.message)
+                results.append("Error Code" + str(getattr(ex, 'error_code', None)))
+                results.append("Error Message" + str(getattr(ex, 'message', ex)))
 
         return changed, results, success_instance_ids, failed_instance_ids
 
+    def update_security_group_membership(self, instance_ids, group_id, join=True, timeout=None):
+        """
+        Add many instances to a security group, or remove them from it. The
+        JoinSecurityGroup or LeaveSecurityGroup calls run concurrently, then
+        the instances they succeeded for are verified together, with one
+        DescribeInstances per tick.
+
+        :type instance_ids: list
+        :param instance_ids: A list of strings of the Instance IDs
+
+        :type group_id: str
+        :param group_id: ID of the security group
+
+        :type join: bool
+        :param join: Join the group if True, leave it otherwise
+
+        :type timeout: int
+        :param timeout: Seconds to wait at most for the verification
+
+        :rtype: OrderedDict
+        :return: The error of each instance, or None for the instances that
+            joined or left the group
+        """
+        params = {}
+        self.build_list_params(params, group_id, 'SecurityGroupId')
+        action = 'JoinSecurityGroup' if join else 'LeaveSecurityGroup'
+        results = self.run_instance_action(action, instance_ids, params)
+        errors = OrderedDict((instance_id, result if isinstance(result, Exception) else None)
+                             for instance_id, result in results.items())
+        done = results.succeeded
+        if done:
+            try:
+                self.verify_join_remove_securitygrp(done, group_id, 'join' if join else 'remove', timeout)
+            except WaiterTimeoutError as ex:
+                for instance_id in ex.pending:
+                    errors[instance_id] = ex
+            except Exception as ex:
+                for instance_id in done:
+                    errors[instance_id] = ex
+        return errors
+
     def get_all_security_groups(self, group_ids=None, filters=None):
         """
         Get all security groups associated with your account in a region.
@@ -828,6 +1060,35 @@ class ECSConnection(ACSQueryConnection):
             self.build_filter_params(params, filters)
         return self.get_list('DescribeSecurityGroups', params, ['SecurityGroups', SecurityGroup])
 
+    def iter_security_groups(self, group_ids=None, filters=None, page_size=None, prefetch=False):
+        """
+        Iterate over all security groups associated with your account in a
+        region, fetching them page by page.
+
+        :type group_ids: list
+        :param group_ids: A list of IDs of security groups to retrieve
+
+        :type filters: dict
+        :param filters: Optional filters that can be used to limit
+                        the results returned.
+
+        :type page_size: int
+        :param page_size: The number of security groups fetched per request
+
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+
+        :rtype: generator
+        :return: SecurityGroup objects
+        """
+        params = {}
+        if group_ids:
+            self.build_list_params(params, group_ids, 'SecurityGroupId')
+        if filters:
+            self.build_filter_params(params, filters)
+        return self.paginate('DescribeSecurityGroups', params, ['SecurityGroups', SecurityGroup],
+                             page_size, prefetch)
+
     def create_security_group(self, group_name=None, group_description=None, group_tags=None, vpc_id=None):
         """
         create and authorize security group in ecs
@@ -931,21 +1192,6 @@ class ECSConnection(ACSQueryConnection):
             "outbound": outbound_rules,
         }
 
-        api_group_id_param_name = {
-            "inbound": "SourceGroupId",
-            "outbound": "DestGroupId",
-        }
-
-        api_group_owner_param_name = {
-            "inbound": "SourceGroupOwnerId",
-            "outbound": "DestGroupOwnerId",
-        }
-
-        api_cidr_ip_param_name = {
-            "inbound": "SourceCidrIp",
-            "outbound": "DestCidrIp",
-        }
-
         failure_rule_choice = {
             "inbound": inbound_failed_rules,
             "outbound": outbound_failed_rules
@@ -953,9 +1199,6 @@ class ECSConnection(ACSQueryConnection):
 
         changed = False
 
-        tcp_udp_default_port_range = "1/65535"
-        other_default_port_range = "-1/-1"
-
         if inbound_rules:
             rule_types.append('inbound')
 
@@ -976,34 +1219,11 @@ class ECSConnection(ACSQueryConnection):
 
                 for rule in rules:
 
-                    params = {}
-
-                    self.build_list_params(params, security_group_id, 'SecurityGroupId')
-
                     ip_protocol = rule['ip_protocol']
 
-                    self.build_list_params(params, ip_protocol, 'IpProtocol')
-
                     port_range = str(rule['port_range'])
 
-                    self.build_list_params(params, port_range, 'PortRange')
-
-                    if 'group_id' in rule:
-                        self.build_list_params(params, rule['group_id'], api_group_id_param_name.get(rule_type))
-
-                    if 'cidr_ip' in rule:
-                        self.build_list_params(params, rule['cidr_ip'], api_cidr_ip_param_name.get(rule_type))
-
-                    if 'group_owner_id' in rule:
-                        self.build_list_params(params, rule['group_owner_id'],
-                                               api_group_owner_param_name.get(rule_type))
-
-                    if 'policy' in rule:
-                        self.build_list_params(params, rule['policy'], 'Policy')
-                    if 'priority' in rule:
-                        self.build_list_params(params, rule['priority'], 'Priority')
-                    if 'nic_type' in rule:
-                        self.build_list_params(params, rule['nic_type'], 'NicType')
+                    params = self.security_group_rule_params(security_group_id, rule_type, rule)
 
                     try:
                         self.get_status(api_action.get(rule_type), params)
@@ -1029,6 +1249,168 @@ class ECSConnection(ACSQueryConnection):
 
         return changed, inbound_failed_rules, outbound_failed_rules, result_details
 
+    def security_group_rule_params(self, security_group_id, rule_type, rule):
+        """
+        Build the params authorizing or revoking one rule.
+
+        :type rule_type: str
+        :param rule_type: ``inbound`` or ``outbound``
+
+        :type rule: dict
+        :param rule: The rule, as given to authorize_security_group
+        """
+        prefix = 'Source' if rule_type == 'inbound' else 'Dest'
+        params = {}
+        self.build_list_params(params, security_group_id, 'SecurityGroupId')
+        self.build_list_params(params, rule['ip_protocol'], 'IpProtocol')
+        self.build_list_params(params, self.rule_port_range(rule), 'PortRange')
+        if 'group_id' in rule:
+            self.build_list_params(params, rule['group_id'], prefix + 'GroupId')
+        if 'cidr_ip' in rule:
+            self.build_list_params(params, rule['cidr_ip'], prefix + 'CidrIp')
+        if 'group_owner_id' in rule:
+            self.build_list_params(params, rule['group_owner_id'], prefix + 'GroupOwnerId')
+        if 'policy' in rule:
+            self.build_list_params(params, rule['policy'], 'Policy')
+        if 'priority' in rule:
+            self.build_list_params(params, rule['priority'], 'Priority')
+        if 'nic_type' in rule:
+            self.build_list_params(params, rule['nic_type'], 'NicType')
+        return params
+
+    def rule_port_range(self, rule):
+        if rule.get('port_range'):
+            return str(rule['port_range'])
+        if str(rule['ip_protocol']).lower() in ('tcp', 'udp'):
+            return '1/65535'
+        return '-1/-1'
+
+    def security_group_rule_key(self, rule_type, rule, vpc=False):
+        """
+        Return what identifies a rule: its direction, protocol, port range,
+        CIDR block or peer group and its owner, policy, priority and NIC
+        type, with the defaults of the API filled in.
+
+        :type vpc: bool
+        :param vpc: Whether the rule belongs to a VPC security group, whose
+            rules are all on the intranet NIC type, like the rules peering
+            with another group.
+        """
+        nic_type = rule.get('nic_type') or ('intranet' if vpc or rule.get('group_id') else 'internet')
+        return (rule_type,
+                str(rule['ip_protocol']).lower(),
+                self.rule_port_range(rule),
+                rule.get('cidr_ip') or '',
+                rule.get('group_id') or '',
+                str(rule.get('group_owner_id') or ''),
+                str(rule.get('policy') or 'accept').lower(),
+                str(rule.get('priority') or 1),
+                str(nic_type).lower())
+
+    def get_security_group_rules(self, security_group_id, nic_types=('internet', 'intranet')):
+        """
+        Get the rules of a security group, describing its permissions once
+        per NIC type, concurrently.
+
+        :rtype: tuple
+        :return: The ID of the VPC of the group, or None, and an OrderedDict
+            of the ``(rule type, rule)`` pairs of the group, keyed by
+            :meth:`security_group_rule_key`. The rules are dicts in the
+            format taken by authorize_security_group.
+        """
+        def describe(nic_type):
+            params = {}
+            self.build_list_params(params, security_group_id, 'SecurityGroupId')
+            self.build_list_params(params, nic_type, 'NicType')
+            return self.get_status('DescribeSecurityGroupAttribute', params)
+
+        responses = self.bulk_executor.map(describe, nic_types)
+        responses.raise_first_error()
+        rules = OrderedDict()
+        vpc_id = None
+        for response in responses.values():
+            vpc_id = vpc_id or response.get('VpcId') or None
+            for permission in (response.get('Permissions') or {}).get('Permission') or []:
+                rule_type = 'inbound' if permission.get('Direction', 'ingress') == 'ingress' else 'outbound'
+                prefix = 'Source' if rule_type == 'inbound' else 'Dest'
+                rule = {'ip_protocol': permission['IpProtocol'], 'port_range': permission['PortRange']}
+                if permission.get(prefix + 'CidrIp'):
+                    rule['cidr_ip'] = permission[prefix + 'CidrIp']
+                if permission.get(prefix + 'GroupId'):
+                    rule['group_id'] = permission[prefix + 'GroupId']
+                owner_id = permission.get(prefix + 'GroupOwnerId') or permission.get(prefix + 'GroupOwnerAccount')
+                if owner_id:
+                    rule['group_owner_id'] = owner_id
+                for key, name in (('policy', 'Policy'), ('priority', 'Priority'), ('nic_type', 'NicType')):
+                    if permission.get(name):
+                        rule[key] = permission[name]
+                rules[self.security_group_rule_key(rule_type, rule)] = (rule_type, rule)
+        return vpc_id, rules
+
+    def sync_security_group_rules(self, security_group_id, inbound_rules=None, outbound_rules=None, purge=True):
+        """
+        Make the rules of a security group match the given ones, authorizing
+        only the missing rules and revoking only the extra ones. The group's
+        rules are described once and the changes are applied concurrently,
+        revocations first.
+
+        :type security_group_id: string
+        :param security_group_id: The ID of the target security group
+
+        :type inbound_rules: list
+        :param inbound_rules: The wanted inbound rules, in the format taken
+            by authorize_security_group. If None, the inbound rules are left
+            as they are.
+
+        :type outbound_rules: list
+        :param outbound_rules: The wanted outbound rules. If None, the
+            outbound rules are left as they are.
+
+        :type purge: bool
+        :param purge: Revoke the rules of the synced directions that are not
+            wanted. If False, rules are only added.
+
+        :rtype: tuple
+        :return: changed, the rules authorized, the rules revoked and the
+            rules that failed, with their 'Error Code' and 'Error Message'
+        """
+        rule_types = [rule_type for rule_type, rules in (('inbound', inbound_rules), ('outbound', outbound_rules))
+                      if rules is not None]
+        if not rule_types:
+            return False, [], [], []
+
+        vpc_id, current = self.get_security_group_rules(security_group_id)
+        wanted = OrderedDict()
+        for rule_type, rules in (('inbound', inbound_rules), ('outbound', outbound_rules)):
+            for rule in rules or []:
+                wanted[self.security_group_rule_key(rule_type, rule, vpc=bool(vpc_id))] = (rule_type, rule)
+        to_revoke = [key for key in current if key not in wanted and key[0] in rule_types] if purge else []
+        to_authorize = [key for key in wanted if key not in current]
+
+        def apply(actions, rules):
+            def call(key):
+                rule_type, rule = rules[key]
+                params = self.security_group_rule_params(security_group_id, rule_type, rule)
+                return self.get_status(actions[rule_type], params)
+            return call
+
+        revoked = self.bulk_executor.map(
+            apply({'inbound': 'RevokeSecurityGroup', 'outbound': 'RevokeSecurityGroupEgress'}, current), to_revoke)
+        authorized = self.bulk_executor.map(
+            apply({'inbound': 'AuthorizeSecurityGroup', 'outbound': 'AuthorizeSecurityGroupEgress'}, wanted),
+            to_authorize)
+
+        failed_rules = []
+        for rules, results in ((current, revoked), (wanted, authorized)):
+            for key, ex in results.errors.items():
+                rule = dict(rules[key][1])
+                rule['Error Code'] = getattr(ex, 'error_code', None)
+                rule['Error Message'] = getattr(ex, 'message', str(ex))
+                failed_rules.append(rule)
+        changed = bool(revoked.succeeded or authorized.succeeded)
+        return (changed, [wanted[key][1] for key in authorized.succeeded],
+                [current[key][1] for key in revoked.succeeded], failed_rules)
+
     def delete_security_group(self, group_ids):
         """
         Delete Security Group , delete security group inside particular region.
@@ -1496,6 +1878,7 @@ class ECSConnection(ACSQueryConnection):
                 request_id = response['RequestId']
 
             image_sharing_results = []
+            timed_out = False
             if launch_permission and image_id:
                 sharing_changed, image_sharing_results = self.set_launch_perms(launch_permission, image_id)
 
@@ -1503,9 +1886,14 @@ class ECSConnection(ACSQueryConnection):
                 if wait.lower() in ['yes', 'true']:
                     if not wait_timeout:
                         wait_timeout = 300
-                    time.sleep(wait_timeout)
+                    try:
+                        self.wait_for_image_status(image_id, 'Available', wait_timeout)
+                    except WaiterTimeoutError as ex:
+                        timed_out = True
+                        results.append({"Error Code": ex.error_code, "Error Message": ex.message})
 
-            results.append("Image creation successful")
+            if not timed_out:
+                results.append("Image creation successful")
 
             changed = True
 
@@ -1605,33 +1993,55 @@ class ECSConnection(ACSQueryConnection):
 
         return changed, results
 
-    def get_snapshot_image(self, snapshot_id):
+    def wait_for_image_status(self, image_id, status, timeout=None):
+        """
+        Poll an image until it reaches the given status.
+
+        :type image_id: str
+        :param image_id: The ID of the image
+
+        :type status: str
+        :param status: The wanted status, such as Available
+
+        :type timeout: int
+        :param timeout: Seconds to wait at most
+        """
+        params = {}
+        self.build_list_params(params, image_id, 'ImageId')
+
+        def check():
+            response = self.get_status('DescribeImages', params)
+            images = response and response['Images']['Image']
+            return bool(images) and str(images[0]['Status']).lower() == status.lower()
+
+        return self.wait_until(check, 'image %s to be %s' % (image_id, status), timeout)
+
+    def get_snapshot_image(self, snapshot_id, timeout=1260):
         params = {}
         results = []
         progress = ''
         changed = False
-        counter = 0
+        snapshot = {}
+        self.build_list_params(params, [snapshot_id], 'SnapshotIds')
+
+        def check():
+            obtained_results = self.get_status('DescribeSnapshots', params)
+            snapshot.clear()
+            if obtained_results and len(obtained_results['Snapshots']['Snapshot']) > 0:
+                snapshot.update(obtained_results['Snapshots']['Snapshot'][0])
+                return '100%' in snapshot['Progress']
+            # Nothing to wait for
+            return True
+
         try:
-            while changed == False:
-                self.build_list_params(params, [snapshot_id], 'SnapshotIds')
-
-                if counter > 20:
-                    break
-                obtained_results = self.get_status('DescribeSnapshots', params)
-                counter += 1
-                if obtained_results and len(obtained_results['Snapshots']['Snapshot']) > 0:
-                    status = obtained_results['Snapshots']['Snapshot'][0]['Status']
-                    progress = obtained_results['Snapshots']['Snapshot'][0]['Progress']
-
-                    if not '100%' in progress:
-                        time.sleep(60)
-                    else:
-                        changed = True
-                        progress = '100'
-                        break
-                else:
-                    results.append({"Error Code": "Invalid.SnapshotId", "Error Message": "The snapshot id not found"})
-                    break
+            self.wait_until(check, 'snapshot %s' % snapshot_id, timeout, max_delay=60)
+            if snapshot:
+                changed = True
+                progress = '100'
+            else:
+                results.append({"Error Code": "Invalid.SnapshotId", "Error Message": "The snapshot id not found"})
+        except WaiterTimeoutError:
+            progress = snapshot.get('Progress', '')
         except Exception as ex:
             error_code = ex.error_code
             error_msg = ex.message
@@ -1659,77 +2069,71 @@ class ECSConnection(ACSQueryConnection):
 
         return instance_details, results
 
-    # retry decorator
-    def retry(ExceptionToCheck, tries=10, delay=30, backoff=2, logger=None):
+    def check_instance_is_running(self, instance_id, timeout=None):
+        """
+        Wait until one or more instances are running.
+        """
+        return self.wait_for_instances(instance_id, 'Running', timeout=timeout)
 
-        def deco_retry(f):
+    def wait_for_instances(self, instance_ids, state=None, predicate=None, timeout=None):
+        """
+        Wait until every instance reaches the given state, polling all the
+        instances still pending with one paginated DescribeInstances per tick.
 
-            @wraps(f)
-            def f_retry(*args, **kwargs):
-                mtries, mdelay = tries, delay
-                while mtries > 1:
-                    try:
-                        return f(*args, **kwargs)
-                    except ExceptionToCheck, e:
-                        time.sleep(mdelay)
-                        mtries -= 1
-                        mdelay *= backoff
-                return f(*args, **kwargs)
+        :type instance_ids: list
+        :param instance_ids: A list of strings of the Instance IDs
 
-            return f_retry  # true decorator
+        :type state: str
+        :param state: The wanted status, such as Running or Stopped
 
-        return deco_retry
+        :type predicate: callable
+        :param predicate: Called with the raw DescribeInstances item of an
+            instance, returns True once the instance is ready. Used instead of
+            ``state`` to wait for something other than a status.
 
-    # Use retry decorator
-    @retry(Exception, tries=3)
-    def check_instance_is_running(self, instance_id):
-        try:
-            params = {}
-            self.build_list_params(params, instance_id, 'InstanceId')
-            # get instance details
-            instance_info = self.get_status('DescribeInstanceAttribute', params)
+        :type timeout: int
+        :param timeout: Seconds to wait at most
 
-            if instance_info:
-                # wait until instance status becomes running
-                instance_status = str(instance_info[u'Status'])
-                while instance_status not in ["Running", "running"]:
-                    # get instance details
-                    time.sleep(30)
-                    instance_info = self.get_status('DescribeInstanceAttribute', params)
-                    instance_status = str(instance_info[u'Status'])
-
-        except Exception:
-            raise Exception
-
-    @retry(Exception, tries=3)
-    def verify_join_remove_securitygrp(self, instance_id, group_id, mode):
+        :rtype: OrderedDict
+        :return: The seconds each instance took to become ready, keyed by ID
+        :raises: :class:`footmark.exception.WaiterTimeoutError` listing the
+            instances still pending in its ``pending`` attribute
         """
-        To verify join & remove operations got performed in security group
-        """
-        done = False
-        count = 0
-        id_of_instance = [instance_id]
+        if isinstance(instance_ids, six.string_types):
+            instance_ids = [instance_ids]
+        if predicate is None:
+            predicate = lambda item: str(item.get('Status')).lower() == state.lower()
+        start = time.time()
+        pending = list(instance_ids)
+        timings = OrderedDict((instance_id, None) for instance_id in instance_ids)
+
+        def check():
+            ready = set(item['InstanceId'] for item in self.describe_instance_items(pending) if predicate(item))
+            now = time.time()
+            for instance_id in ready:
+                if timings.get(instance_id, 0) is None:
+                    timings[instance_id] = now - start
+            pending[:] = [instance_id for instance_id in pending if instance_id not in ready]
+            return not pending
+
+        description = 'instances to be %s' % state if state else 'instances'
         try:
-            while done != True:
-                time.sleep(5)
-                instance_list = self.get_all_instances(id_of_instance, None, None)
-                if len(instance_list) > 0:
-                    if mode.lower() == 'join':
-                        for inst in instance_list:
-                            if len(inst.security_group_ids['security_group_id']) > 0:
-                                for grp in inst.security_group_ids['security_group_id']:
-                                    if grp == group_id:
-                                        done = True
-
-                    elif mode.lower() == 'remove':
-                        for inst in instance_list:
-                            if len(inst.security_group_ids['security_group_id']) > 0:
-                                for grp in inst.security_group_ids['security_group_id']:
-                                    if grp == group_id:
-                                        count = count + 1
-                                if count == 0:
-                                    done = True
-        except Exception as ex:
-            raise Exception
+            self.wait_until(check, description, timeout)
+        except WaiterTimeoutError as ex:
+            ex.pending = list(pending)
+            raise
+        footmark.log.debug('Instances ready after (s): %s', dict(timings))
+        return timings
+
+    def verify_join_remove_securitygrp(self, instance_id, group_id, mode, timeout=None):
+        """
+        To verify join & remove operations got performed in security group,
+        for one instance ID or a list of them
+        """
+        join = mode.lower() == 'join'
+
+        def predicate(item):
+            group_ids = item.get('SecurityGroupIds', {}).get('SecurityGroupId') or []
+            return (group_id in group_ids) == join
 
-        return done
\ No newline at end of file
+        return self.wait_for_instances(instance_id, predicate=predicate, timeout=timeout)
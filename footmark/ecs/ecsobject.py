@@ -1,4 +1,52 @@
+import six
+
+
+class ECSObjectMeta(type):
+    """
+    Builds the attribute schema of an ECS resource class from its
+    declaration:
+
+    - ``fields``: the attributes stored in slots instead of the instance
+      ``__dict__``. Attributes missing from ``fields`` still work, they are
+      kept in ``__dict__``.
+    - ``aliases``: maps alternative attribute names to the field they read
+      and write, such as ``id`` to ``instance_id``.
+    - ``prefix_aliases``: maps a name prefix to its replacement, such as
+      ``volume`` to ``disk`` so that ``volume_id`` means ``disk_id``.
+    - ``_set_<field>`` methods: convert a value before it is stored.
+    - ``_get_<name>`` methods: compute an attribute that is not stored.
+
+    The tables of a class include those of its bases, and the resolution of
+    each prefixed name is remembered, so resolving a name is a dict lookup.
+    """
+
+    def __new__(mcs, name, bases, attrs):
+        if '__slots__' not in attrs:
+            attrs = dict(attrs, __slots__=tuple(attrs.get('fields', ())))
+        cls = super(ECSObjectMeta, mcs).__new__(mcs, name, bases, attrs)
+        cls._resolved = {}
+        cls._prefix_aliases = ()
+        cls._setters = {}
+        cls._getters = {}
+        for klass in reversed(cls.__mro__):
+            cls._resolved.update(klass.__dict__.get('aliases', {}))
+            cls._prefix_aliases += tuple(klass.__dict__.get('prefix_aliases', ()))
+            for attr, value in klass.__dict__.items():
+                if attr.startswith('_set_'):
+                    cls._setters[attr[5:]] = value
+                elif attr.startswith('_get_'):
+                    cls._getters[attr[5:]] = value
+        return cls
+
+
+@six.add_metaclass(ECSObjectMeta)
 class ECSObject(object):
+    # Attributes outside the declared fields go to __dict__
+    __slots__ = ('connection', 'region', '__dict__')
+    fields = ()
+    aliases = {}
+    prefix_aliases = ()
+
     def __init__(self, connection=None):
         self.connection = connection
         if self.connection and hasattr(self.connection, 'region'):
@@ -6,6 +54,57 @@ class ECSObject(object):
         else:
             self.region = None
 
+    @classmethod
+    def resolve_name(cls, name):
+        """
+        Return the attribute that stores ``name``, following aliases.
+        """
+        resolved = cls._resolved.get(name)
+        if resolved is None:
+            resolved = name
+            for prefix, replacement in cls._prefix_aliases:
+                if name.startswith(prefix):
+                    resolved = replacement + name[len(prefix):]
+                    break
+            cls._resolved[name] = resolved
+        return resolved
+
+    def __getattr__(self, name):
+        # Only called when normal lookup fails, so ``name`` is either an alias,
+        # a computed attribute or an attribute that has not been set.
+        getter = self._getters.get(name)
+        if getter is not None:
+            return getter(self)
+        resolved = self.resolve_name(name)
+        if resolved == name:
+            raise AttributeError(name)
+        return getattr(self, resolved)
+
+    def __setattr__(self, name, value):
+        name = self.resolve_name(name)
+        setter = self._setters.get(name)
+        if setter is not None:
+            value = setter(self, value)
+        object.__setattr__(self, name, value)
+
+    def attributes(self):
+        """
+        Return a dict of every attribute set on the object, besides its
+        connection and region.
+        """
+        values = dict(getattr(self, '__dict__', {}))
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('fields', ()):
+                try:
+                    values[name] = object.__getattribute__(self, name)
+                except AttributeError:
+                    pass
+        return values
+
+    def _update(self, updated):
+        for name, value in updated.attributes().items():
+            object.__setattr__(self, name, value)
+
 
 class TaggedECSObject(ECSObject):
     """
@@ -17,6 +116,12 @@ class TaggedECSObject(ECSObject):
     into a dict that is stored in the "tags" attribute of the
     object.
     """
+    fields = ('tags', 'tag')
 
     def __init__(self, connection=None):
         super(TaggedECSObject, self).__init__(connection)
+
+    def _set_tags(self, value):
+        if value and 'tag' in value:
+            value = dict((tag.get('TagKey'), tag.get('TagValue', None)) for tag in value['tag'])
+        return value
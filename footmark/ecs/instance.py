@@ -1,6 +1,8 @@
 """
 Represents an ECS Instance
 """
+import six
+
 from footmark.ecs.ecsobject import *
 
 
@@ -9,6 +11,34 @@ class Instance(TaggedECSObject):
     Represents an instance.
     """
 
+    fields = (
+        'instance_id', 'instance_name', 'description', 'image_id', 'region_id', 'zone_id', 'cpu', 'memory',
+        'instance_type', 'instance_type_family', 'host_name', 'serial_number', 'status', 'creation_time',
+        'expired_time', 'instance_charge_type', 'internet_charge_type', 'internet_max_bandwidth_in',
+        'internet_max_bandwidth_out', 'instance_network_type', 'io_optimized', 'device_available', 'vlan_id',
+        'key_pair_name', 'spot_strategy', 'stopped_mode', 'deployment_set_id', 'os_name', 'os_type',
+        'inner_ip_address', 'public_ip_address', 'private_ip_address', 'ip_address', 'nat_ip_address',
+        'eip_address', 'allocation_id', 'bandwidth', 'vpc_attributes', 'vpc_id', 'v_switch_id',
+        'security_group_ids', 'security_group_id', 'security_groups', 'security_group_name',
+        'operation_locks', 'lock_reason', 'network_interfaces', 'network_interface', 'block_device_mapping',
+    )
+    aliases = {
+        'id': 'instance_id',
+        'state': 'status',
+        'private_ip': 'inner_ip_address',
+        'inner_ip': 'inner_ip_address',
+        'public_ip': 'public_ip_address',
+        'assign_public_ip': 'public_ip_address',
+        'vpc_private_ip': 'private_ip_address',
+        'vpc_vswitch_id': 'v_switch_id',
+        'vswitch_id': 'v_switch_id',
+        'vpc_subnet_id': 'v_switch_id',
+        'subnet_id': 'v_switch_id',
+        'group_id': 'security_group_id',
+        'group_name': 'security_group_name',
+        'groups': 'security_groups',
+    }
+
     def __init__(self, connection=None):
         super(Instance, self).__init__(connection)
         self.tags = {}
@@ -16,65 +46,40 @@ class Instance(TaggedECSObject):
     def __repr__(self):
         return 'Instance:%s' % self.id
 
-    def __getattr__(self, name):
-        if name == 'id':
-            return self.instance_id
-        if name == 'state':
-            return self.status
-        if name in ('private_ip', 'inner_ip', 'inner_ip_address'):
-            return self.inner_ip_address
-        if name in ('public_ip', 'assign_public_ip'):
-            return self.public_ip_address
-        if name == 'vpc_private_ip':
-            return self.private_ip_address
-        if name in ('vpc_vswitch_id', 'vswitch_id', 'vpc_subnet_id', 'subnet_id'):
-            return self.v_switch_id
-        if name == 'eip' and self.eip_address:
-            return self.eip_address.get('ip_address', None)
-        if name in ('group_id', 'security_group_id'):
-            return self.security_group_id
-        if name in ('group_name', 'security_group_name') and self.security_groups:
-            return self.security_groups[0].security_group_name
-        if name == 'groups':
-            return self.security_groups
-        raise AttributeError
-
-    def __setattr__(self, name, value):
-        if name == 'id':
-            self.instance_id = value
-        if name == 'status':
-            value = value.lower()
-        if name == 'state':
-            self.status = value
-        if name in ('public_ip_address', 'inner_ip_address', 'private_ip_address'):
-            if isinstance(value, dict) and value['ip_address']:
-                value = value['ip_address'][0]
-        if name in ('private_ip', 'inner_ip'):
-            self.inner_ip_address = value
-        if name in ('public_ip', 'assign_public_ip'):
-            self.public_ip_address = value
-        if name == 'vpc_private_ip':
-            self.private_ip_address = value
-        if name in ('vpc_vswitch_id', 'vswitch_id', 'vpc_subnet_id', 'subnet_id'):
-            self.v_switch_id = value
-        if name == 'eip' and self.eip_address:
+    def _set_status(self, value):
+        return value.lower() if isinstance(value, six.string_types) else value
+
+    def _set_inner_ip_address(self, value):
+        if isinstance(value, dict) and value['ip_address']:
+            value = value['ip_address'][0]
+        return value
+
+    _set_public_ip_address = _set_private_ip_address = _set_inner_ip_address
+
+    def _set_security_group_id(self, value):
+        if isinstance(value, list) and value:
+            value = value[0]
+        return value
+
+    def _set_eip(self, value):
+        if getattr(self, 'eip_address', None):
             self.eip_address['ip_address'] = value
-        if name in ('group_id', 'security_group_id'):
-            if isinstance(value, list) and value:
-                value = value[0]
-        if name in ('group_name', 'security_group_name') and self.security_groups:
+        return value
+
+    def _get_eip(self):
+        if getattr(self, 'eip_address', None):
+            return self.eip_address.get('ip_address', None)
+        raise AttributeError('eip')
+
+    def _set_security_group_name(self, value):
+        if getattr(self, 'security_groups', None):
             self.security_groups[0].security_group_name = value
-        if name == 'groups':
-            self.security_groups = value
-        if name == 'tags' and value:
-            v = {}
-            for tag in value['tag']:
-                v[tag.get('TagKey')] = tag.get('TagValue', None)
-            value = v
-        super(TaggedECSObject, self).__setattr__(name, value)
-
-    def _update(self, updated):
-        self.__dict__.update(updated.__dict__)
+        return value
+
+    def _get_security_group_name(self):
+        if getattr(self, 'security_groups', None):
+            return self.security_groups[0].security_group_name
+        raise AttributeError('security_group_name')
 
     def update(self, validate=False):
         """
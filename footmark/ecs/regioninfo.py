@@ -7,7 +7,7 @@ class ECSRegionInfo(RegionInfo):
     """
 
     def __init__(self, connection=None, name=None, id=None,
-                 connection_cls=None):
+                 connection_cls=None, endpoint=None):
         from footmark.ecs.connection import ECSConnection
         super(ECSRegionInfo, self).__init__(connection, name, id,
-                                            ECSConnection)
+                                            ECSConnection, endpoint)
@@ -5,6 +5,16 @@ from footmark.ecs.ecsobject import *
 
 
 class SecurityGroup(TaggedECSObject):
+    fields = (
+        'security_group_id', 'security_group_name', 'description', 'vpc_id', 'region_id', 'creation_time',
+        'available_instance_amount', 'ecs_count', 'permissions', 'permission',
+    )
+    aliases = {
+        'id': 'security_group_id',
+        'name': 'security_group_name',
+    }
+    prefix_aliases = (('group', 'security_group'),)
+
     def __init__(self, connection=None, owner_id=None,
                  name=None, description=None, id=None):
         super(SecurityGroup, self).__init__(connection)
@@ -12,26 +22,3 @@ class SecurityGroup(TaggedECSObject):
 
     def __repr__(self):
         return 'SecurityGroup:%s' % self.id
-
-    def __getattr__(self, name):
-        if name == 'id':
-            return self.security_group_id
-        if name == 'name':
-            return self.security_group_name
-        if name.startswith('group'):
-            return getattr(self, 'security_' + name)
-        raise AttributeError
-
-    def __setattr__(self, name, value):
-        if name == 'id':
-            self.security_group_id = value
-        if name == 'name':
-            self.security_group_name = value
-        if name.startswith('group'):
-            return setattr(self, 'security_' + name, value)
-        if name == 'tags' and value:
-            v = {}
-            for tag in value['tag']:
-                v[tag.get('TagKey')] = tag.get('TagValue', None)
-            value = v
-        super(TaggedECSObject, self).__setattr__(name, value)
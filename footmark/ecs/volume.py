@@ -1,6 +1,8 @@
 """
 Represents an ECS Elastic Block Storage Volume
 """
+import six
+
 from footmark.ecs.ecsobject import *
 
 
@@ -22,6 +24,20 @@ class Disk(TaggedECSObject):
     :ivar encrypted: True if this volume is encrypted.
     """
 
+    fields = (
+        'disk_id', 'disk_name', 'description', 'type', 'category', 'size', 'status', 'region_id', 'zone_id',
+        'instance_id', 'device', 'image_id', 'source_snapshot_id', 'auto_snapshot_policy_id', 'product_code',
+        'creation_time', 'attached_time', 'detached_time', 'expired_time', 'disk_charge_type', 'portable',
+        'delete_with_instance', 'delete_auto_snapshot', 'enable_auto_snapshot',
+        'enable_automated_snapshot_policy', 'operation_locks', 'operation_lock',
+    )
+    aliases = {
+        'id': 'disk_id',
+        'state': 'status',
+        'delete_on_termination': 'delete_with_instance',
+    }
+    prefix_aliases = (('volume', 'disk'),)
+
     def __init__(self, connection=None):
         super(Disk, self).__init__(connection)
         self.tag = {}
@@ -29,37 +45,8 @@ class Disk(TaggedECSObject):
     def __repr__(self):
         return 'Volume:%s' % self.id
 
-    def __getattr__(self, name):
-        if name.startswith('volume'):
-            return getattr(self, 'disk' + name[6:])
-        if name == 'id':
-            return self.disk_id
-        if name == 'state':
-            return self.status
-        if name == 'delete_on_termination':
-            return self.delete_with_instance
-        raise AttributeError
-
-    def __setattr__(self, name, value):
-        if name.startswith('volume'):
-            return setattr(self, 'disk' + name[6:])
-        if name == 'id':
-            self.disk_id = value
-        if name == 'status':
-            value = value.lower()
-        if name == 'state':
-            self.status = value
-        if name == 'delete_on_termination':
-            self.delete_with_instance = value
-        if name == 'tags' and value:
-            v = {}
-            for tag in value['tag']:
-                v[tag.get('TagKey')] = tag.get('TagValue', None)
-            value = v
-        super(TaggedECSObject, self).__setattr__(name, value)
-
-    def _update(self, updated):
-        self.__dict__.update(updated.__dict__)
+    def _set_status(self, value):
+        return value.lower() if isinstance(value, six.string_types) else value
 
     def update(self, validate=False, dry_run=False):
         """
@@ -13,4 +13,4 @@ class VRouterList(TaggedECSObject):
         return 'VRouterList'
 
     def __setattr__(self, name, value):
-        super(TaggedECSObject, self).__setattr__(name, value)
+        object.__setattr__(self, name, value)
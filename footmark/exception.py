@@ -4,6 +4,8 @@ Exception classes - Subclassing allows you to check for specific errors
 
 import json
 
+import six
+
 import footmark
 
 StandardError = Exception
@@ -25,6 +27,24 @@ class FootmarkClientError(StandardError):
         return 'FootmarkClientError: %s' % self.reason
 
 
+class WaiterTimeoutError(FootmarkClientError):
+    """
+    A resource did not reach the wanted state before the waiter's deadline.
+
+    :ivar error_code: Always ``WaiterTimeout``, so callers handling server
+        errors by code can report it the same way.
+    :ivar pending: The resources still not in the wanted state, when the
+        waiter watched several of them.
+    """
+
+    def __init__(self, description, timeout, pending=None):
+        self.error_code = 'WaiterTimeout'
+        self.message = 'Timed out after %s seconds waiting for %s' % (timeout, description)
+        super(WaiterTimeoutError, self).__init__(self.message)
+        self.timeout = timeout
+        self.pending = pending or []
+
+
 class FootmarkServerError(StandardError):
     def __init__(self, status, body=None, *args):
         super(FootmarkServerError, self).__init__(status, body, *args)
@@ -62,6 +82,14 @@ class FootmarkServerError(StandardError):
             self.message = self.body
             self.body = None
 
+        if six.PY2:
+            # Keep messages native strings, so that formatting them with str()
+            # works for non-ASCII messages without changing the default encoding
+            if isinstance(self.message, six.text_type):
+                self.message = self.message.encode('utf-8')
+            if isinstance(self.body, six.text_type):
+                self.body = self.body.encode('utf-8')
+
     def __getattr__(self, name):
         if name == 'error_message':
             return self.message
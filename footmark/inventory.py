@@ -0,0 +1,195 @@
+"""
+Collects the resources of an account across many regions concurrently.
+"""
+import threading
+from collections import namedtuple, OrderedDict
+
+from concurrent.futures import ThreadPoolExecutor
+import six
+from six.moves import queue
+
+from footmark import regioninfo
+from footmark.clientpool import ClientPool
+from footmark.ecs.connection import ECSConnection
+from footmark.slb.connection import SLBConnection
+from footmark.vpc.connection import VPCConnection
+
+InventoryItem = namedtuple('InventoryItem', ['region_id', 'resource', 'item'])
+
+# Marks the end of the listing of one resource type in one region
+_Done = namedtuple('_Done', ['region_id', 'resource', 'error'])
+
+
+class Inventory(object):
+    """
+    Lists resources of several regions at once, running one paginated
+    listing per region and resource type on a bounded thread pool and
+    streaming the items as they arrive.
+
+    One connection is opened per region and service, and every connection
+    borrows its clients from the same pool unless a ``client_pool`` is
+    given in the connection arguments.
+
+    :ivar errors: Maps each ``(region ID, resource)`` whose listing failed
+        during the last :meth:`scan` to the exception it raised. The other
+        listings are not interrupted.
+    """
+
+    # Resource type -> (service, paginated listing method of its connection)
+    collectors = OrderedDict([
+        ('instances', ('ecs', 'iter_instances')),
+        ('disks', ('ecs', 'iter_volumes')),
+        ('security_groups', ('ecs', 'iter_security_groups')),
+        ('vpcs', ('vpc', 'iter_vpcs')),
+        ('vswitches', ('vpc', 'iter_vswitches')),
+        ('eips', ('vpc', 'iter_eip_addresses')),
+        ('load_balancers', ('slb', 'iter_load_balancers')),
+    ])
+
+    connection_classes = {
+        'ecs': ECSConnection,
+        'slb': SLBConnection,
+        'vpc': VPCConnection,
+    }
+
+    def __init__(self, regions='all', resources=None, concurrency=10, page_size=None, buffer_size=1000,
+                 **connection_kwargs):
+        """
+        :type regions: list
+        :param regions: The IDs of the regions to list, or ``'all'`` for
+            every region in which each service has an endpoint.
+
+        :type resources: list
+        :param resources: The resource types to list, keys of
+            ``collectors``. Defaults to all of them.
+
+        :type concurrency: int
+        :param concurrency: The maximum number of listings running at once.
+
+        :type page_size: int
+        :param page_size: The number of items fetched per request.
+
+        :type buffer_size: int
+        :param buffer_size: The maximum number of items fetched ahead of
+            the consumer of :meth:`scan`.
+
+        Any other keyword argument, such as the access keys, is passed to
+        the constructor of each connection.
+        """
+        if isinstance(regions, six.string_types) and regions != 'all':
+            regions = [regions]
+        self.regions = regions
+        self.resources = list(resources or self.collectors)
+        for resource in self.resources:
+            if resource not in self.collectors:
+                raise ValueError('Unknown resource type: %s' % resource)
+        self.concurrency = concurrency
+        self.page_size = page_size
+        self.buffer_size = buffer_size
+        connection_kwargs.setdefault('client_pool', ClientPool())
+        self.connection_kwargs = connection_kwargs
+        self.errors = OrderedDict()
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def region_ids(self, service):
+        """
+        Return the IDs of the regions to list for a service.
+        """
+        if self.regions == 'all':
+            return list(regioninfo.registry.regions(service))
+        return list(self.regions)
+
+    def tasks(self):
+        """
+        Return the ``(region ID, resource)`` listings a scan runs.
+        """
+        tasks = []
+        for resource in self.resources:
+            service = self.collectors[resource][0]
+            tasks.extend((region_id, resource) for region_id in self.region_ids(service))
+        return tasks
+
+    def connection(self, service, region_id):
+        """
+        Return the connection to a service in a region, opening it on first use.
+        """
+        key = (service, region_id)
+        conn = self._connections.get(key)
+        if conn is None:
+            with self._lock:
+                conn = self._connections.get(key)
+                if conn is None:
+                    conn = self.connection_classes[service](region=region_id, **self.connection_kwargs)
+                    self._connections[key] = conn
+        return conn
+
+    def scan(self):
+        """
+        List the resources, yielding each one as soon as its page is
+        fetched. Items of different regions and resource types are
+        interleaved. Failed listings are recorded in ``errors``.
+
+        :rtype: generator
+        :return: :class:`InventoryItem` tuples of region ID, resource type
+            and item
+        """
+        self.errors = OrderedDict()
+        tasks = self.tasks()
+        if not tasks:
+            return
+        results = queue.Queue(self.buffer_size)
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(min(self.concurrency, len(tasks)))
+        try:
+            for region_id, resource in tasks:
+                executor.submit(self._collect, region_id, resource, results, stop)
+            remaining = len(tasks)
+            while remaining:
+                entry = results.get()
+                if isinstance(entry, _Done):
+                    remaining -= 1
+                    if entry.error is not None:
+                        self.errors[(entry.region_id, entry.resource)] = entry.error
+                else:
+                    yield entry
+        finally:
+            # Also reached when the consumer stops early: the workers give up
+            # once their request in flight returns
+            stop.set()
+            executor.shutdown(wait=True)
+
+    def collect(self):
+        """
+        Run a scan and merge its items by resource type.
+
+        :rtype: dict
+        :return: The list of items of each resource type, across regions
+        """
+        inventory = OrderedDict((resource, []) for resource in self.resources)
+        for entry in self.scan():
+            inventory[entry.resource].append(entry.item)
+        return inventory
+
+    def _collect(self, region_id, resource, results, stop):
+        if stop.is_set():
+            return
+        error = None
+        try:
+            service, method = self.collectors[resource]
+            items = getattr(self.connection(service, region_id), method)(page_size=self.page_size)
+            for item in items:
+                if not self._put(results, InventoryItem(region_id, resource, item), stop):
+                    return
+        except Exception as ex:
+            error = ex
+        self._put(results, _Done(region_id, resource, error), stop)
+
+    def _put(self, results, entry, stop):
+        while not stop.is_set():
+            try:
+                results.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
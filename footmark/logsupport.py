@@ -0,0 +1,144 @@
+"""
+Logging helpers that keep request threads off the cost of formatting and
+writing large response bodies.
+"""
+import logging
+import random
+import threading
+from logging.handlers import TimedRotatingFileHandler
+
+import six
+from six.moves import queue
+
+
+class LazyBody(object):
+    """
+    Wraps a response body passed as a logging argument, so that it is only
+    decoded and truncated to ``limit`` characters if the record is emitted.
+    """
+    __slots__ = ('body', 'limit')
+
+    def __init__(self, body, limit=None):
+        self.body = body
+        self.limit = limit
+
+    def __str__(self):
+        body = self.body
+        if isinstance(body, bytes):
+            body = body.decode('utf-8', 'replace')
+        elif not isinstance(body, six.text_type):
+            body = six.text_type(body)
+        if self.limit is not None and len(body) > self.limit:
+            body = u'%s...[%d more characters]' % (body[:self.limit], len(body) - self.limit)
+        return body.encode('utf-8') if six.PY2 else body
+
+
+def log_response(logger, action, status, body, limit=None, sample_rate=1.0):
+    """
+    Log a successful response at DEBUG level as one line carrying the action,
+    status and body size, plus the body truncated to ``limit`` characters.
+    Only a ``sample_rate`` fraction of the records include the body at all.
+
+    The action, status and size are also set on the record as
+    ``acs_action``, ``acs_status`` and ``body_size`` for structured handlers.
+    """
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    size = len(body) if body else 0
+    extra = {'acs_action': action, 'acs_status': status, 'body_size': size}
+    if limit == 0 or (sample_rate < 1 and random.random() >= sample_rate):
+        logger.debug('%s status=%s bytes=%d', action, status, size, extra=extra)
+    else:
+        logger.debug('%s status=%s bytes=%d body=%s', action, status, size, LazyBody(body, limit), extra=extra)
+
+
+class AsyncHandler(logging.Handler):
+    """
+    Queues records for a background thread that passes them to ``target``,
+    so that logging never blocks on I/O. When the queue is full, records are
+    dropped and counted in ``dropped`` rather than blocking the caller.
+    """
+
+    def __init__(self, target, capacity=10000):
+        logging.Handler.__init__(self)
+        self.target = target
+        self.queue = queue.Queue(capacity)
+        self.dropped = 0
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        logging.Handler.setFormatter(self, fmt)
+        self.target.setFormatter(fmt)
+
+    def emit(self, record):
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """
+        Wait until every queued record has been written.
+        """
+        if self._thread is not None:
+            self.queue.join()
+        self.target.flush()
+
+    def close(self):
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self.queue.put(None)
+            thread.join()
+        self.target.close()
+        logging.Handler.close(self)
+
+    def _start(self):
+        with self._thread_lock:
+            if self._thread is None:
+                thread = threading.Thread(target=self._drain, name='footmark-log')
+                thread.daemon = True
+                thread.start()
+                self._thread = thread
+
+    def _drain(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is None:
+                    return
+                self.target.handle(record)
+            except Exception:
+                self.target.handleError(record)
+            finally:
+                self.queue.task_done()
+
+
+class AsyncTimedRotatingFileHandler(AsyncHandler):
+    """
+    A :class:`logging.handlers.TimedRotatingFileHandler` writing from a
+    background thread. It takes the same arguments, so logging config files
+    can use it in place of the synchronous handler.
+    """
+
+    def __init__(self, filename, when='h', interval=1, backupCount=0, encoding=None, delay=True, utc=False):
+        AsyncHandler.__init__(self, TimedRotatingFileHandler(filename, when, interval, backupCount,
+                                                             encoding, delay, utc))
+
+
+def make_async(logger, exclude=()):
+    """
+    Replace the file handlers of ``logger``, other than those in ``exclude``,
+    by :class:`AsyncHandler` objects writing to them, so that handlers set up
+    by logging config files older than :class:`AsyncTimedRotatingFileHandler`
+    stop blocking the threads that log.
+    """
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.FileHandler) and handler not in exclude:
+            async_handler = AsyncHandler(handler)
+            async_handler.setLevel(handler.level)
+            logger.removeHandler(handler)
+            logger.addHandler(async_handler)
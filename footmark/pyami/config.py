@@ -40,7 +40,7 @@ formatter=form01
 args=()
 
 [handler_fileHandler]
-class=handlers.TimedRotatingFileHandler
+class=footmark.logsupport.AsyncTimedRotatingFileHandler
 level=DEBUG
 formatter=form01
 args=('footmark.log','D',1,7)
@@ -68,7 +68,7 @@ DefaultLoggingConfig = {
             'stream': 'ext://sys.stdout'
         },
         'file': {
-            'class': 'logging.handlers.TimedRotatingFileHandler',
+            'class': 'footmark.logsupport.AsyncTimedRotatingFileHandler',
             'formatter': 'default',
             'level': 'DEBUG',
             'filename': LoggingDict + 'footmark.log',
@@ -91,21 +91,25 @@ class Config(object):
         pass
 
     def init_config(self):
+        """
+        Create the config and log directories and the logging config file,
+        leaving whatever already exists untouched.
+        """
         import platform
-        sysstr = platform.system()
-        if sysstr == "Linux":
-            if not os.path.exists(FootmarkConfigLocations[0]):
-                os.makedirs(FootmarkConfigLocations[0])
-                FootmarkLoggingConfig = FootmarkConfigLocations[0] + 'logging.conf'
+        if platform.system() == "Linux":
+            config_path = FootmarkConfigLocations[0]
         else:
-            os.makedirs(FootmarkConfigLocations[1])
-            FootmarkLoggingConfig = FootmarkConfigLocations[1] + 'logging.conf'
-        self.add_logging_config(FootmarkLoggingConfig)
+            config_path = FootmarkConfigLocations[1]
+        if not os.path.exists(config_path):
+            os.makedirs(config_path)
+        logging_config_file = config_path + 'logging.conf'
+        if not os.path.exists(logging_config_file):
+            self.add_logging_config(logging_config_file)
 
         if not os.path.exists(LoggingDict):
             os.makedirs(LoggingDict)
 
     def add_logging_config(self, config_file):
-        file_pb = open(config_file, 'wb')
+        file_pb = open(config_file, 'w')
         file_pb.write(logging_config)
         file_pb.close()
@@ -1,5 +1,7 @@
 import json
 import os
+import threading
+from collections import OrderedDict
 
 import footmark
 from footmark.exception import FootmarkClientError
@@ -43,6 +45,18 @@ def merge_endpoints(defaults, additions):
     return defaults
 
 
+def endpoint_paths():
+    """
+    Return the paths of the endpoint files to load: the default included
+    ``footmark/endpoints.json`` file, followed by the file named by the
+    ``FOOTMARK_ENDPOINTS`` environment variable, if set.
+    """
+    paths = [footmark.ENDPOINTS_PATH]
+    if os.environ.get('FOOTMARK_ENDPOINTS'):
+        paths.append(os.environ['FOOTMARK_ENDPOINTS'])
+    return paths
+
+
 def load_regions():
     """
     Actually load the region/endpoint information from the JSON files.
@@ -50,39 +64,99 @@ def load_regions():
     By default, this loads from the default included ``footmark/endpoints.json``
     file.
 
-    Users can override/extend this by supplying either a ``FOOTMARK_ENDPOINTS``
-    environment variable or a ``endpoints_path`` config variable, either of
-    which should be an absolute path to the user's JSON file.
+    Users can override/extend this by supplying a ``FOOTMARK_ENDPOINTS``
+    environment variable, which should be an absolute path to the user's
+    JSON file.
 
     :returns: The endpoints data
     :rtype: dict
     """
+    paths = endpoint_paths()
     # Load the defaults first.
-    endpoints = load_endpoint_json(footmark.ENDPOINTS_PATH)
-    additional_path = None
-
-    # Try the ENV var. If not, check the config file.
-    if os.environ.get('FOOTMARK_ENDPOINTS'):
-        additional_path = os.environ['FOOTMARK_ENDPOINTS']
-    elif footmark.config.get('Footmark', 'endpoints_path'):
-        additional_path = footmark.config.get('Footmark', 'endpoints_path')
+    endpoints = load_endpoint_json(paths[0])
 
     # If there's a file provided, we'll load it & additively merge it into
     # the endpoints.
-    if additional_path:
+    for additional_path in paths[1:]:
         additional = load_endpoint_json(additional_path)
         endpoints = merge_endpoints(endpoints, additional)
 
     return endpoints
 
 
+class EndpointRegistry(object):
+    """
+    A process-wide cache of the endpoint files and of the ``RegionInfo``
+    objects built from them.
+
+    The files are loaded on first use and reloaded only when the set of
+    files or the modification time of one of them changes. Regions are
+    indexed by ID per service, so finding one is a dict lookup.
+    """
+
+    def __init__(self):
+        self._signature = None
+        self._endpoints = None
+        self._regions = {}
+        self._lock = threading.Lock()
+
+    def signature(self):
+        paths = endpoint_paths()
+        return tuple((path, os.path.getmtime(path)) for path in paths)
+
+    def endpoints(self):
+        """
+        Return the merged endpoints data, loading it if needed.
+        """
+        signature = self.signature()
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._endpoints = load_regions()
+                    self._regions = {}
+                    self._signature = signature
+        return self._endpoints
+
+    def regions(self, service_name, region_cls=None, connection_cls=None):
+        """
+        Return an ordered dict of the ``RegionInfo`` objects of a service,
+        keyed by region ID. The objects are built once and shared.
+        """
+        endpoints = self.endpoints()
+        key = (service_name, region_cls, connection_cls)
+        regions = self._regions.get(key)
+        if regions is None:
+            if service_name not in endpoints:
+                raise FootmarkClientError(
+                    "Service '%s' not found in endpoints." % service_name
+                )
+            region_cls = region_cls or RegionInfo
+            regions = OrderedDict(
+                (region_id, region_cls(name=region_id, id=region_id, endpoint=endpoint,
+                                       connection_cls=connection_cls))
+                for region_id, endpoint in sorted(endpoints[service_name].items())
+            )
+            self._regions[key] = regions
+        return regions
+
+    def clear(self):
+        with self._lock:
+            self._signature = None
+            self._endpoints = None
+            self._regions = {}
+
+
+registry = EndpointRegistry()
+
+
 def get_regions(service_name, region_cls=None, connection_cls=None):
     """
     Given a service name (like ``ecs``), returns a list of ``RegionInfo``
     objects for that service.
 
     This leverages the ``endpoints.json`` file (+ optional user overrides) to
-    configure/construct all the objects.
+    configure/construct all the objects. The files are only read again when
+    they change.
 
     :param service_name: The name of the service to construct the ``RegionInfo``
         objects for. Ex: ``ecs``
@@ -100,28 +174,19 @@ def get_regions(service_name, region_cls=None, connection_cls=None):
     :returns: A list of configured ``RegionInfo`` objects
     :rtype: list
     """
-    endpoints = load_regions()
-
-    if service_name not in endpoints:
-        raise FootmarkClientError(
-            "Service '%s' not found in endpoints." % service_name
-        )
+    return list(registry.regions(service_name, region_cls, connection_cls).values())
 
-    if region_cls is None:
-        region_cls = RegionInfo
 
-    region_objs = []
+def get_region(service_name, region_id, region_cls=None, connection_cls=None):
+    """
+    Given a service name and a region ID, returns the ``RegionInfo`` object
+    of that region, or None if the service has no endpoint in the region.
 
-    for region_name, endpoint in endpoints.get(service_name, {}).items():
-        region_objs.append(
-            region_cls(
-                name=region_name,
-                endpoint=endpoint,
-                connection_cls=connection_cls
-            )
-        )
+    The arguments are those of :func:`get_regions`.
 
-    return region_objs
+    :rtype: ``RegionInfo``
+    """
+    return registry.regions(service_name, region_cls, connection_cls).get(region_id)
 
 
 class RegionInfo(object):
@@ -130,11 +195,12 @@ class RegionInfo(object):
     """
 
     def __init__(self, connection=None, name=None, id=None,
-                 connection_cls=None):
+                 connection_cls=None, endpoint=None):
         self.connection = connection
         self.name = name
         self.id = id
         self.connection_cls = connection_cls
+        self.endpoint = endpoint
 
     def __repr__(self):
         return 'RegionInfo:%s' % self.name
@@ -0,0 +1,233 @@
+"""
+Decides which failed requests are retried, how often and after how long.
+"""
+import json
+import sys
+import threading
+import time
+
+import six
+
+import footmark
+from footmark.waiter import Waiter
+
+
+def response_error_code(response):
+    """
+    Return the error code in the body of a ``(status, headers, body)``
+    response, or None.
+    """
+    if not response[-1]:
+        return None
+    try:
+        return json.loads(response[-1]).get('Code')
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def exception_error_code(ex):
+    """
+    Return the error code of an exception raised while sending a request,
+    either by footmark or by the Aliyun SDK.
+    """
+    code = getattr(ex, 'error_code', None)
+    if code is None and hasattr(ex, 'get_error_code'):
+        code = ex.get_error_code()
+    return code
+
+
+def is_read(action):
+    """
+    Whether an action only reads resources.
+    """
+    return action.startswith(('Describe', 'List', 'Get', 'Query'))
+
+
+def is_idempotent(action, params):
+    """
+    Whether sending a request twice has the effect of sending it once: reads,
+    and changes carrying a client token.
+    """
+    if is_read(action):
+        return True
+    return any(name.endswith('ClientToken') and value for name, value in (params or {}).items())
+
+
+class RetryPolicy(object):
+    """
+    Retries the failures matching its error codes or HTTP statuses, backing
+    off exponentially with jitter between attempts.
+
+    :ivar codes: Error codes retried. A code ending with ``*`` matches every
+        code starting with the part before it.
+    :ivar statuses: HTTP statuses retried.
+    :ivar max_attempts: Attempts at most, the first one included.
+    :ivar deadline: Seconds after the first attempt past which no retry is
+        started, or None.
+    :ivar idempotent_only: Only retry requests that can safely be sent again,
+        since the failed request may have been carried out.
+
+    :ivar retries: Number of retries made.
+    :ivar recovered: Number of requests that succeeded after a retry.
+    :ivar giveups: Number of requests that still failed when out of attempts
+        or time.
+    :ivar waited: Seconds spent waiting before retries.
+    """
+
+    def __init__(self, name, codes=(), statuses=(), max_attempts=3, delay=1, max_delay=20, backoff=2,
+                 jitter=1, deadline=None, idempotent_only=False):
+        self.name = name
+        self.codes = frozenset(code for code in codes if not code.endswith('*'))
+        self.prefixes = tuple(code[:-1] for code in codes if code.endswith('*'))
+        self.statuses = frozenset(statuses)
+        self.max_attempts = max_attempts
+        self.delay = delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.idempotent_only = idempotent_only
+        self.retries = 0
+        self.recovered = 0
+        self.giveups = 0
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'RetryPolicy:%s' % self.name
+
+    def matches(self, action, params, status, error_code):
+        if self.idempotent_only and not is_idempotent(action, params):
+            return False
+        if isinstance(error_code, six.string_types):
+            if error_code in self.codes or (self.prefixes and error_code.startswith(self.prefixes)):
+                return True
+        return status in self.statuses
+
+    def delays(self):
+        return Waiter(delay=self.delay, max_delay=self.max_delay, backoff=self.backoff,
+                      jitter=self.jitter).delays()
+
+    def count(self, retries=0, recovered=0, giveups=0, waited=0.0):
+        """
+        Add to the metrics. Requests sent from several threads share the
+        policy, so the counters are only updated under its lock.
+        """
+        with self._lock:
+            self.retries += retries
+            self.recovered += recovered
+            self.giveups += giveups
+            self.waited += waited
+
+    def metrics(self):
+        with self._lock:
+            return {'retries': self.retries, 'recovered': self.recovered, 'giveups': self.giveups,
+                    'waited': self.waited}
+
+
+class RetryPolicies(object):
+    """
+    An ordered set of retry policies. A failure is handled by the first
+    policy matching it, and is fatal if none does.
+
+    :ivar fatal: Number of failures no policy matched.
+    """
+
+    def __init__(self, policies):
+        self.policies = list(policies)
+        self.fatal = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def default(cls, throttle_retries=5, throttle_delay=1, throttle_max_delay=20):
+        """
+        Retry throttled requests, and requests that failed on a server or
+        network error if they are idempotent. Any other error, such as an
+        invalid parameter, is fatal.
+        """
+        return cls([
+            RetryPolicy('throttling', codes=('Throttling*',), max_attempts=throttle_retries + 1,
+                        delay=throttle_delay, max_delay=throttle_max_delay),
+            RetryPolicy('transient', codes=('ServiceUnavailable', 'InternalError', 'UnknownError',
+                                            'SDK.HttpError', 'SDK.ServerUnreachable'),
+                        statuses=(500, 502, 503, 504), max_attempts=3, delay=1, max_delay=10, deadline=60,
+                        idempotent_only=True),
+        ])
+
+    def __getitem__(self, name):
+        for policy in self.policies:
+            if policy.name == name:
+                return policy
+        raise KeyError(name)
+
+    def classify(self, action, params, status, error_code):
+        """
+        Return the policy handling a failure, or None if it is fatal.
+        """
+        for policy in self.policies:
+            if policy.matches(action, params, status, error_code):
+                return policy
+        return None
+
+    def call(self, action, params, send):
+        """
+        Call ``send()`` until it returns a successful response, retrying the
+        failures a policy matches while the policy allows it.
+
+        :type send: callable
+        :param send: Sends the request once, returning a
+            ``(status, headers, body)`` response or raising.
+
+        :return: The last response, successful or not
+        :raises: The exception of the last attempt, if it raised
+        """
+        start = time.time()
+        attempts = {}
+        delays = {}
+        retried = None
+        while True:
+            response = error = None
+            try:
+                response = send()
+            except Exception as ex:
+                error = sys.exc_info()
+                status, error_code = getattr(ex, 'status', None), exception_error_code(ex)
+            else:
+                if response[0] in (200, 201):
+                    if retried is not None:
+                        retried.count(recovered=1)
+                    return response
+                status, error_code = response[0], response_error_code(response)
+
+            policy = self.classify(action, params, status, error_code)
+            if policy is None:
+                with self._lock:
+                    self.fatal += 1
+                return self._fail(response, error)
+            attempts[policy.name] = attempts.get(policy.name, 1) + 1
+            if policy.name not in delays:
+                delays[policy.name] = policy.delays()
+            delay = next(delays[policy.name])
+            if policy.deadline is not None:
+                delay = min(delay, start + policy.deadline - time.time())
+            if attempts[policy.name] > policy.max_attempts or delay < 0:
+                policy.count(giveups=1)
+                return self._fail(response, error)
+            policy.count(retries=1, waited=delay)
+            retried = policy
+            footmark.log.warning('%s failed with %s, retry %d of %d in %.1f s (%s)', action, error_code or status,
+                                 attempts[policy.name] - 1, policy.max_attempts - 1, delay, policy.name)
+            time.sleep(delay)
+
+    def metrics(self):
+        """
+        Return the metrics of each policy, keyed by policy name.
+        """
+        metrics = dict((policy.name, policy.metrics()) for policy in self.policies)
+        metrics['fatal'] = self.fatal
+        return metrics
+
+    def _fail(self, response, error):
+        if error is not None:
+            six.reraise(*error)
+        return response
@@ -8,20 +8,55 @@ import warnings
 import six
 import time
 import json
+from collections import OrderedDict
  
 from footmark.connection import ACSQueryConnection
 from footmark.slb.regioninfo import RegionInfo
 from footmark.exception import SLBResponseError
 
+# The listener attributes compared by ensure_listener: API param name, section of the listener
+# holding it, its keys in order of precedence, and the protocols having it
+LISTENER_ATTRIBUTES = [
+    ('ListenerPort', None, ('listener_port', 'load_balancer_port'), ('http', 'https', 'tcp', 'udp')),
+    ('BackendServerPort', None, ('backend_server_port', 'instance_port'), ('http', 'https', 'tcp', 'udp')),
+    ('Bandwidth', None, ('bandwidth',), ('http', 'https', 'tcp', 'udp')),
+    ('Scheduler', None, ('scheduler',), ('http', 'https', 'tcp', 'udp')),
+    ('ServerCertificateId', None, ('ssl_certificate_id',), ('https',)),
+    ('Gzip', None, ('gzip',), ('http', 'https')),
+    ('HealthCheckDomain', 'health_check', ('domain',), ('http', 'https', 'tcp')),
+    ('HealthCheckURI', 'health_check', ('uri', 'ping_path'), ('http', 'https', 'tcp')),
+    ('HealthCheckConnectPort', 'health_check', ('connect_port', 'ping_port'), ('http', 'https', 'tcp', 'udp')),
+    ('HealthyThreshold', 'health_check', ('healthy_threshold',), ('http', 'https', 'tcp', 'udp')),
+    ('UnhealthyThreshold', 'health_check', ('unhealthy_threshold',), ('http', 'https', 'tcp', 'udp')),
+    ('HealthCheckTimeout', 'health_check', ('timeout', 'response_timeout'), ('http', 'https')),
+    ('HealthCheckConnectTimeout', 'health_check', ('timeout', 'response_timeout'), ('tcp', 'udp')),
+    ('HealthCheckInterval', 'health_check', ('interval',), ('http', 'https', 'tcp', 'udp')),
+    ('HealthCheckHttpCode', 'health_check', ('http_code',), ('http', 'https', 'tcp')),
+    ('StickySession', 'stickiness', ('enabled',), ('http', 'https')),
+    ('StickySessionType', 'stickiness', ('type', 'session_type'), ('http', 'https')),
+    ('Cookie', 'stickiness', ('cookie',), ('http', 'https')),
+    ('CookieTimeout', 'stickiness', ('expiration', 'cookie_timeout'), ('http', 'https')),
+]
+
 
 class SLBConnection(ACSQueryConnection):
     SDKVersion = '2014-05-15'
     DefaultRegionId = 'cn-hangzhou'
     DefaultRegionName = u'杭州'.encode("UTF-8")
     ResponseError = SLBResponseError
+    # The most backend servers an action takes per call
+    MaxBackendServers = {
+        'AddBackendServers': 20,
+        'RemoveBackendServers': 20,
+        'SetBackendServers': 20,
+        'CreateVServerGroup': 20,
+        'AddVServerGroupBackendServers': 20,
+        'RemoveVServerGroupBackendServers': 20,
+        'SetVServerGroupAttribute': 20,
+    }
 
     def __init__(self, acs_access_key_id=None, acs_secret_access_key=None,
-                 region=None, sdk_version=None, security_token=None):
+                 region=None, sdk_version=None, security_token=None, **kwargs):
         """
         Init method to create a new connection to SLB.
         """
@@ -36,7 +71,8 @@ class SLBConnection(ACSQueryConnection):
 
         super(SLBConnection, self).__init__(acs_access_key_id,
                                             acs_secret_access_key,
-                                            self.region, self.SLBSDK, security_token)
+                                            self.region, self.SLBSDK, security_token,
+                                            **kwargs)
 
     def create_load_balancer(self, load_balancer_name=None, address_type=None, vswitch_id=None,
                              internet_charge_type=None, master_zone_id=None, slave_zone_id=None, bandwidth=None,
@@ -109,50 +145,21 @@ class SLBConnection(ACSQueryConnection):
                 results.append({"Error Code": error_code, "Error Message": error_msg})
         else:
             slb_id = str(results[0][u'LoadBalancerId'])
-            # if listener param is available then create listener
+            # if listener param is available then create listeners, while the backend servers are added
             if slb_id and listeners:
-                for listener in listeners:
-                    if listener:
-                        if 'protocol' in listener:
-                            protocol = str(listener['protocol']).lower()
-                            # Add HTTP Listener to Load Balancer
-                            if protocol in ['http']:
-                                listener_result = self.create_load_balancer_http_listener(slb_id, listener)
-                                if listener_result:
-                                    results.append({"http_listener_result": listener_result[1]})
-
-                            # Add HTTPS Listener to Load Balancer
-                            elif protocol in ['https']:
-                                listener_result = self.create_load_balancer_https_listener(slb_id, listener)
-                                if listener_result:
-                                    results.append({"https_listener_result": listener_result[1]})
-
-                            # Add TCP Listener to Load Balancer
-                            elif protocol in ['tcp']:
-                                listener_result = self.create_load_balancer_tcp_listener(slb_id, listener)
-                                if listener_result:
-                                    results.append({"tcp_listener_result": listener_result[1]})
-
-                            # Add UDP Listener to Load Balancer
-                            elif protocol in ['udp']:
-                                listener_result = self.create_load_balancer_udp_listener(slb_id, listener)
-                                if listener_result:
-                                    results.append({"udp_listener_result": listener_result[1]})
-                            else:
-                                results.append({"Error Message": "Invalid Listener Protocol " + listener['protocol']})
-
+                stages = [lambda: self.create_listeners(slb_id, listeners)]
                 if instance_ids:
-                    if len(instance_ids) > 0:     
-                        backend_servers = []
-
-                        # Add Backend Serves to Load Balancer
-                        for backend_server_id in instance_ids:
-                            backend_servers.append({"server_id": backend_server_id, "weight": 100})
-
-                        backend_server_result = self.add_backend_servers(slb_id, backend_servers)
-
-                        if backend_server_result:
-                            results.append({"backend_server_result": backend_server_result})
+                    # Add Backend Serves to Load Balancer
+                    backend_servers = [{"server_id": backend_server_id, "weight": 100}
+                                       for backend_server_id in instance_ids]
+                    stages.append(lambda: self.add_backend_servers(slb_id, backend_servers))
+                done = self.bulk_executor.map(lambda stage: stage(), stages)
+                done.raise_first_error()
+
+                for listener_changed, listener_result in done[stages[0]]:
+                    results.append(listener_result)
+                if len(stages) > 1:
+                    results.append({"backend_server_result": done[stages[1]]})
 
         if str(wait).lower() in ['yes', 'true'] and wait_timeout > 0:
             time.sleep(wait_timeout)
@@ -172,7 +179,6 @@ class SLBConnection(ACSQueryConnection):
         """
         params = {}
         results = []
-        deleted_listener = []
         changed = False
 
         try:
@@ -181,60 +187,26 @@ class SLBConnection(ACSQueryConnection):
             slb_details = self.get_status('DescribeLoadBalancerAttribute', params)
 
             # if purge_listener is true then delete existing listeners
-            if purge_listener:
-                if slb_details:
-                    if len(slb_details[u'ListenerPortsAndProtocal'][u'ListenerPortAndProtocal']) > 0:
-                        for slb_listener in slb_details[u'ListenerPortsAndProtocal'][u'ListenerPortAndProtocal']:
-                            params = {}
-                            self.build_list_params(params, load_balancer_id, 'LoadBalancerId')
-                            self.build_list_params(params, slb_listener[u'ListenerPort'], 'ListenerPort')
-                            response = self.get_status('DeleteLoadBalancerListener', params)
-                            deleted_listener.append(response)
-                            changed = True
-                            
+            if purge_listener and slb_details:
+                def delete(listener_port):
+                    params = {}
+                    self.build_list_params(params, load_balancer_id, 'LoadBalancerId')
+                    self.build_list_params(params, listener_port, 'ListenerPort')
+                    return self.get_status('DeleteLoadBalancerListener', params)
+
+                deleted = self.bulk_executor.map(
+                    delete, [slb_listener[u'ListenerPort'] for slb_listener in
+                             slb_details[u'ListenerPortsAndProtocal'][u'ListenerPortAndProtocal']])
+                changed = bool(deleted.succeeded)
+                deleted.raise_first_error()
+
             # add listeners to load balancer
             if listeners:
-                for listener in listeners:
-                    if listener:
-                        if 'protocol' in listener:
-                            protocol = str(listener['protocol']).lower()
-                            # Add HTTP Listener to Load Balancer
-                            if protocol in ['http']:
-                                listener_result = self.create_load_balancer_http_listener(load_balancer_id, listener)
-                                if listener_result:                                    
-                                    results.append({"http_listener_result": listener_result[1]})
-                                    # modify changed param according to listener result
-                                    if changed is False:
-                                        changed = listener_result[0]
-
-                            # Add HTTPS Listener to Load Balancer
-                            elif protocol in ['https']:
-                                listener_result = self.create_load_balancer_https_listener(load_balancer_id, listener)
-                                if listener_result:
-                                    results.append({"https_listener_result": listener_result[1]})
-                                    # modify changed param according to listener result
-                                    if changed is False:
-                                        changed = listener_result[0]
-
-                            # Add TCP Listener to Load Balancer
-                            elif protocol in ['tcp']:
-                                listener_result = self.create_load_balancer_tcp_listener(load_balancer_id, listener)
-                                if listener_result:
-                                    results.append({"tcp_listener_result": listener_result[1]})
-                                    # modify changed param according to listener result
-                                    if changed is False:
-                                        changed = listener_result[0]
-
-                            # Add UDP Listener to Load Balancer
-                            elif protocol in ['udp']:
-                                listener_result = self.create_load_balancer_udp_listener(load_balancer_id, listener)
-                                if listener_result:
-                                    results.append({"udp_listener_result": listener_result[1]})
-                                    # modify changed param according to listener result
-                                    if changed is False:
-                                        changed = listener_result[0]
-                            else:
-                                results.append({"Error Message": "Invalid Listener Protocol " + listener['protocol']})
+                for listener_changed, listener_result in self.create_listeners(load_balancer_id, listeners):
+                    results.append(listener_result)
+                    # modify changed param according to listener result
+                    if changed is False:
+                        changed = listener_changed
 
         except Exception as ex:
             error_code = ex.error_code
@@ -243,6 +215,123 @@ class SLBConnection(ACSQueryConnection):
 
         return changed, results     
 
+    def create_listeners(self, load_balancer_id, listeners):
+        """
+        Create and start the listeners of a Load Balancer concurrently
+        :type load_balancer_id: str
+        :param load_balancer_id: Id of ServerLoadBalancer
+        :type listeners: list
+        :param listeners: List of ports/protocols for this SLB to listen on
+        :return: returns the changed status and result of each listener, in order
+        """
+        creators = {
+            'http': (self.create_load_balancer_http_listener, "http_listener_result"),
+            'https': (self.create_load_balancer_https_listener, "https_listener_result"),
+            'tcp': (self.create_load_balancer_tcp_listener, "tcp_listener_result"),
+            'udp': (self.create_load_balancer_udp_listener, "udp_listener_result"),
+        }
+        listeners = [listener for listener in listeners if listener and 'protocol' in listener]
+
+        def create(index):
+            listener = listeners[index]
+            protocol = str(listener['protocol']).lower()
+            if protocol not in creators:
+                return False, {"Error Message": "Invalid Listener Protocol " + listener['protocol']}
+            method, result_key = creators[protocol]
+            listener_result = method(load_balancer_id, listener)
+            return listener_result[0], {result_key: listener_result[1]}
+
+        created = self.bulk_executor.map(create, range(len(listeners)))
+        created.raise_first_error()
+        return list(created.values())
+
+    def listener_spec(self, protocol, listener):
+        """
+        Normalize a listener into the attributes of its protocol, keyed by API param name.
+        Of the alias keys of an attribute, such as listener_port and load_balancer_port, the
+        first one in LISTENER_ATTRIBUTES wins. Attributes not given are left out.
+        :type protocol: str
+        :param protocol: Protocol of the listener: http, https, tcp or udp
+        :type listener: dict
+        :param listener: The listener, in the format taken by create_load_balancer_*_listener
+        :return: returns an OrderedDict of API param name to value
+        """
+        spec = OrderedDict()
+        if 'health_check' in listener and protocol in ('http', 'https'):
+            spec['HealthCheck'] = 'on'
+        for name, section, keys, protocols in LISTENER_ATTRIBUTES:
+            if protocol not in protocols:
+                continue
+            values = (listener.get(section) or {}) if section else listener
+            for key in keys:
+                if key in values and values[key] is not None:
+                    spec[name] = values[key]
+                    break
+        if 'StickySession' in spec and isinstance(spec['StickySession'], bool):
+            spec['StickySession'] = 'on' if spec['StickySession'] else 'off'
+        return spec
+
+    def ensure_listener(self, load_balancer_id, listener):
+        """
+        Make a listener of a Load Balancer match the given one: create it when its port is not
+        used, otherwise update only the attributes that differ, or nothing at all. The backend
+        server port of an existing listener cannot be changed.
+        :type load_balancer_id: str
+        :param load_balancer_id: Id of ServerLoadBalancer
+        :type listener: dict
+        :param listener: The listener, in the format taken by create_load_balancer_*_listener,
+            with its protocol
+        :return: returns changed status and the attributes of the listener, or the result of its creation
+        """
+        results = []
+        changed = False
+        protocol = str(listener.get('protocol')).lower()
+        if protocol not in ('http', 'https', 'tcp', 'udp'):
+            results.append({"Error Message": "Invalid Listener Protocol " + str(listener.get('protocol'))})
+            return changed, results
+
+        spec = self.listener_spec(protocol, listener)
+        listener_port = spec.get('ListenerPort')
+        try:
+            params = {}
+            self.build_list_params(params, load_balancer_id, 'LoadBalancerId')
+            slb_details = self.get_status('DescribeLoadBalancerAttribute', params)
+            current_protocol = None
+            for slb_listener in slb_details[u'ListenerPortsAndProtocal'][u'ListenerPortAndProtocal']:
+                if str(slb_listener[u'ListenerPort']) == str(listener_port):
+                    current_protocol = str(slb_listener[u'ListenerProtocal']).lower()
+            if current_protocol is None:
+                return self.create_listeners(load_balancer_id, [listener])[0]
+            if current_protocol != protocol:
+                results.append({"Error Message": "Listener port " + str(listener_port) +
+                                                 " is already used by a " + current_protocol + " listener"})
+                return changed, results
+
+            self.build_list_params(params, listener_port, 'ListenerPort')
+            results = self.get_status('DescribeLoadBalancer%sListenerAttribute' % protocol.upper(), params)
+            # The Set*ListenerAttribute actions cannot change the backend server port
+            backend_server_port = spec.get('BackendServerPort')
+            if backend_server_port is not None and str(backend_server_port) != str(results.get('BackendServerPort')):
+                return changed, [{"Error Message": "Backend server port of listener " + str(listener_port) +
+                                                   " cannot be changed from " + str(results.get('BackendServerPort')) +
+                                                   " to " + str(backend_server_port)}]
+            changes = {}
+            for name, value in spec.items():
+                if name not in ('ListenerPort', 'BackendServerPort') and str(value) != str(results.get(name)):
+                    changes[name] = value
+            if changes:
+                for name, value in changes.items():
+                    self.build_list_params(params, value, name)
+                self.get_status('SetLoadBalancer%sListenerAttribute' % protocol.upper(), params)
+                results.update(changes)
+                changed = True
+        except Exception as ex:
+            error_code = getattr(ex, 'error_code', None)
+            error_msg = getattr(ex, 'message', str(ex))
+            results = [{"Error Code": error_code, "Error Message": error_msg}]
+
+        return changed, results
+
     def create_load_balancer_http_listener(self, slb_id, listener):
         """
         Create HTTP Listener; create Listeners based on the HTTP protocol for the Server Load Balancer instance,
@@ -723,6 +812,102 @@ class SLBConnection(ACSQueryConnection):
 
         return changed, results
 
+    def backend_server_key(self, backend_server):
+        """
+        Return what identifies a backend server in a request or a response:
+        its server ID, and its port in virtual server groups.
+        """
+        if isinstance(backend_server, six.string_types):
+            return backend_server, None
+        port = backend_server.get('Port')
+        return str(backend_server['ServerId']), None if port is None else str(port)
+
+    def send_backend_servers(self, action, params, backend_servers):
+        """
+        Send an action taking a BackendServers param, splitting the servers into chunks of at most
+        MaxBackendServers[action] servers sent concurrently.
+        :type action: string
+        :param action: The name of the action, such as AddBackendServers
+        :type params: dict
+        :param params: The other params of the action, sent with every chunk
+        :type backend_servers: list
+        :param backend_servers: The backend servers, in the format taken by the API
+        :return: The response of the first successful chunk, with the BackendServers of all the
+                 successful chunks merged, or None if every chunk failed; and the list of
+                 (backend server, exception) pairs of the failed chunks
+        """
+        limit = self.MaxBackendServers.get(action) or len(backend_servers) or 1
+        chunks = [backend_servers[start:start + limit] for start in range(0, len(backend_servers), limit)] or [[]]
+
+        def send(index):
+            chunk_params = dict(params)
+            self.build_list_params(chunk_params, json.dumps(chunks[index]), 'BackendServers')
+            return self.get_status(action, chunk_params)
+
+        responses = self.bulk_executor.map(send, range(len(chunks)))
+        failures = []
+        for index, error in responses.errors.items():
+            failures.extend((backend_server, error) for backend_server in chunks[index])
+        succeeded = responses.succeeded
+        if not succeeded:
+            return None, failures
+        response = responses[succeeded[0]]
+        if len(chunks) > 1:
+            response['BackendServers']['BackendServer'] = self.merge_backend_servers(
+                [(chunks[index], responses[index]) for index in succeeded], removed=action.startswith('Remove'))
+        return response, failures
+
+    def merge_backend_servers(self, chunk_responses, removed=False):
+        """
+        Merge the backend servers returned by the chunks of one request. Each response lists the
+        backend servers as they were when its chunk was applied; a server is taken from the
+        response of its own chunk when there is one.
+        :type chunk_responses: list
+        :param chunk_responses: (chunk of backend servers, response) pairs
+        :type removed: bool
+        :param removed: Whether the chunks removed their servers, which are then left out
+        :return: The list of backend servers
+        """
+        requested = set()
+        for chunk, response in chunk_responses:
+            requested.update(self.backend_server_key(backend_server) for backend_server in chunk)
+        merged = OrderedDict()
+        for chunk, response in chunk_responses:
+            chunk_keys = set(self.backend_server_key(backend_server) for backend_server in chunk)
+            for backend_server in response['BackendServers']['BackendServer']:
+                key = self.backend_server_key(backend_server)
+                if removed and (key in requested or (key[0], None) in requested):
+                    continue
+                if key in chunk_keys or key not in merged:
+                    merged[key] = backend_server
+        return list(merged.values())
+
+    def backend_server_failures(self, failures):
+        """
+        List the backend servers of the failed chunks of a request, with their error code and message.
+        """
+        return [dict({'ServerId': backend_server} if isinstance(backend_server, six.string_types) else backend_server,
+                     **{"Error Code": getattr(ex, 'error_code', None),
+                        "Error Message": getattr(ex, 'message', str(ex))}) for backend_server, ex in failures]
+
+    def backend_server_failure_results(self, operation, failures):
+        """
+        Describe the failed chunks of a Load Balancer request: a message, then the
+        failed backend servers under the FailedBackendServers key.
+        """
+        if not failures:
+            return []
+        return ["Failed to " + operation + " " + str(len(failures)) + " backend server(s).",
+                {"FailedBackendServers": self.backend_server_failures(failures)}]
+
+    def set_backend_server_failures(self, results, failures):
+        """
+        List the backend servers of the failed chunks of a virtual server group request under
+        the FailedBackendServers key of its results, with their error code and message.
+        """
+        if failures:
+            results['FailedBackendServers'] = self.backend_server_failures(failures)
+
     def add_backend_servers(self, load_balancer_id, backend_servers=None):
         """
         Add BackendServer to existing LoadBalancer
@@ -746,14 +931,14 @@ class SLBConnection(ACSQueryConnection):
             backend_servers_list.append({"ServerId": backend_server['server_id'],
                                          "Weight": str(backend_server['weight'])})
 
-        backend_servers_json = json.dumps(backend_servers_list)
-        self.build_list_params(params, backend_servers_json, 'BackendServers')
-
         try:
-            response = self.get_status('AddBackendServers', params)
-            changed = True
-            results.append("Added Backend Server(s) successfully.")
-            current_backend_servers = response['BackendServers']['BackendServer']
+            response, failures = self.send_backend_servers('AddBackendServers', params, backend_servers_list)
+            # Some servers were changed as soon as one chunk succeeded
+            if response is not None:
+                changed = True
+                results.append("Added Backend Server(s) successfully.")
+                current_backend_servers = response['BackendServers']['BackendServer']
+            results.extend(self.backend_server_failure_results("add", failures))
 
         except Exception as ex:
             error_code = str(ex.error_code)
@@ -765,57 +950,19 @@ class SLBConnection(ACSQueryConnection):
     
     def purge_add_backend_server(self, load_balancer_id, instance_ids=None, purge_instance_ids=None):
         """
-        Remove existing Instances or Backend Server and Add new instances or Backend Server to Load Balancer
+        Add Instances or Backend Servers to Load Balancer, and remove the existing ones that are not given
         :type load_balancer_id: str
         :param load_balancer_id: Id of ServerLoadBalancer
         :type instance_ids:list
         :param instance_ids: Id of Instances or Backend Server
         :type purge_instance_ids: bool
         :param purge_instance_ids: Whether to remove existing Instances or Backend Servers
-        :return: Returns Id of newly added Load Balancer
+        :return: return changed status and message with descriptive information
         """
-        params = {}
-        results = []
-        instances = []
-        changed = False
-
-        try:
-            # List all Backend Servers
-            self.build_list_params(params, load_balancer_id, 'LoadBalancerId')
-            response = self.get_status('DescribeLoadBalancerAttribute', params)
-            for instance in response[u'BackendServers'][u'BackendServer']:
-                # append id of all Backend Servers to list
-                instances.append(str(instance[u'ServerId']))
-
-            # Remove instances only when purge_instance_ids is True
-            if len(instances) > 0 and (purge_instance_ids is True):
-                # Remove all Backend Servers
-                response = self.remove_backend_servers(load_balancer_id=load_balancer_id, backend_server_ids=instances)
-                if 'error' in (''.join(str(response))).lower():
-                    results.append(response[2])
-                else:
-                    results.append(response[2][0])
-                    changed = True
-
-            # Add Backend Server to Load Balancer
-            if instance_ids:
-                if len(instance_ids) > 0:
-                    backend_servers = []
-                    for backend_server_id in instance_ids:
-                        backend_servers.append({"server_id": backend_server_id, "weight": 100})
-
-                    response = self.add_backend_servers(load_balancer_id, backend_servers)
-                    if 'error' in (''.join(str(response))).lower():
-                        results.append({"backend_server_result": response[2]})
-                    else:
-                        results.append({"backend_server_result": response[1][0]})
-                        changed = True
-        except Exception as ex:
-            error_code = ex.error_code
-            error_msg = ex.message
-            results.append({"Error Code": error_code, "Error Message": error_msg})
-
-        return changed, results    
+        backend_servers = [{"server_id": instance_id, "weight": 100} for instance_id in instance_ids or []]
+        changed, current_backend_servers, results = self.sync_backend_servers(
+            load_balancer_id, backend_servers, purge=purge_instance_ids is True)
+        return changed, results
 
     def remove_backend_servers(self, load_balancer_id=None, backend_server_ids=None):
         """
@@ -832,15 +979,14 @@ class SLBConnection(ACSQueryConnection):
 
         self.build_list_params(params, load_balancer_id, 'LoadBalancerId')
 
-        backend_servers_json = json.dumps(backend_server_ids)
-
-        self.build_list_params(params, backend_servers_json, 'BackendServers')
-
         try:
-            response = self.get_status('RemoveBackendServers', params)
-            changed = True
-            results.append("Removal of Backend Server(s) successful.")
-            current_backend_servers = response['BackendServers']['BackendServer']
+            response, failures = self.send_backend_servers('RemoveBackendServers', params, list(backend_server_ids))
+            # Some servers were changed as soon as one chunk succeeded
+            if response is not None:
+                changed = True
+                results.append("Removal of Backend Server(s) successful.")
+                current_backend_servers = response['BackendServers']['BackendServer']
+            results.extend(self.backend_server_failure_results("remove", failures))
 
         except Exception as ex:
             error_code = str(ex.error_code)
@@ -873,14 +1019,14 @@ class SLBConnection(ACSQueryConnection):
             backend_servers_list.append({"ServerId": backend_server['server_id'],
                                          "Weight": str(backend_server['weight'])})
 
-        backend_servers_json = json.dumps(backend_servers_list)
-        self.build_list_params(params, backend_servers_json, 'BackendServers')
-
         try:
-            response = self.get_status('SetBackendServers', params)
-            changed = True
-            results.append("Updated Backend Server(s) successfully.")
-            current_backend_servers = response['BackendServers']['BackendServer']
+            response, failures = self.send_backend_servers('SetBackendServers', params, backend_servers_list)
+            # Some servers were changed as soon as one chunk succeeded
+            if response is not None:
+                changed = True
+                results.append("Updated Backend Server(s) successfully.")
+                current_backend_servers = response['BackendServers']['BackendServer']
+            results.extend(self.backend_server_failure_results("update", failures))
 
         except Exception as ex:
             error_code = str(ex.error_code)
@@ -890,6 +1036,74 @@ class SLBConnection(ACSQueryConnection):
 
         return changed, current_backend_servers, results
 
+    def sync_backend_servers(self, load_balancer_id, desired, purge=True):
+        """
+        Make the backend servers of a Load Balancer match the given ones,
+        adding only the missing servers, updating only the weights that
+        differ and removing only the extra servers, in that order so that
+        the Load Balancer keeps serving while its membership is replaced.
+        Nothing is updated or removed when some missing servers could not be
+        added. The Load Balancer is described once, and nothing is changed
+        when it already matches.
+        :type load_balancer_id: str
+        :param load_balancer_id: ID of server load balancer
+        :type desired: list
+        :param desired: list of dictionary containing server Id and weight of backend server instance.
+            The weight defaults to 100.
+        :type purge: bool
+        :param purge: Whether to remove the backend servers that are not in desired
+        :return: return changed status, current_backend_servers and message with descriptive information
+        """
+        results = []
+        changed = False
+
+        params = {}
+        self.build_list_params(params, load_balancer_id, 'LoadBalancerId')
+        try:
+            response = self.get_status('DescribeLoadBalancerAttribute', params)
+        except Exception as ex:
+            results.append("Failed to describe backend servers with error code " +
+                           str(getattr(ex, 'error_code', None)) + " and message: " + str(getattr(ex, 'message', ex)))
+            return changed, [], results
+        current = dict((str(server['ServerId']), int(server['Weight']))
+                       for server in response['BackendServers']['BackendServer'])
+
+        wanted = {}
+        for backend_server in desired or []:
+            wanted[str(backend_server['server_id'])] = int(backend_server.get('weight', 100))
+
+        to_remove = [server_id for server_id in current if server_id not in wanted] if purge else []
+        to_add = [{'server_id': server_id, 'weight': weight} for server_id, weight in wanted.items()
+                  if server_id not in current]
+        to_set = [{'server_id': server_id, 'weight': weight} for server_id, weight in wanted.items()
+                  if server_id in current and current[server_id] != weight]
+
+        current_backend_servers = response['BackendServers']['BackendServer']
+        if not (to_remove or to_add or to_set):
+            return changed, current_backend_servers, results
+
+        if to_add:
+            added, servers, messages = self.add_backend_servers(load_balancer_id, to_add)
+            changed = changed or added
+            current_backend_servers = servers if added else current_backend_servers
+            results.extend(messages)
+            # Leave the current servers in place unless every missing one was added
+            if not added or any(isinstance(message, dict) and 'FailedBackendServers' in message
+                                for message in messages):
+                return changed, current_backend_servers, results
+        if to_set:
+            updated, servers, messages = self.set_backend_servers(load_balancer_id, to_set)
+            changed = changed or updated
+            current_backend_servers = servers if updated else current_backend_servers
+            results.extend(messages)
+        if to_remove:
+            removed, servers, messages = self.remove_backend_servers(load_balancer_id, to_remove)
+            changed = changed or removed
+            current_backend_servers = servers if removed else current_backend_servers
+            results.extend(messages)
+
+        return changed, current_backend_servers, results
+
     def describe_backend_servers_health_status(self, load_balancer_id=None, port=None):
         """
         :type load_balancer_id: str
@@ -1068,6 +1282,22 @@ class SLBConnection(ACSQueryConnection):
 
         return response
 
+    def iter_load_balancers(self, load_balancer_ids=None, page_size=None, prefetch=False):
+        """
+        Iterate over the Load Balancers of the region, fetching them page by page
+        :type load_balancer_ids: list
+        :param load_balancer_ids: Optional IDs of the load balancers to describe
+        :type page_size: int
+        :param page_size: The number of load balancers fetched per request. The maximum value is 50
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+        :return: generator of load balancers in dictionary format
+        """
+        params = {}
+        if load_balancer_ids:
+            self.build_list_params(params, ','.join(load_balancer_ids), 'LoadBalancerId')
+        return self.paginate('DescribeLoadBalancers', params, ['LoadBalancers', None], page_size, prefetch)
+
     def create_vserver_group(self, load_balancer_id, vserver_group_name, backend_servers):
         """
         Create a VServer Group
@@ -1103,11 +1333,25 @@ class SLBConnection(ACSQueryConnection):
                         'Weight': servers['weight']
                     })
                                     
-        self.build_list_params(params, json.dumps(backend_serverlist), 'BackendServers')
-                
+        # The group is created with the first chunk, the others are added to it
+        limit = self.MaxBackendServers['CreateVServerGroup']
+        self.build_list_params(params, json.dumps(backend_serverlist[:limit]), 'BackendServers')
+
         try:     
             results = self.get_status('CreateVServerGroup', params)           
             changed = True
+            remaining = backend_serverlist[limit:]
+            if remaining:
+                add_params = {}
+                self.build_list_params(add_params, results['VServerGroupId'], 'VServerGroupId')
+                response, failures = self.send_backend_servers('AddVServerGroupBackendServers', add_params,
+                                                               remaining)
+                if response is not None:
+                    failed = set(self.backend_server_key(server) for server, ex in failures)
+                    added = [server for server in remaining if self.backend_server_key(server) not in failed]
+                    results['BackendServers']['BackendServer'] = self.merge_backend_servers(
+                        [(backend_serverlist[:limit], results), (added, response)])
+                self.set_backend_server_failures(results, failures)
         except Exception as ex:
             error_code = str(ex.error_code)
             error_msg = str(ex.message)
@@ -1150,15 +1394,21 @@ class SLBConnection(ACSQueryConnection):
                     'Weight': servers['weight']
                 })
         
-            self.build_list_params(params, json.dumps(backend_serverlist), 'BackendServers')
         try:
-            results = self.get_status('SetVServerGroupAttribute', params)
-            if results:
+            if backend_servers:
+                response, failures = self.send_backend_servers('SetVServerGroupAttribute', params,
+                                                               backend_serverlist)
+                if response is None:
+                    raise failures[0][1]
+                results = response
+                self.set_backend_server_failures(results, failures)
+                requested = set(self.backend_server_key(server) for server in backend_serverlist)
                 for result in results["BackendServers"]["BackendServer"]:
-                    for backend_server in backend_servers:
-                        if result["ServerId"] == backend_server["server_id"] and \
-                                        result["Port"] == backend_server["port"]:
-                            changed = True                        
+                    if self.backend_server_key(result) in requested:
+                        changed = True
+            else:
+                results = self.get_status('SetVServerGroupAttribute', params)
+                changed = True
         except Exception as ex:
             error_code = str(ex.error_code)
             error_msg = str(ex.message)
@@ -1195,10 +1445,14 @@ class SLBConnection(ACSQueryConnection):
                                            'Port': servers['port'],
                                            'Weight': servers['weight']})
                 
-            self.build_list_params(params, json.dumps(backend_serverlist), 'BackendServers')
         try:
-            results = self.get_status('AddVServerGroupBackendServers', params)           
+            response, failures = self.send_backend_servers('AddVServerGroupBackendServers', params,
+                                                           backend_serverlist)
+            if response is None:
+                raise failures[0][1]
+            results = response
             changed = True
+            self.set_backend_server_failures(results, failures)
         except Exception as ex:
             error_code = str(ex.error_code)
             error_msg = str(ex.message)
@@ -1233,11 +1487,15 @@ class SLBConnection(ACSQueryConnection):
         if purge_backend_servers:
             for servers in purge_backend_servers:
                 backend_serverlist.append({'ServerId': servers['server_id'], 'Port': servers['port']})
-            self.build_list_params(params, json.dumps(backend_serverlist), 'BackendServers')
 
         try: 
-            results = self.get_status('RemoveVServerGroupBackendServers', params)
+            response, failures = self.send_backend_servers('RemoveVServerGroupBackendServers', params,
+                                                           backend_serverlist)
+            if response is None:
+                raise failures[0][1]
+            results = response
             changed = True 
+            self.set_backend_server_failures(results, failures)
         except Exception as ex:
             error_code = str(ex.error_code)
             error_msg = str(ex.message)
@@ -1245,6 +1503,64 @@ class SLBConnection(ACSQueryConnection):
 
         return changed, results
 
+    def vserver_group_server_key(self, backend_server):
+        """
+        Return what identifies a backend server in a virtual server group:
+        its server ID and port. Takes both the backend servers passed to the
+        vserver group methods and those returned by the API.
+        """
+        if 'ServerId' in backend_server:
+            return str(backend_server['ServerId']), int(backend_server['Port'])
+        return str(backend_server['server_id']), int(backend_server['port'])
+
+    def get_vserver_group_backend_servers(self, vserver_group_id):
+        """
+        Describe a virtual server group once and index its backend servers.
+        :type vserver_group_id: string
+        :param vserver_group_id: The unique identifier for the virtual server group
+        :return: The DescribeVServerGroupAttribute response, and an OrderedDict of
+                 its backend servers keyed by vserver_group_server_key
+        """
+        params = {}
+        self.build_list_params(params, vserver_group_id, 'VServerGroupId')
+        response = self.get_status('DescribeVServerGroupAttribute', params)
+        index = OrderedDict()
+        for backend_server in response['BackendServers']['BackendServer']:
+            index[self.vserver_group_server_key(backend_server)] = backend_server
+        return response, index
+
+    def plan_vserver_group_backend_servers(self, current, backend_servers=None, purge_backend_servers=None):
+        """
+        Work out the changes turning the backend servers of a virtual server group
+        into the given ones.
+        :type current: dict
+        :param current: The backend servers of the group, as indexed by get_vserver_group_backend_servers
+        :type backend_servers: list
+        :param backend_servers: The backend servers to add, or whose weight to update
+        :type purge_backend_servers: list
+        :param purge_backend_servers: The backend servers to remove. A server both purged and
+            in backend_servers is removed, then added back.
+        :return: The backend servers to remove, to update and to add, each one in the format
+                 taken by the vserver group methods
+        """
+        to_remove = []
+        removed = set()
+        for backend_server in purge_backend_servers or []:
+            key = self.vserver_group_server_key(backend_server)
+            if key in current and key not in removed:
+                removed.add(key)
+                to_remove.append(backend_server)
+
+        to_set = []
+        to_add = []
+        for backend_server in backend_servers or []:
+            key = self.vserver_group_server_key(backend_server)
+            if key not in current or key in removed:
+                to_add.append(backend_server)
+            elif int(current[key]['Weight']) != int(backend_server.get('weight', 100)):
+                to_set.append(backend_server)
+        return to_remove, to_set, to_add
+
     def modify_vserver_group_backend_server(self, vserver_group_id, purge_backend_servers, backend_servers):
         '''
         Modify VServer Group Backend Server
@@ -1268,78 +1584,40 @@ class SLBConnection(ACSQueryConnection):
                  group by adding / deleting the back-end server to replace the current server group, the group returned
                  to the virtual server back-end server list.
         '''
-        params = {}
         results = []
-        set_results = []
-        add_results = []
-        set_server_attribute = []
-        add_backend_server = []
-        delete_backend_servers = []
-        delete_backend_servers_id = []
-        filter_backend_servers_id = []
-        final_backend_servers_id = []
         changed = False
-        serverid_param = 'server_id'
-        try: 
-
-            self.build_list_params(params, vserver_group_id, 'VServerGroupId')
-            result_all_backend_servers = self.get_status('DescribeVServerGroupAttribute', params)
-            all_backend_servers = result_all_backend_servers['BackendServers']['BackendServer']
-            if all_backend_servers:
-                for purge_backend_server in purge_backend_servers:                    
-                    for all_backend_server in all_backend_servers:
-                        if purge_backend_server[serverid_param] in all_backend_server['ServerId']:
-                            delete_backend_servers.append(purge_backend_server)
-                            delete_backend_servers_id.append(purge_backend_server[serverid_param])
-                            break
-                
-                for backend_server in backend_servers:
-                    flag = False
-                    for all_backend_server in all_backend_servers:
-                        if backend_server[serverid_param] == all_backend_server['ServerId'] \
-                                and backend_server[serverid_param] not in delete_backend_servers_id:
-                            set_server_attribute.append(backend_server)
-                            flag = True
-                            break                       
-                    if not flag:   
-                        add_backend_server.append(backend_server)
-            else:
-                 add_backend_server.append(backend_servers[0])             
-           
-            if delete_backend_servers:
-               changed, result = self.remove_vserver_group_backend_server(vserver_group_id, delete_backend_servers)
-            
-            if set_server_attribute:
-                changed, set_results = self.set_vservergroup_attribute(vserver_group_id, vserver_group_name=None,
-                                                                       backend_servers=set_server_attribute)
-    
-            if add_backend_server:
-                changed, add_results = self.add_vservergroup_backend_server(vserver_group_id, add_backend_server)
-            changed = True
-            
-            if set_results:
-                results = set_results
-                filter_backend_servers_id = set_results['BackendServers']['BackendServer']
-            
-            if add_results:
-                results = add_results
-                filter_backend_servers_id += add_results['BackendServers']['BackendServer']
-
-            for backend_server in backend_servers:
-                flag = False
-                for filter_backend_servers in filter_backend_servers_id:
-                    if filter_backend_servers["ServerId"] == backend_server[serverid_param] and\
-                                    filter_backend_servers["Port"] == backend_server["port"] and not flag:
-                        flag = True
-                        final_backend_servers_id.append(filter_backend_servers)
-            if final_backend_servers_id:
-                results['BackendServers']['BackendServer'] = final_backend_servers_id
+        try:
+            results, current = self.get_vserver_group_backend_servers(vserver_group_id)
+            to_remove, to_set, to_add = self.plan_vserver_group_backend_servers(current, backend_servers,
+                                                                                purge_backend_servers)
+            steps = ((to_remove, self.remove_vserver_group_backend_server),
+                     (to_set, lambda group_id, servers: self.set_vservergroup_attribute(group_id,
+                                                                                        backend_servers=servers)),
+                     (to_add, self.add_vservergroup_backend_server))
+            for servers, method in steps:
+                if not servers:
+                    continue
+                step_changed, response = method(vserver_group_id, servers)
+                if not step_changed:
+                    return changed, response
+                changed = True
+                results = response
+
+            # Only return the requested backend servers
+            returned = OrderedDict((self.vserver_group_server_key(server), server)
+                                   for server in results['BackendServers']['BackendServer'])
+            final_backend_servers = [returned[key] for key in
+                                     OrderedDict.fromkeys(self.vserver_group_server_key(server)
+                                                          for server in backend_servers or [])
+                                     if key in returned]
+            if final_backend_servers:
+                results['BackendServers']['BackendServer'] = final_backend_servers
             if 'VServerGroupName' in results:
                 del results['VServerGroupName']
         except Exception as ex:
             error_code = str(ex.error_code)
             error_msg = str(ex.message)
-            results.append({"Error Code": error_code, "Error Message": error_msg})
+            results = [{"Error Code": error_code, "Error Message": error_msg}]
 
         return changed, results
 
@@ -1389,24 +1667,15 @@ class SLBConnection(ACSQueryConnection):
         changed_flag = True
         results = []   
         try:
-            changed_vsg, result_vsgs = self.describe_vservergroup_attributes(vserver_group_id=vserver_group_id)
-            if result_vsgs and changed_vsg:
-                for backend_server in backend_servers:
-                    final_check =False
-                    for result_vsg in result_vsgs["BackendServers"]["BackendServer"]:
-                        if backend_server["server_id"] == result_vsg["ServerId"] and backend_server["port"] \
-                                == result_vsg["Port"]:
-                            final_check = True  
-                            break              
-                    if not final_check: 
-                        results.append(str(backend_server["server_id"])+" ECS with "
-                                                                        "the port "+str(backend_server["port"])+" not "
-                                                                        "match to perform operation")
-                        changed_flag = False
-            else:
-                changed_flag = False
-                results = result_vsgs
+            result_vsgs, current = self.get_vserver_group_backend_servers(vserver_group_id)
+            for backend_server in backend_servers:
+                if self.vserver_group_server_key(backend_server) not in current:
+                    results.append(str(backend_server["server_id"])+" ECS with "
+                                                                    "the port "+str(backend_server["port"])+" not "
+                                                                    "match to perform operation")
+                    changed_flag = False
         except Exception as ex:
+            changed_flag = False
             error_code = str(ex.error_code)
             error_msg = str(ex.message)
             results.append("Error Code:" + error_code + " ,Error Message:" + error_msg)
@@ -1434,24 +1703,15 @@ class SLBConnection(ACSQueryConnection):
         changed_flag = True
         results = []   
         try:
-            changed_vsg, result_vsgs = self.describe_vservergroup_attributes(vserver_group_id=vserver_group_id)
-            if result_vsgs and changed_vsg:
-                for backend_server in backend_servers:
-                    changed_flag = True
-                    for result_vsg in result_vsgs["BackendServers"]["BackendServer"]:
-                        if (str(backend_server["server_id"]) == str(result_vsg["ServerId"])) \
-                                and (str(backend_server["port"]) == str(result_vsg["Port"])):
-                            changed_flag = False
-                            break
-
-                    if changed_flag is False:
-                        results.append(str(backend_server["server_id"])+" "
-                                                                        "ECS with port "+str(backend_server["port"])+" "
-                                                                        "is already present")
-            else:
-                changed_flag =False
-                results = result_vsgs
+            result_vsgs, current = self.get_vserver_group_backend_servers(vserver_group_id)
+            for backend_server in backend_servers:
+                if self.vserver_group_server_key(backend_server) in current:
+                    results.append(str(backend_server["server_id"])+" "
+                                                                    "ECS with port "+str(backend_server["port"])+" "
+                                                                    "is already present")
+                    changed_flag = False
         except Exception as ex:
+            changed_flag = False
             error_code = str(ex.error_code)
             error_msg = str(ex.message)
             results.append("Error Code:" + error_code + " ,Error Message:" + error_msg)
@@ -7,7 +7,7 @@ class SLBRegionInfo(RegionInfo):
     """
 
     def __init__(self, connection=None, name=None, id=None,
-                 connection_cls=None):
+                 connection_cls=None, endpoint=None):
         from footmark.slb.connection import SLBConnection
         super(SLBRegionInfo, self).__init__(connection, name, id,
-                                            SLBConnection)
+                                            SLBConnection, endpoint)
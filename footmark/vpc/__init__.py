@@ -3,6 +3,7 @@ This module provides an interface to the Elastic Compute Service (ECS) service f
 """
 from footmark.vpc.connection import VPCConnection
 from footmark.regioninfo import get_regions
+from footmark import regioninfo
 
 
 def regions(**kw_params):
@@ -15,7 +16,7 @@ def regions(**kw_params):
     :rtype: list
     :return: A list of :class:`footmark.ecs.regioninfo.RegionInfo`
     """
-    return get_regions('ecs', connection_cls=VPCConnection)
+    return get_regions('vpc', connection_cls=VPCConnection)
 
 
 def connect_to_region(region_id, **kw_params):
@@ -47,7 +48,4 @@ def get_region(region_id, **kw_params):
     :return: The RegionInfo object for the given region or None if
              an invalid region name is provided.
     """
-    for region in regions(**kw_params):
-        if region.id == region_id:
-            return region
-    return None
+    return regioninfo.get_region('vpc', region_id, connection_cls=VPCConnection)
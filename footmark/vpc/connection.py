@@ -2,12 +2,11 @@
 import warnings
 
 import six
-import time
 import json
 
 from footmark.connection import ACSQueryConnection
 from footmark.vpc.regioninfo import RegionInfo
-from footmark.exception import VPCResponseError
+from footmark.exception import VPCResponseError, WaiterTimeoutError
 from footmark.ecs.vrouter import VRouterList
 
 
@@ -18,7 +17,7 @@ class VPCConnection(ACSQueryConnection):
     ResponseError = VPCResponseError
 
     def __init__(self, acs_access_key_id=None, acs_secret_access_key=None,
-                 region=None, sdk_version=None, security_token=None, ):
+                 region=None, sdk_version=None, security_token=None, **kwargs):
         """
         Init method to create a new connection to ECS.
         """
@@ -33,7 +32,8 @@ class VPCConnection(ACSQueryConnection):
 
         super(VPCConnection, self).__init__(acs_access_key_id,
                                             acs_secret_access_key,
-                                            self.region, self.VPCSDK, security_token)
+                                            self.region, self.VPCSDK, security_token,
+                                            **kwargs)
 
     def build_filter_params(self, params, filters):
         if not isinstance(filters, dict):
@@ -131,6 +131,22 @@ class VPCConnection(ACSQueryConnection):
 
         return results
 
+    def iter_vpcs(self, vpc_id=None, page_size=None, prefetch=False):
+        """
+        Iterate over all vpcs of particular region, fetching them page by page
+        :type vpc_id: str
+        :param vpc_id: Optional Id of the vpc to describe
+        :type page_size: integer
+        :param page_size: The number of vpcs fetched per request. The maximum value is 50
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+        :return: generator of vpcs in json format
+        """
+        params = {}
+        if vpc_id:
+            self.build_list_params(params, vpc_id, 'VpcId')
+        return self.paginate('DescribeVpcs', params, ['Vpcs', None], page_size, prefetch)
+
     def get_instance_info(self):
         """
         method to get all Instances of particular region 
@@ -312,6 +328,42 @@ class VPCConnection(ACSQueryConnection):
 
         return False, results
 
+    def iter_vrouters(self, vrouter_id=None, page_size=None, prefetch=False):
+        """
+        Iterate over vrouters, fetching them page by page
+        :type vrouter_id: str
+        :param vrouter_id: VRouter_Id to be fetched
+        :type page_size: integer
+        :param page_size: The number of vrouters fetched per request. The maximum value is 50
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+        :return: generator of VRouters in json format
+        """
+        params = {}
+        if vrouter_id is not None:
+            self.build_list_params(params, vrouter_id, 'VRouterId')
+        return self.paginate('DescribeVRouters', params, ['VRouters', None], page_size, prefetch)
+
+    def iter_route_tables(self, vrouter_id=None, route_table_id=None, page_size=None, prefetch=False):
+        """
+        Iterate over route tables, fetching them page by page
+        :type vrouter_id: str
+        :param vrouter_id: Id of the VRouter the route tables belong to
+        :type route_table_id: str
+        :param route_table_id: Id of the route table to be fetched
+        :type page_size: integer
+        :param page_size: The number of route tables fetched per request. The maximum value is 50
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+        :return: generator of route tables in json format
+        """
+        params = {}
+        if vrouter_id:
+            self.build_list_params(params, vrouter_id, 'VRouterId')
+        if route_table_id:
+            self.build_list_params(params, route_table_id, 'RouteTableId')
+        return self.paginate('DescribeRouteTables', params, ['RouteTables', None], page_size, prefetch)
+
     def delete_custom_route(self, purge_routes, vpc_id):
         """
         Deletes the specified RouteEntry for the vpc
@@ -430,6 +482,31 @@ class VPCConnection(ACSQueryConnection):
 
         return eip_details, results
 
+    def iter_eip_addresses(self, eip_address=None, allocation_id=None, eip_status=None,
+                           page_size=None, prefetch=False):
+        """
+        Iterate over the EIP details of a region, fetching them page by page
+        :type eip_address: str
+        :param eip_address: Optional EIP address to describe
+        :type allocation_id: str
+        :param allocation_id: Optional allocation ID of the EIP
+        :type eip_status: str
+        :param eip_status: Optional status of the EIPs
+        :type page_size: integer
+        :param page_size: The number of EIPs fetched per request. The maximum value is 50
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+        :return: generator of EIP details in json format
+        """
+        params = {}
+        if allocation_id:
+            self.build_list_params(params, allocation_id, 'AllocationId')
+        if eip_address:
+            self.build_list_params(params, eip_address, 'EipAddress')
+        if eip_status:
+            self.build_list_params(params, eip_status, 'Status')
+        return self.paginate('DescribeEipAddresses', params, ['EipAddresses', None], page_size, prefetch)
+
     def create_vpc(self, cidr_block=None, user_cidr=None, vpc_name=None, description=None, vswitches=None,
                    wait_timeout=None, wait=None):
 
@@ -480,7 +557,11 @@ class VPCConnection(ACSQueryConnection):
             results.append({"Error Code": error_code, "Error Message": error_msg})
         else:
             # creating vswitch(subnet) after creation of VPC
-            time.sleep(30)
+            try:
+                self.wait_for_vpc_status(vpc_id, 'Available')
+            except WaiterTimeoutError as ex:
+                results.append({"Error Code": ex.error_code, "Error Message": ex.message})
+                vswitches = None
 
             if vswitches:
                 vswitch_response = self.create_vswitch(vpc_id=vpc_id, vswitches=vswitches)
@@ -489,11 +570,90 @@ class VPCConnection(ACSQueryConnection):
                 else:
                      results.append(vswitch_response[1])
 
-        if str(wait).lower() in ['yes', 'true'] and wait_timeout:
-            time.sleep(wait_timeout)
+        if changed and str(wait).lower() in ['yes', 'true'] and wait_timeout:
+            try:
+                self.wait_for_vpc_status(vpc_id, 'Available', wait_timeout)
+            except WaiterTimeoutError as ex:
+                results.append({"Error Code": ex.error_code, "Error Message": ex.message})
 
         return changed, results
 
+    def wait_for_vpc_status(self, vpc_id, status, timeout=None):
+        """
+        Poll a VPC until it reaches the given status.
+
+        :type vpc_id: str
+        :param vpc_id: The ID of the VPC
+
+        :type status: str
+        :param status: The wanted status, such as Available
+
+        :type timeout: int
+        :param timeout: Seconds to wait at most
+        """
+        params = {}
+        self.build_list_params(params, vpc_id, 'VpcId')
+
+        def check():
+            vpcs = self.get_status('DescribeVpcs', params)['Vpcs']['Vpc']
+            return bool(vpcs) and str(vpcs[0]['Status']).lower() == status.lower()
+
+        return self.wait_until(check, 'VPC %s to be %s' % (vpc_id, status), timeout)
+
+    def wait_for_vswitch_status(self, vpc_id, vswitch_id, status, timeout=None):
+        """
+        Poll a VSwitch until it reaches the given status.
+
+        :type vpc_id: str
+        :param vpc_id: The VPC of the VSwitch
+
+        :type vswitch_id: str
+        :param vswitch_id: The ID of the VSwitch
+
+        :type status: str
+        :param status: The wanted status, such as Available
+
+        :type timeout: int
+        :param timeout: Seconds to wait at most
+        """
+        params = {}
+        self.build_list_params(params, vpc_id, 'VpcId')
+        self.build_list_params(params, vswitch_id, 'VSwitchId')
+
+        def check():
+            vswitches = self.get_status('DescribeVSwitches', params)['VSwitches']['VSwitch']
+            return bool(vswitches) and str(vswitches[0]['Status']).lower() == status.lower()
+
+        return self.wait_until(check, 'VSwitch %s to be %s' % (vswitch_id, status), timeout)
+
+    def wait_for_route_entry_status(self, route_table_id, destination_cidr_block, status, timeout=None):
+        """
+        Poll a route entry until it reaches the given status.
+
+        :type route_table_id: str
+        :param route_table_id: The route table of the route entry
+
+        :type destination_cidr_block: str
+        :param destination_cidr_block: The destination of the route entry
+
+        :type status: str
+        :param status: The wanted status, such as Available
+
+        :type timeout: int
+        :param timeout: Seconds to wait at most
+        """
+        params = {}
+        self.build_list_params(params, route_table_id, 'RouteTableId')
+
+        def check():
+            for table in self.get_status('DescribeRouteTables', params)['RouteTables']['RouteTable']:
+                for entry in table['RouteEntrys']['RouteEntry']:
+                    if entry['DestinationCidrBlock'] == destination_cidr_block:
+                        return str(entry['Status']).lower() == status.lower()
+            return False
+
+        return self.wait_until(check, 'route entry %s to be %s' % (destination_cidr_block, status), timeout)
+
     def create_vswitch(self, vpc_id, vswitches):
         """
         :type vpc_id: String
@@ -551,7 +711,8 @@ class VPCConnection(ACSQueryConnection):
                 results.append(response)
                 VSwitchId.append(response[u'VSwitchId'])
                 changed = True
-                time.sleep(10)
+                # The VPC accepts the next VSwitch once this one is ready
+                self.wait_for_vswitch_status(vpc_id, response[u'VSwitchId'], 'Available')
             except Exception as ex:
                 error_code = ex.error_code
                 error_msg = ex.message
@@ -620,7 +781,8 @@ class VPCConnection(ACSQueryConnection):
                                 response = self.get_status('CreateRouteEntry', params)
                                 results.append(response)
                                 changed = True
-                                time.sleep(10)
+                                self.wait_for_route_entry_status(vrouter_table_id, fixed_dest_cidr_block,
+                                                                 'Available')
                             else:
                                 results.append({"Error Message": str(vroute["next_hop_id"])+" Instance not found"})
                         except Exception as ex:
@@ -674,6 +836,31 @@ class VPCConnection(ACSQueryConnection):
 
         return False, results
 
+    def iter_vswitches(self, vpc_id=None, zone_id=None, vswitch_id=None, page_size=None, prefetch=False):
+        """
+        Iterate over the VSwitches of VPC with their status, fetching them page by page
+        :type vpc_id: string
+        :param vpc_id: ID of Vpc from which VSwitch belongs. If none is given,
+            the VSwitches of every VPC of the region are listed
+        :type zone_id: string
+        :param zone_id: ID of the Zone
+        :type vswitch_id: string
+        :param vswitch_id: The ID of the VSwitch to be queried
+        :type page_size: integer
+        :param page_size: The number of vswitches fetched per request. The maximum value is 50
+        :type prefetch: bool
+        :param prefetch: Fetch the next page in the background
+        :return: generator of vswitches in json format
+        """
+        params = {}
+        if vpc_id:
+            self.build_list_params(params, vpc_id, 'VpcId')
+        if zone_id:
+            self.build_list_params(params, zone_id, 'ZoneId')
+        if vswitch_id:
+            self.build_list_params(params, vswitch_id, 'VSwitchId')
+        return self.paginate('DescribeVSwitches', params, ['VSwitches', None], page_size, prefetch)
+
     def delete_vpc(self, vpc_id=None):
         """
         Delete Vpc
@@ -7,7 +7,7 @@ class VPCRegionInfo(RegionInfo):
     """
 
     def __init__(self, connection=None, name=None, id=None,
-                 connection_cls=None):
+                 connection_cls=None, endpoint=None):
         from footmark.vpc.connection import VPCConnection
         super(VPCRegionInfo, self).__init__(connection, name, id,
-                                            VPCConnection)
+                                            VPCConnection, endpoint)
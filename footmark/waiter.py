@@ -0,0 +1,72 @@
+"""
+Polls a resource until it reaches a wanted state, backing off
+exponentially between checks instead of sleeping for a fixed time.
+"""
+import random
+import time
+
+from footmark.exception import WaiterTimeoutError
+
+
+class Waiter(object):
+    """
+    Calls a check function until it returns a true value or the deadline
+    passes.
+
+    The first check runs immediately. The delay before each following check
+    starts at ``delay`` seconds and is multiplied by ``backoff`` up to
+    ``max_delay``, with up to ``jitter`` of it added at random so that many
+    waiters do not poll in lockstep.
+
+    :ivar timeout: Seconds after which :meth:`wait` gives up.
+    :ivar attempts: Number of checks made by the last :meth:`wait`.
+    :ivar elapsed: Seconds spent in the last :meth:`wait`.
+    """
+
+    def __init__(self, timeout=600, delay=1, max_delay=30, backoff=2, jitter=0.2):
+        self.timeout = timeout
+        self.delay = delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.attempts = 0
+        self.elapsed = 0.0
+
+    def delays(self):
+        """
+        Yield the successive delays between checks.
+        """
+        delay = self.delay
+        while True:
+            yield delay + random.uniform(0, delay * self.jitter)
+            delay = min(delay * self.backoff, self.max_delay)
+
+    def wait(self, check, description=None):
+        """
+        Wait until ``check()`` returns a true value.
+
+        :type check: callable
+        :param check: Called without arguments, returns a true value once the
+            wanted state is reached. Errors it raises are not caught.
+
+        :type description: str
+        :param description: What is waited for, used in the timeout error.
+
+        :return: The first true value returned by ``check``
+        :raises: :class:`footmark.exception.WaiterTimeoutError`
+        """
+        start = time.time()
+        deadline = start + self.timeout
+        self.attempts = 0
+        try:
+            for delay in self.delays():
+                self.attempts += 1
+                result = check()
+                if result:
+                    return result
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise WaiterTimeoutError(description or 'resource', self.timeout)
+                time.sleep(min(delay, remaining))
+        finally:
+            self.elapsed = time.time() - start
@@ -1,3 +1,8 @@
+import json
+import threading
+
+import six
+
 from tests.compat import mock, unittest
 
 
@@ -44,6 +49,31 @@ class ACSMockServiceTestCase(unittest.TestCase):
         http_response = self.create_response(status_code, header, body)
         self.service_connection.make_request.return_value = http_response
 
+    def set_action_responses(self, responses, default=None):
+        """
+        Answer each request with the response given for its action, and record the
+        requests in ``self.requests`` as (action, copy of params) pairs, even when sent concurrently.
+
+        A response is a body, a (status_code, body) pair, or a callable taking the params of
+        the request and returning one of those. Bodies that are not strings are sent as JSON,
+        and a body of None is the default_body. ``default`` answers the other actions.
+        """
+        self.requests = []
+        lock = threading.Lock()
+
+        def respond(action, params):
+            with lock:
+                self.requests.append((action, dict(params)))
+            response = responses.get(action, default)
+            if callable(response):
+                response = response(params)
+            status_code, body = response if isinstance(response, tuple) else (200, response)
+            if body is not None and not isinstance(body, six.string_types):
+                body = json.dumps(body)
+            return self.create_response(status_code, body=body)
+
+        self.service_connection.make_request.side_effect = respond
+
     def default_body(self):
         return ''
 
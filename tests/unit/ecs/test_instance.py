@@ -2,8 +2,14 @@
 # import sys
 # sys.path.append("../../..")
 from footmark.ecs.connection import ECSConnection
+from footmark.ecs.instance import Instance
+from footmark.ecs.securitygroup import SecurityGroup
+from footmark.ecs.volume import Disk
+from footmark.exception import ECSResponseError, WaiterTimeoutError
+from tests.compat import mock, unittest
 from tests.unit import ACSMockServiceTestCase
 import json
+import threading
 
 DESCRIBE_INSTANCE = '''
 {
@@ -473,6 +479,55 @@ class TestManageInstances(ACSMockServiceTestCase):
         self.assertEqual(len(result), len(self.instance_ids))
         self.assertIn(result[0], self.instance_ids)
 
+    def test_instance_action_errors(self):
+        def respond(action, params):
+            if params['set_InstanceId'] == self.instance_ids[1]:
+                raise ECSResponseError(403, json.dumps({'Code': 'IncorrectInstanceStatus'}))
+            return self.create_response(200, body='{"RequestId": "C0003E8B-B930-4F59-ADC0-0E209A9012A8"}')
+
+        self.service_connection.make_request.side_effect = respond
+        results = self.service_connection.run_instance_action('StopInstance', self.instance_ids)
+        self.assertEqual(list(results), self.instance_ids)
+        self.assertEqual(results.succeeded, self.instance_ids[:1])
+        self.assertEqual(results.errors[self.instance_ids[1]].error_code, 'IncorrectInstanceStatus')
+        self.assertRaises(ECSResponseError, self.service_connection.stop_instances, self.instance_ids)
+
+
+class TestWaitForInstances(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+    instance_ids = ['i-94dehop6n', 'i-95dertop6m', 'i-96derhop7s']
+
+    def setUp(self):
+        super(TestWaitForInstances, self).setUp()
+        self.service_connection.WaitDelay = 0.01
+        self.service_connection.make_request.side_effect = self.respond
+        # The tick at which each instance starts running
+        self.running_at = {'i-94dehop6n': 1, 'i-95dertop6m': 3, 'i-96derhop7s': 2}
+        self.requested = []
+
+    def respond(self, action, params):
+        ids = json.loads(params['set_InstanceIds'])
+        self.requested.append(ids)
+        tick = len(self.requested)
+        body = {"Instances": {"Instance": [
+            {"InstanceId": instance_id,
+             "Status": "Running" if tick >= self.running_at[instance_id] else "Starting"}
+            for instance_id in ids]}, "TotalCount": len(ids)}
+        return self.create_response(200, body=json.dumps(body))
+
+    def test_wait_for_instances(self):
+        timings = self.service_connection.wait_for_instances(self.instance_ids, 'Running')
+        self.assertEqual(self.requested, [self.instance_ids, self.instance_ids[1:], ['i-95dertop6m']])
+        self.assertEqual(list(timings), self.instance_ids)
+        self.assertTrue(timings['i-94dehop6n'] <= timings['i-96derhop7s'] <= timings['i-95dertop6m'])
+
+    def test_timeout(self):
+        # The other instances are ready from the first tick, however slow it is
+        self.running_at = {'i-94dehop6n': 1, 'i-95dertop6m': 1000, 'i-96derhop7s': 1}
+        with self.assertRaises(WaiterTimeoutError) as context:
+            self.service_connection.wait_for_instances(self.instance_ids, 'Running', timeout=0.1)
+        self.assertEqual(context.exception.pending, ['i-95dertop6m'])
+
 
 class TestDeleteSecurityGroup(ACSMockServiceTestCase): 
     connection_class = ECSConnection
@@ -570,6 +625,125 @@ class TestAuthorizeSecurityGroup(ACSMockServiceTestCase):
         self.assertEqual(rs, u'outbound rule authorization successful for group id sg-2ze95f8a2ni6bb2wql3b')
 
 
+DESCRIBE_SECURITY_GROUP_ATTRIBUTE = {
+    "internet": {
+        "RequestId": "9C9FB3CF-DC0A-4A2B-B6C4-0D2A3B8C1EAA",
+        "SecurityGroupId": "sg-2ze95f8a2ni6bb2wql3b",
+        "Permissions": {
+            "Permission": [
+                {"IpProtocol": "TCP", "PortRange": "22/22", "SourceCidrIp": "0.0.0.0/0", "Policy": "Accept",
+                 "Priority": "1", "NicType": "internet", "Direction": "ingress"},
+                {"IpProtocol": "TCP", "PortRange": "80/80", "SourceCidrIp": "0.0.0.0/0", "Policy": "Accept",
+                 "Priority": "1", "NicType": "internet", "Direction": "ingress"},
+                {"IpProtocol": "ALL", "PortRange": "-1/-1", "DestCidrIp": "0.0.0.0/0", "Policy": "Accept",
+                 "Priority": "1", "NicType": "internet", "Direction": "egress"}
+            ]
+        }
+    },
+    "intranet": {
+        "RequestId": "3B2A2F1E-1B1C-4B3E-A5F2-0C5D2E4A7B11",
+        "SecurityGroupId": "sg-2ze95f8a2ni6bb2wql3b",
+        "Permissions": {
+            "Permission": [
+                {"IpProtocol": "TCP", "PortRange": "3306/3306", "SourceGroupId": "sg-2zeb0n1uq3ph5nqsuhkx",
+                 "Policy": "Accept", "Priority": "10", "NicType": "intranet", "Direction": "ingress"}
+            ]
+        }
+    }
+}
+
+DESCRIBE_VPC_SECURITY_GROUP_ATTRIBUTE = {
+    "internet": {
+        "RequestId": "5F0D1B6A-3C2E-4F1D-9B8A-7E6C5D4B3A21",
+        "SecurityGroupId": "sg-2ze95f8a2ni6bb2wql3b",
+        "VpcId": "vpc-2zeghwzptn5zii0w7sm3y",
+        "Permissions": {"Permission": []}
+    },
+    "intranet": {
+        "RequestId": "6A1E2C7B-4D3F-4A2E-8C9B-8F7D6E5C4B32",
+        "SecurityGroupId": "sg-2ze95f8a2ni6bb2wql3b",
+        "VpcId": "vpc-2zeghwzptn5zii0w7sm3y",
+        "Permissions": {
+            "Permission": [
+                {"IpProtocol": "TCP", "PortRange": "22/22", "SourceCidrIp": "0.0.0.0/0", "Policy": "Accept",
+                 "Priority": "1", "NicType": "intranet", "Direction": "ingress"},
+                {"IpProtocol": "TCP", "PortRange": "3306/3306", "SourceGroupId": "sg-2zeb0n1uq3ph5nqsuhkx",
+                 "SourceGroupOwnerAccount": "1234567890123456", "Policy": "Accept", "Priority": "1",
+                 "NicType": "intranet", "Direction": "ingress"},
+                {"IpProtocol": "ALL", "PortRange": "-1/-1", "DestCidrIp": "0.0.0.0/0", "Policy": "Accept",
+                 "Priority": "1", "NicType": "intranet", "Direction": "egress"}
+            ]
+        }
+    }
+}
+
+
+class TestSyncSecurityGroupRules(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+    security_group_id = 'sg-2ze95f8a2ni6bb2wql3b'
+
+    def setUp(self):
+        super(TestSyncSecurityGroupRules, self).setUp()
+        self.attributes = DESCRIBE_SECURITY_GROUP_ATTRIBUTE
+        self.set_action_responses(
+            {'DescribeSecurityGroupAttribute': lambda params: self.attributes[params['set_NicType']]},
+            default=self.change_rule)
+
+    def change_rule(self, params):
+        if params.get('set_PortRange') == '8443/8443':
+            return 400, {"Code": "InvalidPortRange.Malformed", "Message": "Invalid port range"}
+        return {"RequestId": "FD5BEC47-2AE2-4D1E-A2B4-0CE2E2F9F8E2"}
+
+    @property
+    def calls(self):
+        return [(action, params.get('set_PortRange')) for action, params in self.requests
+                if action != 'DescribeSecurityGroupAttribute']
+
+    def test_converged(self):
+        inbound = [{"ip_protocol": "tcp", "port_range": "22/22", "cidr_ip": "0.0.0.0/0"},
+                   {"ip_protocol": "tcp", "port_range": "80/80", "cidr_ip": "0.0.0.0/0", "policy": "accept"},
+                   {"ip_protocol": "tcp", "port_range": "3306/3306", "group_id": "sg-2zeb0n1uq3ph5nqsuhkx",
+                    "priority": 10, "nic_type": "intranet"}]
+        outbound = [{"ip_protocol": "all", "cidr_ip": "0.0.0.0/0"}]
+        changed, authorized, revoked, failed = self.service_connection.sync_security_group_rules(
+            self.security_group_id, inbound, outbound)
+        self.assertEqual((changed, authorized, revoked, failed), (False, [], [], []))
+        self.assertEqual(self.calls, [])
+
+    def test_sync(self):
+        inbound = [{"ip_protocol": "tcp", "port_range": "22/22", "cidr_ip": "0.0.0.0/0"},
+                   {"ip_protocol": "tcp", "port_range": "443/443", "cidr_ip": "0.0.0.0/0"},
+                   {"ip_protocol": "tcp", "port_range": "8443/8443", "cidr_ip": "0.0.0.0/0"}]
+        changed, authorized, revoked, failed = self.service_connection.sync_security_group_rules(
+            self.security_group_id, inbound_rules=inbound)
+        self.assertTrue(changed)
+        self.assertEqual(authorized, [inbound[1]])
+        self.assertEqual(sorted(rule['port_range'] for rule in revoked), ['3306/3306', '80/80'])
+        self.assertEqual(failed[0]['Error Code'], 'InvalidPortRange.Malformed')
+        self.assertEqual(sorted(self.calls), [('AuthorizeSecurityGroup', '443/443'),
+                                              ('AuthorizeSecurityGroup', '8443/8443'),
+                                              ('RevokeSecurityGroup', '3306/3306'),
+                                              ('RevokeSecurityGroup', '80/80')])
+
+    def test_converged_without_nic_type(self):
+        # Rules peering with a group, and every rule of a VPC group, are intranet rules
+        self.attributes = DESCRIBE_VPC_SECURITY_GROUP_ATTRIBUTE
+        inbound = [{"ip_protocol": "tcp", "port_range": "22/22", "cidr_ip": "0.0.0.0/0"},
+                   {"ip_protocol": "tcp", "port_range": "3306/3306", "group_id": "sg-2zeb0n1uq3ph5nqsuhkx",
+                    "group_owner_id": "1234567890123456"}]
+        outbound = [{"ip_protocol": "all", "cidr_ip": "0.0.0.0/0"}]
+        changed, authorized, revoked, failed = self.service_connection.sync_security_group_rules(
+            self.security_group_id, inbound, outbound)
+        self.assertEqual((changed, authorized, revoked, failed), (False, [], [], []))
+        self.assertEqual(self.calls, [])
+
+    def test_no_purge(self):
+        changed, authorized, revoked, failed = self.service_connection.sync_security_group_rules(
+            self.security_group_id, outbound_rules=[{"ip_protocol": "icmp", "cidr_ip": "10.0.0.0/8"}], purge=False)
+        self.assertEqual((len(authorized), revoked), (1, []))
+        self.assertEqual(self.calls, [('AuthorizeSecurityGroupEgress', '-1/-1')])
+
+
 class TestCreateInstance(ACSMockServiceTestCase):
     connection_class = ECSConnection
 
@@ -633,8 +807,20 @@ class TestCreateInstance(ACSMockServiceTestCase):
     def default_body(self):
         return CREATE_INSTANCE
                                                                     
+    status = 'Stopped'
+
+    def respond(self, action, params):
+        if action == 'StartInstance':
+            self.status = 'Running'
+        if action == 'DescribeInstances':
+            body = {"Instances": {"Instance": [{"InstanceId": instance_id, "Status": self.status}
+                                               for instance_id in json.loads(params['set_InstanceIds'])]},
+                    "TotalCount": 1}
+            return self.create_response(200, body=json.dumps(body))
+        return self.create_response(200)
+
     def test_create_instance(self):
-        self.set_http_response(status_code=200)
+        self.service_connection.make_request.side_effect = self.respond
         changed, result = self.service_connection.create_instance(image_id=self.image_id,
                                                                   instance_type=self.instance_type,
                                                                   group_id=self.group_id, zone_id=self.zone_id,
@@ -660,6 +846,56 @@ class TestCreateInstance(ACSMockServiceTestCase):
             self.assertEqual(result[0]['instance_id'], u'i-2zeg0900kzwn7dpo7zrb')
 
 
+class TestLaunchInstances(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+    tokens = ['token-1', 'token-2', 'token-3']
+
+    def setUp(self):
+        super(TestLaunchInstances, self).setUp()
+        self.service_connection.WaitDelay = 0.01
+        self.service_connection.WaitMaxDelay = 0.05
+        self.service_connection.make_request.side_effect = self.respond
+        self.lock = threading.Lock()
+        self.statuses = {}
+        self.calls = []
+
+    def respond(self, action, params):
+        with self.lock:
+            self.calls.append((action, params))
+            if action == 'CreateInstance':
+                instance_id = 'i-' + params['set_ClientToken']
+                self.statuses[instance_id] = 'Pending'
+                body = {"InstanceId": instance_id}
+            elif action == 'StartInstance':
+                self.statuses[params['set_InstanceId']] = 'Running'
+                body = {"RequestId": "C0003E8B-B930-4F59-ADC0-0E209A9012A8"}
+            elif action == 'DescribeInstances':
+                ids = json.loads(params['set_InstanceIds'])
+                body = {"Instances": {"Instance": [{"InstanceId": instance_id, "Status": self.statuses[instance_id]}
+                                                   for instance_id in ids]}, "TotalCount": len(ids)}
+                # Each new instance is stopped one tick after the last one
+                pending = [instance_id for instance_id in sorted(self.statuses)
+                           if self.statuses[instance_id] == 'Pending']
+                if pending:
+                    self.statuses[pending[0]] = 'Stopped'
+            else:
+                body = {"RequestId": "C0003E8B-B930-4F59-ADC0-0E209A9012A8"}
+            return self.create_response(200, body=json.dumps(body))
+
+    def test_launch_instances(self):
+        changed, results, instance_ids = self.service_connection.launch_instances(
+            {'set_ImageId': 'centos6u5_64_40G_cloudinit_20160427.raw'}, 3, self.tokens, allocate_public_ip=True)
+        self.assertTrue(changed)
+        self.assertEqual(results, [{"instance_id": 'i-' + token} for token in self.tokens])
+        tokens = sorted(params['set_ClientToken'] for action, params in self.calls if action == 'CreateInstance')
+        self.assertEqual(tokens, self.tokens)
+        allocated = sorted(params['set_InstanceId'] for action, params in self.calls
+                           if action == 'AllocatePublicIpAddress')
+        self.assertEqual(allocated, instance_ids)
+        describes = [action for action, params in self.calls if action == 'DescribeInstances']
+        self.assertLess(len(describes), 10)
+
+
 class TestModifyInstance(ACSMockServiceTestCase):
     connection_class = ECSConnection
     attributes = [
@@ -711,8 +947,17 @@ class TestJoinSecGrp(ACSMockServiceTestCase):
     def default_body(self):
         return JOIN_GROUP
 
+    def respond(self, action, params):
+        if action == 'DescribeInstances':
+            body = {"Instances": {"Instance": [{"InstanceId": instance_id,
+                                                "SecurityGroupIds": {"SecurityGroupId": [self.group_id]}}
+                                               for instance_id in json.loads(params['set_InstanceIds'])]},
+                    "TotalCount": 1}
+            return self.create_response(200, body=json.dumps(body))
+        return self.create_response(200)
+
     def test_join_grp(self):
-        self.set_http_response(status_code=200)
+        self.service_connection.make_request.side_effect = self.respond
         changed, result, success_instance_ids, failed_instance_ids = self.service_connection.join_security_group(
             instance_ids=self.instance_ids, group_id=self.group_id)
         res=''
@@ -733,8 +978,17 @@ class TestLeaveSecGrp(ACSMockServiceTestCase):
     def default_body(self):
         return LEAVE_GROUP
 
+    def respond(self, action, params):
+        if action == 'DescribeInstances':
+            body = {"Instances": {"Instance": [{"InstanceId": instance_id,
+                                                "SecurityGroupIds": {"SecurityGroupId": []}}
+                                               for instance_id in json.loads(params['set_InstanceIds'])]},
+                    "TotalCount": 1}
+            return self.create_response(200, body=json.dumps(body))
+        return self.create_response(200)
+
     def test_leave_grp(self):
-        self.set_http_response(status_code=200)
+        self.service_connection.make_request.side_effect = self.respond
         changed, result, success_instance_ids, failed_instance_ids = self.service_connection.leave_security_group(
             instance_ids=self.instance_ids, group_id=self.group_id)
         res=''
@@ -744,6 +998,42 @@ class TestLeaveSecGrp(ACSMockServiceTestCase):
             res = "fail"
 
 
+class TestSecurityGroupMembership(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+    group_id = 'sg-2zeewmie535ht7d90cki'
+    instance_ids = ['i-2zehfxz81ar5kvptw%03d' % i for i in range(50)]
+
+    def setUp(self):
+        super(TestSecurityGroupMembership, self).setUp()
+        self.set_action_responses({'DescribeInstances': self.describe_instances,
+                                   'JoinSecurityGroup': self.join_security_group})
+
+    def describe_instances(self, params):
+        # The last instance never shows the group
+        items = [{"InstanceId": instance_id,
+                  "SecurityGroupIds": {"SecurityGroupId": [] if instance_id.endswith('049') else [self.group_id]}}
+                 for instance_id in json.loads(params['set_InstanceIds'])]
+        return {"Instances": {"Instance": items}, "TotalCount": len(items)}
+
+    def join_security_group(self, params):
+        if params['set_InstanceId'].endswith('000'):
+            return 403, {"Code": "IncorrectInstanceStatus", "Message": "The instance is locked."}
+        return JOIN_GROUP
+
+    def test_join(self):
+        errors = self.service_connection.update_security_group_membership(self.instance_ids, self.group_id,
+                                                                          timeout=0.2)
+        self.assertEqual(list(errors), self.instance_ids)
+        self.assertEqual(errors[self.instance_ids[0]].error_code, 'IncorrectInstanceStatus')
+        self.assertEqual(errors[self.instance_ids[-1]].error_code, 'WaiterTimeout')
+        self.assertEqual([instance_id for instance_id, error in errors.items() if error is None],
+                         self.instance_ids[1:-1])
+        actions = [action for action, params in self.requests]
+        self.assertEqual(actions.count('JoinSecurityGroup'), 50)
+        # One describe of every joined instance, then one of the last instance per tick
+        self.assertLessEqual(actions.count('DescribeInstances'), 3)
+
+
 class TestCreateDisk(ACSMockServiceTestCase):
     connection_class = ECSConnection
    
@@ -847,6 +1137,16 @@ class TestCreateImage(ACSMockServiceTestCase):
                                                                                      wait=None, wait_timeout=None)
         self.assertEqual(image_id, 'm-j6cb0rw4eso5jsc6927n')               
 
+    def test_create_image_wait_timeout(self):
+        self.set_http_response(status_code=200)
+        self.service_connection.wait_for_image_status = mock.Mock(
+            side_effect=WaiterTimeoutError('image m-j6cb0rw4eso5jsc6927n to be Available', 1))
+        changed, image_id, result, request_id = self.service_connection.create_image(image_name=self.image_name,
+                                                                                     instance_id='i-j6c5txh3q0wivxt5m807',
+                                                                                     wait='yes', wait_timeout=1)
+        self.assertEqual(image_id, 'm-j6cb0rw4eso5jsc6927n')
+        self.assertEqual([entry["Error Code"] for entry in result], ['WaiterTimeout'])
+
 
 class TestDeleteImage(ACSMockServiceTestCase): 
     connection_class = ECSConnection
@@ -874,3 +1174,119 @@ class TestDeleteImage(ACSMockServiceTestCase):
 
 
 
+
+
+class TestGetAllInstancesEnrichment(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+
+    bodies = {
+        'DescribeInstances': {
+            "Instances": {"Instance": [
+                {"InstanceId": "i-94dehop6n", "Status": "Running", "ZoneId": "cn-beijing-a",
+                 "SecurityGroupIds": {"SecurityGroupId": ["sg-94kd0cyg0"]}},
+                {"InstanceId": "i-95dertop6m", "Status": "Running", "ZoneId": "cn-beijing-a",
+                 "SecurityGroupIds": {"SecurityGroupId": ["sg-94kd0cyg0"]}},
+                {"InstanceId": "i-96derhop7s", "Status": "Stopped", "ZoneId": "cn-beijing-b",
+                 "SecurityGroupIds": {"SecurityGroupId": ["sg-95kd0cyg1"]}}
+            ]},
+            "TotalCount": 3
+        },
+        'DescribeDisks': {
+            "Disks": {"Disk": [
+                {"DiskId": "d-28m5zbua0", "InstanceId": "i-94dehop6n", "ZoneId": "cn-beijing-a", "Status": "In_use"},
+                {"DiskId": "d-28m5zbua1", "InstanceId": "i-94dehop6n", "ZoneId": "cn-beijing-a", "Status": "In_use"},
+                {"DiskId": "d-28m5zbua2", "InstanceId": "i-96derhop7s", "ZoneId": "cn-beijing-b", "Status": "In_use"},
+                {"DiskId": "d-28m5zbua3", "InstanceId": "", "ZoneId": "cn-beijing-a", "Status": "Available"}
+            ]},
+            "TotalCount": 4
+        },
+        'DescribeSecurityGroups': {
+            "SecurityGroups": {"SecurityGroup": [
+                {"SecurityGroupId": "sg-94kd0cyg0", "SecurityGroupName": "web"},
+                {"SecurityGroupId": "sg-95kd0cyg1", "SecurityGroupName": "db"},
+                {"SecurityGroupId": "sg-96kd0cyg2", "SecurityGroupName": "unused"}
+            ]},
+            "TotalCount": 3
+        }
+    }
+
+    def setUp(self):
+        super(TestGetAllInstancesEnrichment, self).setUp()
+        self.set_action_responses({'DescribeInstances': self.bodies['DescribeInstances'],
+                                   'DescribeDisks': self.describe_disks,
+                                   'DescribeSecurityGroups': self.describe_security_groups})
+
+    def describe_disks(self, params):
+        disks = [disk for disk in self.bodies['DescribeDisks']["Disks"]["Disk"]
+                 if disk["ZoneId"] == params['set_ZoneId']]
+        return {"Disks": {"Disk": disks}, "TotalCount": len(disks)}
+
+    def describe_security_groups(self, params):
+        group_ids = json.loads(params['set_SecurityGroupIds'])
+        groups = [group for group in self.bodies['DescribeSecurityGroups']["SecurityGroups"]["SecurityGroup"]
+                  if group["SecurityGroupId"] in group_ids]
+        return {"SecurityGroups": {"SecurityGroup": groups}, "TotalCount": len(groups)}
+
+    def test_batched_enrichment(self):
+        instances = self.service_connection.get_all_instances()
+        calls = sorted((action, params.get('set_ZoneId') or params.get('set_SecurityGroupIds'))
+                       for action, params in self.requests)
+        self.assertEqual(calls, [('DescribeDisks', 'cn-beijing-a'), ('DescribeDisks', 'cn-beijing-b'),
+                                 ('DescribeInstances', None),
+                                 ('DescribeSecurityGroups', '["sg-94kd0cyg0", "sg-95kd0cyg1"]')])
+        self.assertEqual(sorted(instances[0].block_device_mapping), ['d-28m5zbua0', 'd-28m5zbua1'])
+        self.assertEqual(instances[1].block_device_mapping, {})
+        self.assertEqual(list(instances[2].block_device_mapping), ['d-28m5zbua2'])
+        self.assertEqual([group.id for group in instances[0].security_groups], ['sg-94kd0cyg0'])
+        self.assertEqual(instances[2].group_name, 'db')
+
+    def test_skip_volumes(self):
+        instances = self.service_connection.get_all_instances(with_volumes=False)
+        actions = [action for action, params in self.requests]
+        self.assertEqual(actions, ['DescribeInstances', 'DescribeSecurityGroups'])
+        self.assertEqual(len(instances), 3)
+
+
+class TestResourceModel(unittest.TestCase):
+    def test_instance_aliases(self):
+        inst = Instance()
+        inst.id = 'i-94dehop6n'
+        inst.state = 'Running'
+        inst.vswitch_id = 'vsw-rj9v3y42xzbvgagukas4o'
+        inst.inner_ip_address = {'ip_address': ['10.170.106.80']}
+        inst.group_id = ['sg-94kd0cyg0']
+        self.assertEqual(inst.instance_id, 'i-94dehop6n')
+        self.assertEqual(inst.status, 'running')
+        self.assertEqual(inst.subnet_id, 'vsw-rj9v3y42xzbvgagukas4o')
+        self.assertEqual(inst.private_ip, '10.170.106.80')
+        self.assertEqual(inst.security_group_id, 'sg-94kd0cyg0')
+        self.assertEqual(inst.__dict__, {})
+        self.assertRaises(AttributeError, getattr, inst, 'eip')
+
+    def test_computed_attributes(self):
+        inst = Instance()
+        inst.eip_address = {'ip_address': '120.25.13.106', 'allocation_id': 'eip-2zeerraiwb7ujsxdc0ga'}
+        group = SecurityGroup()
+        group.group_name = 'web'
+        inst.groups = [group]
+        self.assertEqual(inst.eip, '120.25.13.106')
+        self.assertEqual(inst.group_name, 'web')
+        inst.security_group_name = 'db'
+        self.assertEqual(group.name, 'db')
+
+    def test_disk_prefix_aliases(self):
+        disk = Disk()
+        disk.volume_id = 'd-28m5zbua0'
+        disk.delete_on_termination = True
+        self.assertEqual(disk.id, 'd-28m5zbua0')
+        self.assertTrue(disk.delete_with_instance)
+        self.assertRaises(AttributeError, getattr, disk, 'volume_name')
+
+    def test_update(self):
+        inst, updated = Instance(), Instance()
+        inst.id = updated.id = 'i-94dehop6n'
+        updated.status = 'Stopped'
+        updated.custom_field = 1
+        inst._update(updated)
+        self.assertEqual(inst.state, 'stopped')
+        self.assertEqual(inst.custom_field, 1)
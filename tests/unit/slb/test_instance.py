@@ -4,6 +4,8 @@
 from footmark.slb.connection import SLBConnection
 from tests.unit import ACSMockServiceTestCase
 import json
+import threading
+import time
 
 
 CREATE_LOAD_BALANCER = '''
@@ -590,3 +592,385 @@ class TestModifyVServerGroup(ACSMockServiceTestCase):
             vserver_group_id=self.vserver_group_id, purge_backend_servers=self.purge_backend_servers,
             backend_servers=self.backend_servers)
         self.assertEqual(result[u'VServerGroupId'], 'rsp-dj1v1fcup9efj')
+
+
+class TestSyncBackendServers(ACSMockServiceTestCase):
+    connection_class = SLBConnection
+
+    region = "ap-southeast-1"
+    loadbalancerid = 'lb-gs5s110nqe1gnijldgl39'
+    current = [{"ServerId": "i-t4n73vl5oaxuxmigat9x", "Weight": 100},
+               {"ServerId": "i-t4njdk51ejf1a3xm9s2n", "Weight": 40},
+               {"ServerId": "i-t4n5mxdk5v0kkrxgr2ed", "Weight": 100}]
+
+    def setUp(self):
+        super(TestSyncBackendServers, self).setUp()
+        self.responses = {'DescribeLoadBalancerAttribute': self.load_balancer(self.current)}
+        self.set_action_responses(self.responses, default=self.load_balancer([]))
+
+    def load_balancer(self, backend_servers):
+        return {"LoadBalancerId": self.loadbalancerid, "BackendServers": {"BackendServer": backend_servers}}
+
+    def fail(self, action):
+        self.responses[action] = (400, {"Code": "BackendServer.configuring",
+                                        "Message": "A previous configuration is ongoing."})
+
+    @property
+    def calls(self):
+        return [(action, json.loads(params['set_BackendServers'])) for action, params in self.requests
+                if action != 'DescribeLoadBalancerAttribute']
+
+    def test_converged(self):
+        desired = [{'server_id': 'i-t4n73vl5oaxuxmigat9x'},
+                   {'server_id': 'i-t4njdk51ejf1a3xm9s2n', 'weight': '40'},
+                   {'server_id': 'i-t4n5mxdk5v0kkrxgr2ed', 'weight': 100}]
+        changed, current_backend_servers, result = self.service_connection.sync_backend_servers(
+            self.loadbalancerid, desired)
+        self.assertFalse(changed)
+        self.assertEqual(current_backend_servers, self.current)
+        self.assertEqual(self.calls, [])
+
+    def test_sync(self):
+        desired = [{'server_id': 'i-t4n73vl5oaxuxmigat9x', 'weight': 100},
+                   {'server_id': 'i-t4njdk51ejf1a3xm9s2n', 'weight': 80},
+                   {'server_id': 'i-t4nbhxkb8gbblw0qsyaq', 'weight': 100}]
+        changed, current_backend_servers, result = self.service_connection.sync_backend_servers(
+            self.loadbalancerid, desired)
+        self.assertTrue(changed)
+        self.assertEqual(self.calls, [
+            ('AddBackendServers', [{'ServerId': 'i-t4nbhxkb8gbblw0qsyaq', 'Weight': '100'}]),
+            ('SetBackendServers', [{'ServerId': 'i-t4njdk51ejf1a3xm9s2n', 'Weight': '80'}]),
+            ('RemoveBackendServers', ['i-t4n5mxdk5v0kkrxgr2ed']),
+        ])
+
+    def test_sync_without_purge(self):
+        desired = [{'server_id': 'i-t4nbhxkb8gbblw0qsyaq', 'weight': 100}]
+        self.service_connection.sync_backend_servers(self.loadbalancerid, desired, purge=False)
+        self.assertEqual(self.calls, [
+            ('AddBackendServers', [{'ServerId': 'i-t4nbhxkb8gbblw0qsyaq', 'Weight': '100'}]),
+        ])
+
+    def test_add_failed(self):
+        self.fail('AddBackendServers')
+        desired = [{'server_id': 'i-t4nbhxkb8gbblw0qsyaq', 'weight': 100}]
+        changed, current_backend_servers, result = self.service_connection.sync_backend_servers(
+            self.loadbalancerid, desired)
+        self.assertFalse(changed)
+        self.assertEqual(current_backend_servers, self.current)
+        self.assertEqual([action for action, servers in self.calls], ['AddBackendServers'])
+        self.assertEqual(result[0], "Failed to add 1 backend server(s).")
+
+    def test_describe_failed(self):
+        self.fail('DescribeLoadBalancerAttribute')
+        changed, current_backend_servers, result = self.service_connection.sync_backend_servers(
+            self.loadbalancerid, [])
+        self.assertFalse(changed)
+        self.assertEqual(self.calls, [])
+        self.assertTrue(result[0].startswith("Failed to describe backend servers with error code "
+                                             "BackendServer.configuring"))
+
+    def test_purge_add_backend_server(self):
+        changed, result = self.service_connection.purge_add_backend_server(
+            self.loadbalancerid, ['i-t4n73vl5oaxuxmigat9x', 'i-t4n5mxdk5v0kkrxgr2ed'], purge_instance_ids=True)
+        self.assertTrue(changed)
+        self.assertEqual(self.calls, [('RemoveBackendServers', ['i-t4njdk51ejf1a3xm9s2n'])])
+
+
+class TestReconcileVServerGroup(ACSMockServiceTestCase):
+    connection_class = SLBConnection
+
+    region = 'cn-beijing'
+    vserver_group_id = 'rsp-dj1v1fcup9efj'
+    current = [{"ServerId": "i-2zec953dxl686o8p4vq1", "Port": 80, "Weight": 100},
+               {"ServerId": "i-2zec953dxl686o8p4vq1", "Port": 8080, "Weight": 100},
+               {"ServerId": "i-2zehfxz81ar5kvptw8b1", "Port": 80, "Weight": 50}]
+
+    def setUp(self):
+        super(TestReconcileVServerGroup, self).setUp()
+        self.set_action_responses({'DescribeVServerGroupAttribute': lambda params: self.group(self.current)},
+                                  default=self.change_group)
+
+    def group(self, servers):
+        return {"VServerGroupId": self.vserver_group_id, "VServerGroupName": "group",
+                "BackendServers": {"BackendServer": list(servers)}}
+
+    def change_group(self, params):
+        requested = json.loads(params['set_BackendServers'])
+        return self.group(dict(server, Weight=int(server.get('Weight', 100))) for server in requested)
+
+    @property
+    def calls(self):
+        return [(action, [(server['ServerId'], server['Port']) for server in json.loads(params['set_BackendServers'])])
+                for action, params in self.requests if action != 'DescribeVServerGroupAttribute']
+
+    def test_plan(self):
+        response, current = self.service_connection.get_vserver_group_backend_servers(self.vserver_group_id)
+        self.assertEqual(list(current), [('i-2zec953dxl686o8p4vq1', 80), ('i-2zec953dxl686o8p4vq1', 8080),
+                                         ('i-2zehfxz81ar5kvptw8b1', 80)])
+        purge = [{'server_id': 'i-2zec953dxl686o8p4vq1', 'port': 8080},
+                 {'server_id': 'i-2zec953dxl686o8p4vq1', 'port': 443}]
+        backend_servers = [{'server_id': 'i-2zec953dxl686o8p4vq1', 'port': '80', 'weight': '100'},
+                           {'server_id': 'i-2zehfxz81ar5kvptw8b1', 'port': 80, 'weight': 100},
+                           {'server_id': 'i-2zehfxz81ar5kvptw8b1', 'port': 443, 'weight': 100}]
+        to_remove, to_set, to_add = self.service_connection.plan_vserver_group_backend_servers(
+            current, backend_servers, purge)
+        self.assertEqual(to_remove, purge[:1])
+        self.assertEqual(to_set, backend_servers[1:2])
+        self.assertEqual(to_add, backend_servers[2:])
+
+    def test_modify(self):
+        purge = [{'server_id': 'i-2zec953dxl686o8p4vq1', 'port': 8080}]
+        backend_servers = [{'server_id': 'i-2zehfxz81ar5kvptw8b1', 'port': 80, 'weight': 100},
+                           {'server_id': 'i-2zehfxz81ar5kvptw8b1', 'port': 443, 'weight': 100}]
+        changed, result = self.service_connection.modify_vserver_group_backend_server(
+            self.vserver_group_id, purge, backend_servers)
+        self.assertTrue(changed)
+        self.assertEqual(self.calls, [
+            ('RemoveVServerGroupBackendServers', [('i-2zec953dxl686o8p4vq1', 8080)]),
+            ('SetVServerGroupAttribute', [('i-2zehfxz81ar5kvptw8b1', 80)]),
+            ('AddVServerGroupBackendServers', [('i-2zehfxz81ar5kvptw8b1', 443)]),
+        ])
+        self.assertNotIn('VServerGroupName', result)
+
+    def test_modify_converged(self):
+        backend_servers = [{'server_id': 'i-2zehfxz81ar5kvptw8b1', 'port': 80, 'weight': 50}]
+        changed, result = self.service_connection.modify_vserver_group_backend_server(
+            self.vserver_group_id, [], backend_servers)
+        self.assertFalse(changed)
+        self.assertEqual(self.calls, [])
+        self.assertEqual(result['BackendServers']['BackendServer'], [self.current[2]])
+
+    def test_describe_backend_servers(self):
+        backend_servers = [{'server_id': 'i-2zec953dxl686o8p4vq1', 'port': 8080},
+                           {'server_id': 'i-2zehfxz81ar5kvptw8b1', 'port': 443}]
+        changed, result = self.service_connection.describe_vservergroup_backendserver(
+            self.vserver_group_id, backend_servers)
+        self.assertFalse(changed)
+        self.assertEqual(len(result), 1)
+        changed, result = self.service_connection.describe_vservergroup_backendserver_to_add(
+            self.vserver_group_id, backend_servers)
+        self.assertFalse(changed)
+        self.assertEqual(result, ['i-2zec953dxl686o8p4vq1 ECS with port 8080 is already present'])
+
+
+class TestChunkBackendServers(ACSMockServiceTestCase):
+    connection_class = SLBConnection
+
+    region = "ap-southeast-1"
+    loadbalancerid = 'lb-gs5s110nqe1gnijldgl39'
+    vserver_group_id = 'rsp-dj1v1fcup9efj'
+    server_ids = ['i-t4n73vl5oaxuxmig%03d' % i for i in range(45)]
+
+    def setUp(self):
+        super(TestChunkBackendServers, self).setUp()
+        self.set_action_responses(
+            {'CreateVServerGroup': lambda params: self.change_backend_servers(params,
+                                                                              VServerGroupId=self.vserver_group_id)},
+            default=self.change_backend_servers)
+
+    def change_backend_servers(self, params, **body):
+        requested = json.loads(params['set_BackendServers'])
+        # The chunk holding the 21st server fails
+        if self.server_ids[20] in [server['ServerId'] if isinstance(server, dict) else server for server in requested]:
+            return 400, {"Code": "BackendServer.configuring", "Message": "A previous configuration is ongoing."}
+        body["BackendServers"] = {"BackendServer": [server if isinstance(server, dict) else {"ServerId": server}
+                                                    for server in requested]}
+        return body
+
+    @property
+    def calls(self):
+        return [(action, len(json.loads(params['set_BackendServers']))) for action, params in self.requests]
+
+    def test_add_backend_servers(self):
+        backend_servers = [{'server_id': server_id, 'weight': 100} for server_id in self.server_ids]
+        changed, current_backend_servers, result = self.service_connection.add_backend_servers(
+            self.loadbalancerid, backend_servers)
+        self.assertTrue(changed)
+        self.assertEqual(sorted(self.calls), [('AddBackendServers', 5), ('AddBackendServers', 20),
+                                              ('AddBackendServers', 20)])
+        self.assertEqual([server['ServerId'] for server in current_backend_servers],
+                         self.server_ids[:20] + self.server_ids[40:])
+        self.assertEqual(result[:2], ["Added Backend Server(s) successfully.", "Failed to add 20 backend server(s)."])
+        self.assertEqual([server['ServerId'] for server in result[2]['FailedBackendServers']],
+                         self.server_ids[20:40])
+        self.assertEqual(result[2]['FailedBackendServers'][0]['Error Code'], 'BackendServer.configuring')
+
+    def test_remove_backend_servers_partly_failed(self):
+        changed, current_backend_servers, result = self.service_connection.remove_backend_servers(
+            self.loadbalancerid, self.server_ids[:40])
+        self.assertTrue(changed)
+        self.assertEqual([server['ServerId'] for server in result[2]['FailedBackendServers']],
+                         self.server_ids[20:40])
+
+    def test_remove_backend_servers_all_failed(self):
+        changed, current_backend_servers, result = self.service_connection.remove_backend_servers(
+            self.loadbalancerid, self.server_ids[20:40])
+        self.assertFalse(changed)
+        self.assertEqual(self.calls, [('RemoveBackendServers', 20)])
+        self.assertEqual(result[0], "Failed to remove 20 backend server(s).")
+        self.assertEqual([server['ServerId'] for server in result[1]['FailedBackendServers']],
+                         self.server_ids[20:40])
+
+    def test_create_vserver_group(self):
+        backend_servers = [{'server_id': server_id, 'port': 80, 'weight': 100} for server_id in self.server_ids[:25]]
+        changed, result = self.service_connection.create_vserver_group(self.loadbalancerid, 'group',
+                                                                       backend_servers)
+        self.assertTrue(changed)
+        self.assertEqual(self.calls, [('CreateVServerGroup', 20), ('AddVServerGroupBackendServers', 5)])
+        self.assertEqual(len(result['BackendServers']['BackendServer']), 20)
+        self.assertEqual([server['ServerId'] for server in result['FailedBackendServers']], self.server_ids[20:25])
+        self.assertEqual(result['FailedBackendServers'][0]['Error Code'], 'BackendServer.configuring')
+
+
+class TestProvisionListeners(ACSMockServiceTestCase):
+    connection_class = SLBConnection
+
+    region_id = "cn-beijing"
+    slb_id = 'lb-2ze9vjx6o2hnmte7s71d6'
+    listeners = [{"protocol": protocol, "load_balancer_port": str(port), "instance_port": "80", "bandwidth": "1"}
+                 for protocol in ("http", "tcp", "udp") for port in (80, 81)]
+    instance_ids = ['i-2zehfxz81ar5kvptw8b1', 'i-2zec953dxl686o8p4vq1']
+
+    def setUp(self):
+        super(TestProvisionListeners, self).setUp()
+        self.active = self.max_active = 0
+        self.lock = threading.Lock()
+        self.set_action_responses({'DescribeLoadBalancerAttribute': self.describe_load_balancer,
+                                   'AddBackendServers': self.add_backend_servers}, default=self.slow_response)
+
+    def slow_response(self, params, **body):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        body.update(RequestId="365F4154-92F6-4AE4-92F8-7FF34B540710", LoadBalancerId=self.slb_id)
+        return body
+
+    def describe_load_balancer(self, params):
+        return self.slow_response(params, ListenerPortsAndProtocal={"ListenerPortAndProtocal": [
+            {"ListenerPort": port, "ListenerProtocal": "tcp"} for port in (22, 80, 443)]})
+
+    def add_backend_servers(self, params):
+        return self.slow_response(params, BackendServers={"BackendServer": [
+            {"ServerId": server["ServerId"], "Weight": 100} for server in json.loads(params['set_BackendServers'])]})
+
+    @property
+    def calls(self):
+        return [(action, params.get('set_ListenerPort')) for action, params in self.requests]
+
+    def test_create_load_balancer(self):
+        changed, results = self.service_connection.create_load_balancer(
+            load_balancer_name='test_slb', address_type='internet', listeners=self.listeners,
+            instance_ids=self.instance_ids)
+        self.assertTrue(changed)
+        self.assertEqual(self.calls[0], ('CreateLoadBalancer', None))
+        self.assertEqual(sorted(self.calls[1:]), sorted(
+            [('AddBackendServers', None)] +
+            [('CreateLoadBalancer%sListener' % protocol, str(port)) for protocol in ('HTTP', 'TCP', 'UDP')
+             for port in (80, 81)] +
+            [('StartLoadBalancerListener', str(port)) for port in (80, 81) * 3]))
+        self.assertGreater(self.max_active, 1)
+        self.assertEqual([list(result)[0] for result in results[1:]],
+                         ['http_listener_result'] * 2 + ['tcp_listener_result'] * 2 +
+                         ['udp_listener_result'] * 2 + ['backend_server_result'])
+
+    def test_add_listeners(self):
+        changed, results = self.service_connection.add_listeners(self.slb_id, purge_listener=True,
+                                                                 listeners=self.listeners[2:4])
+        self.assertTrue(changed)
+        self.assertEqual(self.calls[0], ('DescribeLoadBalancerAttribute', None))
+        self.assertEqual(sorted(self.calls[1:4]), [('DeleteLoadBalancerListener', port) for port in (22, 80, 443)])
+        self.assertEqual(sorted(self.calls[4:]), [('CreateLoadBalancerTCPListener', '80'),
+                                                  ('CreateLoadBalancerTCPListener', '81'),
+                                                  ('StartLoadBalancerListener', '80'),
+                                                  ('StartLoadBalancerListener', '81')])
+        self.assertEqual(results, [{"tcp_listener_result": {"RequestId": "365F4154-92F6-4AE4-92F8-7FF34B540710",
+                                                            "LoadBalancerId": self.slb_id}}] * 2)
+
+
+class TestEnsureListener(ACSMockServiceTestCase):
+    connection_class = SLBConnection
+
+    region_id = "cn-beijing"
+    slb_id = 'lb-2ze9vjx6o2hnmte7s71d6'
+    http_attributes = {"ListenerPort": 80, "BackendServerPort": 8080, "Bandwidth": -1, "Scheduler": "wrr",
+                       "Status": "running", "HealthCheck": "on", "HealthCheckURI": "/index.html",
+                       "HealthCheckConnectPort": 8080, "HealthyThreshold": 3, "UnhealthyThreshold": 3,
+                       "HealthCheckTimeout": 5, "HealthCheckInterval": 2, "StickySession": "on",
+                       "StickySessionType": "insert", "CookieTimeout": 500, "Gzip": "on"}
+
+    def setUp(self):
+        super(TestEnsureListener, self).setUp()
+        self.responses = {
+            'DescribeLoadBalancerAttribute': {
+                "LoadBalancerId": self.slb_id, "ListenerPortsAndProtocal": {"ListenerPortAndProtocal": [
+                    {"ListenerPort": 80, "ListenerProtocal": "http"},
+                    {"ListenerPort": 53, "ListenerProtocal": "udp"}]}},
+            'DescribeLoadBalancerHTTPListenerAttribute': self.http_attributes,
+        }
+        self.set_action_responses(self.responses, default={"RequestId": "365F4154-92F6-4AE4-92F8-7FF34B540710"})
+
+    @property
+    def calls(self):
+        return [(action, dict((name[4:], value) for name, value in params.items()
+                              if name not in ('set_LoadBalancerId', 'set_ListenerPort')))
+                for action, params in self.requests]
+
+    def listener(self, **kwargs):
+        listener = {"protocol": "http", "load_balancer_port": "80", "instance_port": 8080, "bandwidth": "-1",
+                    "health_check": {"ping_path": "/index.html", "ping_port": 8080, "healthy_threshold": 3,
+                                     "unhealthy_threshold": "3", "response_timeout": 5, "interval": 2},
+                    "stickiness": {"enabled": True, "session_type": "insert", "expiration": 500}}
+        listener.update(kwargs)
+        return listener
+
+    def test_listener_spec(self):
+        spec = self.service_connection.listener_spec('tcp', {"listener_port": 80, "load_balancer_port": 81,
+                                                             "health_check": {"timeout": 3}, "gzip": "on"})
+        self.assertEqual(dict(spec), {"ListenerPort": 80, "HealthCheckConnectTimeout": 3})
+
+    def test_unchanged(self):
+        changed, result = self.service_connection.ensure_listener(self.slb_id, self.listener())
+        self.assertFalse(changed)
+        self.assertEqual(result["Status"], "running")
+        self.assertEqual([action for action, params in self.calls],
+                         ['DescribeLoadBalancerAttribute', 'DescribeLoadBalancerHTTPListenerAttribute'])
+
+    def test_update(self):
+        listener = self.listener(scheduler="wlc")
+        listener["health_check"]["timeout"] = 10
+        changed, result = self.service_connection.ensure_listener(self.slb_id, listener)
+        self.assertTrue(changed)
+        self.assertEqual(self.calls[1:], [('DescribeLoadBalancerHTTPListenerAttribute', {}),
+                                          ('SetLoadBalancerHTTPListenerAttribute',
+                                           {"Scheduler": "wlc", "HealthCheckTimeout": 10})])
+        self.assertEqual(result["Scheduler"], "wlc")
+
+    def test_create(self):
+        changed, result = self.service_connection.ensure_listener(self.slb_id, self.listener(listener_port=8080))
+        self.assertTrue(changed)
+        self.assertEqual([action for action, params in self.calls],
+                         ['DescribeLoadBalancerAttribute', 'CreateLoadBalancerHTTPListener',
+                          'StartLoadBalancerListener'])
+        self.assertIn("http_listener_result", result)
+
+    def test_backend_server_port_changed(self):
+        changed, result = self.service_connection.ensure_listener(self.slb_id, self.listener(instance_port=8081))
+        self.assertFalse(changed)
+        self.assertEqual(result, [{"Error Message": "Backend server port of listener 80 cannot be changed "
+                                                    "from 8080 to 8081"}])
+        self.assertEqual([action for action, params in self.calls],
+                         ['DescribeLoadBalancerAttribute', 'DescribeLoadBalancerHTTPListenerAttribute'])
+
+    def test_describe_failed(self):
+        self.responses['DescribeLoadBalancerAttribute'] = {"LoadBalancerId": self.slb_id}
+        changed, result = self.service_connection.ensure_listener(self.slb_id, self.listener())
+        self.assertFalse(changed)
+        self.assertEqual(result[0]["Error Code"], None)
+
+    def test_protocol_conflict(self):
+        changed, result = self.service_connection.ensure_listener(self.slb_id, self.listener(load_balancer_port=53))
+        self.assertFalse(changed)
+        self.assertEqual(result, [{"Error Message": "Listener port 53 is already used by a udp listener"}])
@@ -0,0 +1,781 @@
+#!/usr/bin/env python
+import importlib
+import json
+import logging
+import logging.handlers
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import six
+
+import footmark
+from footmark.aio import AsyncECSConnection, AsyncRequestCore
+from footmark.bulk import BulkExecutor, RateLimiter
+from footmark.cache import LRUCache, ResponseCache
+from footmark.clientpool import ClientPool
+from footmark.connection import RequestRegistry
+from footmark.exception import FootmarkClientError, FootmarkServerError, WaiterTimeoutError
+from footmark import ecs, regioninfo
+from footmark.inventory import Inventory
+from footmark.retry import RetryPolicies, RetryPolicy
+from footmark.logsupport import AsyncHandler, LazyBody, log_response
+from footmark.ecs.connection import ECSConnection
+from footmark.ecs.instance import Instance
+from footmark.waiter import Waiter
+from tests.compat import mock, unittest
+from tests.unit import ACSMockServiceTestCase
+
+DESCRIBE_REGIONS = '''
+{
+  "RequestId": "611CB80C-B6A9-43DB-9E38-0B0AC3D9B58F",
+  "Regions": {
+    "Region": []
+  }
+}
+'''
+
+
+class TestClientPool(unittest.TestCase):
+    def setUp(self):
+        self.factory = mock.Mock(side_effect=lambda *args: mock.Mock())
+        self.pool = ClientPool(max_size=2, idle_timeout=60, factory=self.factory)
+
+    def test_reuse_client(self):
+        with self.pool.client('ak', 'sk', 'cn-hangzhou') as first:
+            pass
+        with self.pool.client('ak', 'sk', 'cn-hangzhou') as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(self.factory.call_count, 1)
+        self.assertEqual(self.pool.hits, 1)
+        self.assertEqual(self.pool.misses, 1)
+
+    def test_keyed_by_region(self):
+        with self.pool.client('ak', 'sk', 'cn-hangzhou') as first:
+            pass
+        with self.pool.client('ak', 'sk', 'cn-beijing') as second:
+            pass
+        self.assertIsNot(first, second)
+        self.assertEqual(self.pool.misses, 2)
+
+    def test_max_size(self):
+        clients = [self.pool.acquire('ak', 'sk', 'cn-hangzhou') for i in range(3)]
+        for conn in clients:
+            self.pool.release('ak', 'sk', 'cn-hangzhou', conn)
+        self.assertEqual(self.pool.size(), 2)
+        self.assertEqual(self.pool.evictions, 1)
+
+    def test_idle_eviction(self):
+        conn = self.pool.acquire('ak', 'sk', 'cn-hangzhou')
+        self.pool.release('ak', 'sk', 'cn-hangzhou', conn)
+        with mock.patch('footmark.clientpool.time.time', return_value=time.time() + 120):
+            self.assertIsNot(self.pool.acquire('ak', 'sk', 'cn-hangzhou'), conn)
+        self.assertEqual(self.pool.evictions, 1)
+        self.assertEqual(self.pool.misses, 2)
+
+
+class TestConnectionClientPool(unittest.TestCase):
+    def setUp(self):
+        self.acs_client = mock.Mock()
+        self.acs_client.get_response.return_value = [200, [], DESCRIBE_REGIONS]
+        self.factory = mock.Mock(return_value=self.acs_client)
+        self.service_connection = ECSConnection(acs_access_key_id='acs_access_key_id',
+                                                acs_secret_access_key='acs_secret_access_key',
+                                                region='cn-hangzhou',
+                                                client_pool=ClientPool(factory=self.factory))
+
+    def test_make_request_reuses_client(self):
+        for i in range(3):
+            self.service_connection.get_status('DescribeRegions', {})
+        self.assertEqual(self.factory.call_count, 1)
+        self.assertEqual(self.acs_client.get_response.call_count, 3)
+        self.assertEqual(self.service_connection.client_pool.stats()['hits'], 2)
+        self.assertEqual(self.service_connection.client_pool.stats()['misses'], 1)
+
+
+class TestRequestRegistry(unittest.TestCase):
+    product = 'aliyunsdkecs.request.v20140526'
+
+    def test_resolve_once(self):
+        registry = RequestRegistry(self.product)
+        with mock.patch('footmark.connection.importlib.import_module',
+                        wraps=importlib.import_module) as import_module:
+            first = registry.resolve('DescribeInstances')
+            second = registry.resolve('DescribeInstances')
+        self.assertIs(first, second)
+        self.assertEqual(import_module.call_count, 1)
+        self.assertIn('set_InstanceIds', first[1])
+
+    def test_build(self):
+        registry = RequestRegistry.for_product(self.product)
+        self.assertIs(registry, RequestRegistry.for_product(self.product))
+        request = registry.build('DescribeInstances', {'set_InstanceIds': '["i-94dehop6n"]',
+                                                       'set_Tag1Key': 'xz_test'})
+        self.assertEqual(request.get_query_params()['InstanceIds'], '["i-94dehop6n"]')
+        self.assertEqual(request.get_query_params()['Tag1Key'], 'xz_test')
+        self.assertEqual(request.get_accept_format(), 'json')
+
+    def test_warm_actions(self):
+        conn = ECSConnection(acs_access_key_id='acs_access_key_id',
+                             acs_secret_access_key='acs_secret_access_key',
+                             warm_actions=['DescribeDisks', 'StartInstance'])
+        self.assertIn('DescribeDisks', conn.request_registry._actions)
+        self.assertIn('StartInstance', conn.request_registry._actions)
+
+
+class TestBulkExecutor(unittest.TestCase):
+    def test_map_keeps_order(self):
+        def call(item):
+            time.sleep(0.01 * (5 - item))
+            return item * 2
+
+        results = BulkExecutor(concurrency=5).map(call, range(5))
+        self.assertEqual(list(results.items()), [(i, i * 2) for i in range(5)])
+
+    def test_errors(self):
+        def call(item):
+            if item == 'b':
+                raise ValueError(item)
+            return item
+
+        results = BulkExecutor(concurrency=2).map(call, ['a', 'b', 'c'])
+        self.assertEqual(results.succeeded, ['a', 'c'])
+        self.assertEqual(list(results.errors), ['b'])
+        self.assertRaises(ValueError, results.raise_first_error)
+
+    def test_rate_limiter(self):
+        limiter = RateLimiter(rate=100, burst=1)
+        start = time.time()
+        BulkExecutor(concurrency=4, limiter=limiter).map(lambda item: item, range(5))
+        self.assertGreaterEqual(time.time() - start, 0.03)
+        self.assertGreater(limiter.waited, 0)
+        self.assertIs(RateLimiter.shared('key', 5), RateLimiter.shared('key', 10))
+
+
+class TestWaiter(unittest.TestCase):
+    def test_exit_once_ready(self):
+        check = mock.Mock(side_effect=[None, False, 'ready'])
+        waiter = Waiter(timeout=60, delay=1, max_delay=3, jitter=0)
+        with mock.patch('footmark.waiter.time.sleep') as sleep:
+            self.assertEqual(waiter.wait(check), 'ready')
+        self.assertEqual(waiter.attempts, 3)
+        self.assertEqual([call[0][0] for call in sleep.call_args_list], [1, 2])
+
+    def test_backoff(self):
+        delays = Waiter(delay=1, max_delay=5, backoff=2, jitter=0.5).delays()
+        for expected in [1, 2, 4, 5, 5]:
+            delay = next(delays)
+            self.assertTrue(expected <= delay <= expected * 1.5)
+
+    def test_deadline(self):
+        waiter = Waiter(timeout=0.05, delay=0.01, max_delay=0.01)
+        with self.assertRaises(WaiterTimeoutError) as context:
+            waiter.wait(lambda: False, 'instance i-94dehop6n to be Running')
+        self.assertEqual(context.exception.error_code, 'WaiterTimeout')
+        self.assertIn('i-94dehop6n', context.exception.message)
+        self.assertGreater(waiter.attempts, 1)
+
+
+class TestPaginate(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+    instance_ids = ['i-94dehop6n', 'i-95dertop6m', 'i-96derhop7s', 'i-97dhsj0pm', 'i-98dkel9pm']
+
+    def page(self, action, params):
+        page_number, page_size = params['set_PageNumber'], params['set_PageSize']
+        start = (page_number - 1) * page_size
+        body = {
+            "Instances": {"Instance": [{"InstanceId": instance_id, "Status": "Running"}
+                                       for instance_id in self.instance_ids[start:start + page_size]]},
+            "PageNumber": page_number,
+            "PageSize": page_size,
+            "TotalCount": len(self.instance_ids)
+        }
+        return self.create_response(200, body=json.dumps(body))
+
+    def test_iter_instances(self):
+        self.service_connection.make_request.side_effect = self.page
+        instances = self.service_connection.iter_instances(page_size=2)
+        self.assertEqual([inst.id for inst in instances], self.instance_ids)
+        self.assertEqual(self.service_connection.make_request.call_count, 3)
+
+    def test_lazy(self):
+        self.service_connection.make_request.side_effect = self.page
+        instances = self.service_connection.iter_instances(page_size=2)
+        self.assertEqual(next(instances).id, self.instance_ids[0])
+        self.assertEqual(self.service_connection.make_request.call_count, 1)
+
+    def test_prefetch(self):
+        self.service_connection.make_request.side_effect = self.page
+        instances = list(self.service_connection.iter_instances(page_size=2, prefetch=True))
+        self.assertEqual([inst.status for inst in instances], ['running'] * 5)
+        self.assertEqual(self.service_connection.make_request.call_count, 3)
+
+    def test_raw_items(self):
+        self.service_connection.make_request.side_effect = self.page
+        instances = self.service_connection.paginate('DescribeInstances', {}, ['Instances', None], 4)
+        self.assertEqual([inst['InstanceId'] for inst in instances], self.instance_ids)
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+
+class TestParseResponse(unittest.TestCase):
+    instance = {
+        "InstanceId": "i-94dehop6n",
+        "Status": "Running",
+        "InnerIpAddress": {"IpAddress": ["10.170.106.80"]},
+        "VpcAttributes": {"NatIpAddress": "", "PrivateIpAddress": {"IpAddress": []}},
+        "Tags": {"Tag": [{"TagKey": "xz_test", "TagValue": "1.20"}]},
+        "SecurityGroupIds": {"SecurityGroupId": ["sg-94kd0cyg0"]}
+    }
+
+    def setUp(self):
+        self.conn = ECSConnection(acs_access_key_id='acs_access_key_id',
+                                  acs_secret_access_key='acs_secret_access_key')
+
+    def parse(self, count):
+        body = json.dumps({"Instances": {"Instance": [dict(self.instance, InstanceId='i-%d' % i)
+                                                      for i in range(count)]}})
+        return self.conn.parse_response(['Instances', Instance], body, self.conn)
+
+    def test_convert_name(self):
+        self.assertEqual(self.conn.convert_name('InstanceId'), 'instance_id')
+        self.assertEqual(self.conn.convert_name('VSwitchId'), 'v_switch_id')
+        self.assertEqual(self.conn.convert_name('status'), 'status')
+        self.assertIsNone(self.conn.convert_name(''))
+
+    def test_nested_dicts(self):
+        inst = self.parse(1)[0]
+        self.assertEqual(inst.id, 'i-0')
+        self.assertEqual(inst.status, 'running')
+        self.assertEqual(inst.vpc_attributes['private_ip_address'], {'IpAddress': []})
+        self.assertEqual(inst.private_ip_address, {'ip_address': []})
+        self.assertEqual(inst.nat_ip_address, '')
+        self.assertEqual(inst.security_group_ids, {'security_group_id': ['sg-94kd0cyg0']})
+
+    def test_benchmark(self):
+        start = time.time()
+        instances = self.parse(1000)
+        elapsed = time.time() - start
+        self.assertEqual(len(instances), 1000)
+        self.assertEqual(instances[-1].id, 'i-999')
+        # Under 0.1 s on py2.7; the bound only catches gross regressions on loaded machines
+        self.assertLess(elapsed, 5)
+
+
+class TestResponseCache(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+
+    def create_service_connection(self, **kwargs):
+        self.cache = ResponseCache(ttl=60, ttls={'DescribeRegions': 0})
+        return ECSConnection(response_cache=self.cache, **kwargs)
+
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+        self.service_connection.make_request.side_effect = self.respond
+
+    def respond(self, action, params):
+        return self.create_response(200, body=json.dumps({"Action": action, "Params": params}))
+
+    def describe(self, instance_id):
+        return self.service_connection.get_status('DescribeInstanceAttribute', {'set_InstanceId': instance_id})
+
+    def test_read_through(self):
+        self.assertEqual(self.describe('i-94dehop6n'), self.describe('i-94dehop6n'))
+        self.describe('i-95dertop6m')
+        self.assertEqual(self.service_connection.make_request.call_count, 2)
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_ttls(self):
+        self.service_connection.get_status('DescribeRegions', {})
+        self.service_connection.get_status('DescribeRegions', {})
+        self.assertEqual(self.service_connection.make_request.call_count, 2)
+        self.describe('i-94dehop6n')
+        with mock.patch('footmark.cache.time.time', return_value=time.time() + 120):
+            self.describe('i-94dehop6n')
+        self.assertEqual(self.service_connection.make_request.call_count, 4)
+
+    def test_invalidation(self):
+        self.describe('i-94dehop6n')
+        self.describe('i-95dertop6m')
+        self.service_connection.get_list('DescribeInstances', {'set_ZoneId': 'cn-hangzhou-b'}, ['Instances', None])
+        self.service_connection.get_status('StopInstance', {'set_InstanceId': 'i-94dehop6n'})
+        self.assertEqual(self.cache.invalidations, 2)
+        self.describe('i-94dehop6n')
+        self.describe('i-95dertop6m')
+        self.service_connection.get_list('DescribeInstances', {'set_ZoneId': 'cn-hangzhou-b'}, ['Instances', None])
+        actions = [call[0][0] for call in self.service_connection.make_request.call_args_list]
+        self.assertEqual(actions, ['DescribeInstanceAttribute', 'DescribeInstanceAttribute', 'DescribeInstances',
+                                   'StopInstance', 'DescribeInstanceAttribute', 'DescribeInstances'])
+
+    def test_uncached_read_keeps_entries(self):
+        self.service_connection.get_list('DescribeInstances', {'set_ZoneId': 'cn-hangzhou-b'}, ['Instances', None])
+        self.service_connection.get_status('DescribeRegions', {})
+        self.service_connection.get_list('DescribeInstances', {'set_ZoneId': 'cn-hangzhou-b'}, ['Instances', None])
+        self.assertEqual(self.cache.invalidations, 0)
+        self.assertEqual(self.service_connection.make_request.call_count, 2)
+
+    def test_resource_ids(self):
+        ids = ResponseCache.resource_ids({'set_InstanceIds': '["i-94dehop6n", "i-95dertop6m"]',
+                                          'set_SecurityGroupId': 'sg-94kd0cyg0',
+                                          'set_RegionId': 'cn-hangzhou', 'set_PageSize': 10})
+        self.assertEqual(sorted(ids), ['i-94dehop6n', 'i-95dertop6m', 'sg-94kd0cyg0'])
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLogSupport(unittest.TestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('footmark.test_logsupport')
+        self.logger.propagate = False
+        self.handler = RecordingHandler()
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.DEBUG)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_lazy_body(self):
+        self.assertEqual(str(LazyBody('{"Instances": []}')), '{"Instances": []}')
+        self.assertEqual(str(LazyBody(b'0123456789', 4)), '0123...[6 more characters]')
+
+    def test_log_response(self):
+        log_response(self.logger, 'DescribeInstances', 200, '0123456789', limit=4)
+        record = self.handler.records[0]
+        self.assertEqual(record.getMessage(), 'DescribeInstances status=200 bytes=10 body=0123...[6 more characters]')
+        self.assertEqual((record.acs_action, record.acs_status, record.body_size), ('DescribeInstances', 200, 10))
+
+    def test_log_response_disabled(self):
+        self.logger.setLevel(logging.INFO)
+        with mock.patch('footmark.logsupport.LazyBody') as lazy_body:
+            log_response(self.logger, 'DescribeInstances', 200, '{}')
+        self.assertFalse(lazy_body.called)
+        self.assertEqual(self.handler.records, [])
+
+    def test_log_response_sampling(self):
+        with mock.patch('footmark.logsupport.random.random', side_effect=[0.05, 0.5]):
+            log_response(self.logger, 'DescribeInstances', 200, '{}', sample_rate=0.1)
+            log_response(self.logger, 'DescribeInstances', 200, '{}', sample_rate=0.1)
+        messages = [record.getMessage() for record in self.handler.records]
+        self.assertEqual(messages, ['DescribeInstances status=200 bytes=2 body={}',
+                                    'DescribeInstances status=200 bytes=2'])
+
+    def test_async_handler(self):
+        target = RecordingHandler()
+        handler = AsyncHandler(target)
+        self.logger.addHandler(handler)
+        try:
+            for i in range(100):
+                self.logger.info('record %d', i)
+            handler.flush()
+            self.assertEqual(len(target.records), 100)
+            self.assertEqual(target.records[-1].getMessage(), 'record 99')
+        finally:
+            self.logger.removeHandler(handler)
+            handler.close()
+
+    def test_async_handler_full(self):
+        target = RecordingHandler()
+        handler = AsyncHandler(target, capacity=2)
+        handler._thread = mock.Mock()
+        for i in range(5):
+            handler.emit(self.logger.makeRecord(self.logger.name, logging.INFO, __file__, 0, 'record', (), None))
+        self.assertEqual(handler.dropped, 3)
+        self.assertEqual(handler.queue.qsize(), 2)
+
+
+IMPORT_CHECK = '''
+import sys, time
+start = time.time()
+import footmark
+elapsed = time.time() - start
+assert 'footmark.pyami.config' not in sys.modules, 'config loaded at import'
+assert not footmark.log.handlers, 'logging configured at import'
+print(elapsed)
+'''
+
+
+class TestImport(unittest.TestCase):
+    def test_import_is_side_effect_free(self):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        timings = []
+        for _ in range(5):
+            output = subprocess.check_output([sys.executable, '-c', IMPORT_CHECK], env=env)
+            timings.append(float(output.strip()))
+        timings.sort()
+        self.assertLess(timings[2], 1)
+
+    def test_logging_initialized_on_first_connection(self):
+        with mock.patch('footmark._logging_initialized', False), \
+                mock.patch('footmark.pyami.config.Config.init_config') as init_config, \
+                mock.patch('logging.config.dictConfig'), mock.patch('logging.config.fileConfig'):
+            ECSConnection('access_key', 'secret_key')
+            ECSConnection('access_key', 'secret_key')
+        self.assertEqual(init_config.call_count, 1)
+
+    def test_blocking_file_handlers_made_async(self):
+        logger = logging.getLogger('footmark')
+        existing = logging.FileHandler(os.devnull, delay=True)
+        configured = logging.handlers.TimedRotatingFileHandler(os.devnull, delay=True)
+        logger.addHandler(existing)
+        self.addCleanup(logger.removeHandler, existing)
+        before = list(logger.handlers)
+
+        def file_config(path):
+            logger.addHandler(configured)
+
+        with mock.patch('footmark._logging_initialized', False), \
+                mock.patch('footmark.pyami.config.Config.init_config'), \
+                mock.patch('logging.config.fileConfig', side_effect=file_config):
+            footmark.init_logging()
+        wrapped = [handler for handler in logger.handlers if handler not in before]
+        for handler in wrapped:
+            self.addCleanup(logger.removeHandler, handler)
+        self.assertEqual([handler.target for handler in wrapped], [configured])
+        self.assertIn(existing, logger.handlers)
+
+    def test_non_ascii_error_message(self):
+        body = json.dumps({'Code': 'InvalidParameter', 'Message': u'\u53c2\u6570\u65e0\u6548'})
+        error = FootmarkServerError(400, body)
+        self.assertEqual(str(error.error_code), 'InvalidParameter')
+        self.assertIn(str(error.message), str(error))
+
+
+class TestEndpointRegistry(unittest.TestCase):
+    def setUp(self):
+        regioninfo.registry.clear()
+        self.addCleanup(regioninfo.registry.clear)
+
+    def test_get_region(self):
+        region = ecs.get_region('cn-hangzhou')
+        self.assertEqual((region.id, region.endpoint), ('cn-hangzhou', 'ecs-cn-hangzhou.aliyuncs.com'))
+        self.assertIs(region.connection_cls, ECSConnection)
+        self.assertIsNone(ecs.get_region('cn-nowhere'))
+        self.assertIn(region, ecs.regions())
+
+    def test_loads_once(self):
+        with mock.patch('footmark.regioninfo.load_endpoint_json', wraps=regioninfo.load_endpoint_json) as load:
+            for _ in range(100):
+                ecs.get_region('cn-beijing')
+                regioninfo.get_regions('slb')
+        self.assertEqual(load.call_count, 1)
+
+    def test_unknown_service(self):
+        self.assertRaises(FootmarkClientError, regioninfo.get_regions, 'nosuchservice')
+
+    def test_override_reloaded_on_change(self):
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.addCleanup(os.remove, path)
+        with open(path, 'w') as f:
+            json.dump({'ecs': {'cn-test-1': 'ecs.cn-test-1.example.com'}}, f)
+        with mock.patch.dict(os.environ, {'FOOTMARK_ENDPOINTS': path}):
+            self.assertEqual(ecs.get_region('cn-test-1').endpoint, 'ecs.cn-test-1.example.com')
+            self.assertIsNotNone(ecs.get_region('cn-hangzhou'))
+            with open(path, 'w') as f:
+                json.dump({'ecs': {'cn-test-1': 'ecs.cn-test-1.example.net'}}, f)
+            mtime = os.path.getmtime(path) + 10
+            os.utime(path, (mtime, mtime))
+            self.assertEqual(ecs.get_region('cn-test-1').endpoint, 'ecs.cn-test-1.example.net')
+        self.assertIsNone(ecs.get_region('cn-test-1'))
+
+
+class TestInventory(unittest.TestCase):
+    lists = {'DescribeInstances': ('Instances', 'Instance', 'InstanceId'),
+             'DescribeDisks': ('Disks', 'Disk', 'DiskId'),
+             'DescribeSecurityGroups': ('SecurityGroups', 'SecurityGroup', 'SecurityGroupId'),
+             'DescribeVpcs': ('Vpcs', 'Vpc', 'VpcId'),
+             'DescribeVSwitches': ('VSwitches', 'VSwitch', 'VSwitchId'),
+             'DescribeEipAddresses': ('EipAddresses', 'EipAddress', 'AllocationId'),
+             'DescribeLoadBalancers': ('LoadBalancers', 'LoadBalancer', 'LoadBalancerId')}
+
+    def respond(self, connection, action, params):
+        region_id = connection.region
+        if region_id == 'cn-broken':
+            return [400, [], json.dumps({'Code': 'Forbidden.RAM', 'Message': 'No permission'})]
+        key, item_key, id_key = self.lists[action]
+        items = [{id_key: '%s-%s-%d' % (item_key, region_id, i), 'RegionId': region_id} for i in range(3)]
+        page = params['set_PageNumber']
+        body = {key: {item_key: items[page - 1:page]}, 'TotalCount': len(items),
+                'PageNumber': page, 'PageSize': 1}
+        return [200, [], json.dumps(body)]
+
+    def setUp(self):
+        patcher = mock.patch('footmark.connection.ACSQueryConnection.make_request', autospec=True,
+                             side_effect=self.respond)
+        self.make_request = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_collect(self):
+        inventory = Inventory(['cn-hangzhou', 'cn-beijing'], page_size=1, acs_access_key_id='key',
+                              acs_secret_access_key='secret')
+        result = inventory.collect()
+        self.assertEqual(list(result), list(Inventory.collectors))
+        for resource, items in result.items():
+            self.assertEqual(len(items), 6, resource)
+        self.assertEqual(sorted(instance.id for instance in result['instances'])[0], 'Instance-cn-beijing-0')
+        self.assertEqual(self.make_request.call_count, 7 * 2 * 3)
+        self.assertEqual(len(inventory._connections), 6)
+        self.assertEqual(inventory.errors, {})
+
+    def test_errors_do_not_stop_scan(self):
+        inventory = Inventory(['cn-broken', 'cn-hangzhou'], resources=['vpcs', 'load_balancers'])
+        items = list(inventory.scan())
+        self.assertEqual(set((item.region_id, item.resource) for item in items),
+                         set([('cn-hangzhou', 'vpcs'), ('cn-hangzhou', 'load_balancers')]))
+        self.assertEqual(sorted(inventory.errors), [('cn-broken', 'load_balancers'), ('cn-broken', 'vpcs')])
+        self.assertEqual(inventory.errors[('cn-broken', 'vpcs')].error_code, 'Forbidden.RAM')
+
+    def test_all_regions(self):
+        regioninfo.registry.clear()
+        inventory = Inventory('all', resources=['instances', 'load_balancers'])
+        regions = regioninfo.get_regions('ecs')
+        self.assertEqual(len(inventory.tasks()), len(regions) + len(regioninfo.get_regions('slb')))
+        self.assertRaises(ValueError, Inventory, resources=['buckets'])
+
+    def test_stop_early(self):
+        inventory = Inventory(['cn-hangzhou', 'cn-beijing', 'cn-shanghai'], resources=['instances'],
+                              page_size=1, buffer_size=1)
+        scan = inventory.scan()
+        first = next(scan)
+        scan.close()
+        self.assertEqual(first.resource, 'instances')
+
+
+class TestAsyncConnection(unittest.TestCase):
+    def setUp(self):
+        self.core = AsyncRequestCore(concurrency=4)
+        self.addCleanup(self.core.shutdown)
+        self.connection = AsyncECSConnection('key', 'secret', region='cn-hangzhou', core=self.core)
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.connection.connection.make_request = mock.Mock(side_effect=self.respond)
+
+    def respond(self, action, params):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return [200, [], json.dumps({'Action': action, 'InstanceId': params.get('set_InstanceId')})]
+
+    def test_futures(self):
+        futures = [self.connection.get_status('DescribeInstanceAttribute', {'set_InstanceId': 'i-%d' % i})
+                   for i in range(20)]
+        results = [future.result() for future in futures]
+        self.assertEqual([result['InstanceId'] for result in results], ['i-%d' % i for i in range(20)])
+        self.assertLessEqual(self.peak, 4)
+        self.assertGreater(self.peak, 1)
+        self.assertEqual((self.core.submitted, self.core.in_flight), (20, 0))
+
+    def test_methods(self):
+        self.assertIs(self.connection.connection.client_pool, self.core.client_pool)
+        self.assertEqual(self.connection.describe_instances.__name__, 'describe_instances')
+        self.assertRaises(AttributeError, getattr, self.connection, 'build_filter_params')
+        self.assertRaises(AttributeError, getattr, self.connection, 'describe_nothing')
+        future = self.connection.run('get_status', 'StartInstance', {'set_InstanceId': 'i-1'})
+        self.assertEqual(future.result()['Action'], 'StartInstance')
+
+    @unittest.skipIf(six.PY2, 'asyncio requires Python 3')
+    def test_asyncio(self):
+        import asyncio
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        connection = AsyncECSConnection('key', 'secret', region='cn-hangzhou', core=self.core, loop=loop)
+        connection.connection.make_request = mock.Mock(side_effect=self.respond)
+        futures = [connection.get_status('DescribeInstanceAttribute', {'set_InstanceId': 'i-%d' % i})
+                   for i in range(8)]
+        results = loop.run_until_complete(asyncio.gather(*futures))
+        self.assertEqual(len(results), 8)
+
+    def test_submissions_wait_for_a_slot(self):
+        release = threading.Event()
+        self.connection.connection.make_request = mock.Mock(
+            side_effect=lambda action, params: release.wait() and [200, [], '{}'])
+        futures = []
+
+        def submit():
+            for i in range(6):
+                futures.append(self.connection.get_status('DescribeInstances', {}))
+
+        submitter = threading.Thread(target=submit)
+        submitter.start()
+        deadline = time.time() + 5
+        while len(futures) < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        self.assertEqual(len(futures), 4)
+        self.assertTrue(submitter.is_alive())
+        release.set()
+        submitter.join(5)
+        self.assertEqual([future.result() for future in futures], [{}] * 6)
+
+    @unittest.skipIf(six.PY2, 'asyncio requires Python 3')
+    def test_asyncio_semaphore(self):
+        import asyncio
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        connection = AsyncECSConnection('key', 'secret', region='cn-hangzhou', core=self.core)
+        connection.connection.make_request = mock.Mock(side_effect=self.respond)
+        gathered = loop.create_future()
+
+        def start():
+            # Submitted from inside the running loop
+            futures = [connection.get_status('DescribeInstanceAttribute', {'set_InstanceId': 'i-%d' % i})
+                       for i in range(12)]
+            asyncio.gather(*futures).add_done_callback(lambda done: gathered.set_result(done.result()))
+
+        loop.call_soon(start)
+        results = loop.run_until_complete(gathered)
+        self.assertEqual([result['InstanceId'] for result in results], ['i-%d' % i for i in range(12)])
+        self.assertLessEqual(self.peak, 4)
+        self.assertEqual(self.core.in_flight, 0)
+
+
+THROTTLED = json.dumps({'Code': 'Throttling.User', 'Message': 'Request was denied due to user flow control.'})
+
+
+class TestThrottling(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+
+    def setUp(self):
+        super(TestThrottling, self).setUp()
+        patcher = mock.patch('footmark.retry.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_throttled(self):
+        self.service_connection.make_request.side_effect = [
+            self.create_response(400, body=THROTTLED), self.create_response(400, body=THROTTLED),
+            self.create_response(200, body='{"RequestId": "1"}')]
+        self.assertEqual(self.service_connection.get_status('StartInstance', {}), {'RequestId': '1'})
+        self.assertEqual(self.service_connection.throttled_requests, 2)
+        delays = [call[0][0] for call in self.sleep.call_args_list]
+        self.assertEqual(len(delays), 2)
+        self.assertTrue(1 <= delays[0] <= 2 and 2 <= delays[1] <= 4, delays)
+        self.assertAlmostEqual(self.service_connection.throttle_waited, sum(delays))
+
+    def test_retries_exhausted(self):
+        self.service_connection = ECSConnection('key', 'secret', throttle_retries=2)
+        self.initialize_service_connection()
+        self.set_http_response(400, body=THROTTLED)
+        with self.assertRaises(FootmarkServerError) as cm:
+            self.service_connection.get_status('StartInstance', {})
+        self.assertEqual(cm.exception.error_code, 'Throttling.User')
+        self.assertEqual(self.service_connection.make_request.call_count, 3)
+
+    def test_other_errors_not_retried(self):
+        self.set_http_response(400, body=json.dumps({'Code': 'InvalidParameter', 'Message': 'Bad'}))
+        self.assertRaises(FootmarkServerError, self.service_connection.get_status, 'StartInstance', {})
+        self.assertEqual(self.service_connection.make_request.call_count, 1)
+        self.assertFalse(self.sleep.called)
+
+    def test_rate_limit(self):
+        connection = ECSConnection('throttle_key', 'secret', request_rate_limit={'DescribeRegions': 5})
+        connection.make_request = mock.Mock(return_value=self.create_response(200, body='{}'))
+        limiter = connection.request_limiter('DescribeRegions')
+        other = ECSConnection('throttle_key', 'secret', request_rate_limit={'DescribeRegions': 5})
+        self.assertIs(other.request_limiter('DescribeRegions'), limiter)
+        self.assertIsNone(connection.request_limiter('DescribeInstances'))
+        with mock.patch.object(limiter, 'acquire', return_value=0.2) as acquire:
+            for _ in range(3):
+                connection.get_status('DescribeRegions', {})
+        self.assertEqual(acquire.call_count, 3)
+        self.assertAlmostEqual(connection.rate_limit_waited, 0.6)
+
+
+class TestRetryPolicies(ACSMockServiceTestCase):
+    connection_class = ECSConnection
+
+    def setUp(self):
+        super(TestRetryPolicies, self).setUp()
+        patcher = mock.patch('footmark.retry.time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.unavailable = self.create_response(503, body=json.dumps({'Code': 'ServiceUnavailable'}))
+        self.ok = self.create_response(200, body='{}')
+
+    def test_transient_errors(self):
+        self.service_connection.make_request.side_effect = [self.unavailable, self.ok]
+        self.service_connection.get_status('DescribeInstances', {})
+        self.service_connection.make_request.side_effect = [self.unavailable, self.unavailable, self.unavailable]
+        self.assertRaises(FootmarkServerError, self.service_connection.get_status, 'DescribeInstances', {})
+        metrics = self.service_connection.retry_policies.metrics()
+        self.assertEqual((metrics['transient']['retries'], metrics['transient']['recovered'],
+                          metrics['transient']['giveups']), (3, 1, 1))
+
+    def test_concurrent_metrics(self):
+        sent = set()
+        lock = threading.Lock()
+
+        def respond(action, params):
+            # Each request fails once, then succeeds
+            with lock:
+                first = params['set_InstanceId'] not in sent
+                sent.add(params['set_InstanceId'])
+            return self.unavailable if first else self.ok
+
+        self.service_connection.make_request.side_effect = respond
+        instance_ids = ['i-%03d' % i for i in range(200)]
+        BulkExecutor(20).map(lambda instance_id: self.service_connection.get_status(
+            'DescribeInstanceAttribute', {'set_InstanceId': instance_id}), instance_ids).raise_first_error()
+        metrics = self.service_connection.retry_policies.metrics()
+        self.assertEqual((metrics['transient']['retries'], metrics['transient']['recovered']), (200, 200))
+
+    def test_not_idempotent(self):
+        self.set_http_response(503, body=json.dumps({'Code': 'ServiceUnavailable'}))
+        self.assertRaises(FootmarkServerError, self.service_connection.get_status, 'CreateInstance', {})
+        self.assertEqual(self.service_connection.make_request.call_count, 1)
+        self.service_connection.make_request.side_effect = [self.unavailable, self.ok]
+        self.service_connection.get_status('CreateInstance', {'set_ClientToken': 'token'})
+        self.assertEqual(self.service_connection.make_request.call_count, 3)
+
+    def test_fatal(self):
+        self.set_http_response(400, body=json.dumps({'Code': 'InvalidParameter'}))
+        self.assertRaises(FootmarkServerError, self.service_connection.get_status, 'DescribeInstances', {})
+        self.assertEqual(self.service_connection.make_request.call_count, 1)
+        self.assertEqual(self.service_connection.retry_policies.fatal, 1)
+        self.assertFalse(self.sleep.called)
+
+    def test_exceptions(self):
+        error = FootmarkClientError('connection reset')
+        error.error_code = 'SDK.HttpError'
+        self.service_connection.make_request.side_effect = [error, self.ok]
+        self.assertEqual(self.service_connection.get_status('DescribeInstances', {}), {})
+        self.service_connection.make_request.side_effect = FootmarkClientError('Null AcsClient ')
+        self.assertRaises(FootmarkClientError, self.service_connection.get_status, 'DescribeInstances', {})
+
+    def test_deadline(self):
+        policies = RetryPolicies([RetryPolicy('all', statuses=(503,), max_attempts=100, deadline=5)])
+        send = mock.Mock(return_value=self.unavailable)
+        now = [1000.0]
+        self.sleep.side_effect = lambda delay: now.__setitem__(0, now[0] + delay)
+        with mock.patch('footmark.retry.time.time', side_effect=lambda: now[0]):
+            self.assertEqual(policies.call('DescribeInstances', {}, send), self.unavailable)
+        self.assertLessEqual(now[0], 1005.0)
+        self.assertEqual(policies['all'].giveups, 1)
+        self.assertRaises(KeyError, policies.__getitem__, 'other')
@@ -271,6 +271,22 @@ CREATE_VPC = '''
 }
 '''
 
+DESCRIBE_VPC_AVAILABLE = '''
+{
+        "RequestId": "3B1A1E4D-8D1A-4E5B-9B5C-5B8E9B0E6A2F",
+        "TotalCount": 1,
+        "Vpcs": {"Vpc": [{"VpcId": "vpc-j6cgc9h8wzjmjgauw2ibi", "Status": "Available"}]}
+}
+'''
+
+DESCRIBE_VSWITCH_AVAILABLE = '''
+{
+        "RequestId": "9A0B5E2C-0F36-4B0B-A5E3-1C8A4B8C2D11",
+        "TotalCount": 1,
+        "VSwitches": {"VSwitch": [{"VSwitchId": "vsw-rj9v3y42xzbvgagukas4o", "Status": "Available"}]}
+}
+'''
+
 CREATE_ROUTE_ENTRY = '''
 {
         "RequestId": "601CB03C-7653-48D4-8A8E-BFCB987E34F3"
@@ -295,8 +311,12 @@ class TestCreateVpc(ACSMockServiceTestCase):
     def default_body(self):
         return CREATE_VPC
 
+    def respond(self, action, params):
+        bodies = {'DescribeVpcs': DESCRIBE_VPC_AVAILABLE, 'DescribeVSwitches': DESCRIBE_VSWITCH_AVAILABLE}
+        return self.create_response(200, body=bodies.get(action))
+
     def test_create_vpc(self):
-        self.set_http_response(status_code=200)
+        self.service_connection.make_request.side_effect = self.respond
         changed, result = self.service_connection.create_vpc(cidr_block=self.cidr_block, user_cidr=self.user_cidr,
                                                              vpc_name=self.vpc_name, description=self.description,
                                                              vswitches=self.vswitches)
@@ -360,8 +380,13 @@ class TestCreateVswitch(ACSMockServiceTestCase):
     def default_body(self):
         return CREATE_VSWITCH
     
+    def respond(self, action, params):
+        if action == 'DescribeVSwitches':
+            return self.create_response(200, body=DESCRIBE_VSWITCH_AVAILABLE)
+        return self.create_response(200)
+
     def test_create_vswitch(self):
-        self.set_http_response(status_code=200)
+        self.service_connection.make_request.side_effect = self.respond
         changed, result, vswitchId = self.service_connection.create_vswitch(vpc_id=self.vpc_id, vswitches=self.vswitches)
         vswitches = result[0] 
         self.assertEqual(vswitches[u'VSwitchId'], "vsw-rj9v3y42xzbvgagukas4o")